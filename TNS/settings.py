@@ -79,11 +79,15 @@ WSGI_APPLICATION = "TNS.wsgi.application"
 import dj_database_url
 import os
 
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL'),
+        default=DATABASE_URL,
         conn_max_age=600,
-        ssl_require=True
+        # sslmode is a PostgreSQL option; SQLite (local runs, tests) would reject it,
+        # and a URL with its own ?sslmode= (a local server) keeps it
+        ssl_require=DATABASE_URL.startswith(('postgres://', 'postgresql://')) and 'sslmode=' not in DATABASE_URL,
     )
 }
 
@@ -131,6 +135,10 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 
 
+# Score every match in both player orders and average them (predictions.ml_utils.predict_matches)
+PREDICTIONS_SYMMETRIC = os.environ.get("PREDICTIONS_SYMMETRIC", "") == "1"
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,30 @@
+"""gunicorn settings: `gunicorn` (run from the project root) picks this file up.
+
+The app is loaded once in the master (preload_app). when_ready then imports
+every view, loads the prediction model and runs one prediction there, before
+any worker is forked. Workers share those pages copy-on-write, so they
+neither load the model again nor hold their own copy of it.
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = "TNS.wsgi:application"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count() * 2 + 1)))
+preload_app = True
+
+
+def when_ready(server):
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from predictions.ml_utils import warm_up
+
+    get_resolver().url_patterns  # import every view module
+    warm_up()
+    # no connection may be inherited across fork
+    connections.close_all()
+    # keep the collector from touching (and so copying) the shared objects in every worker
+    gc.freeze()
+    server.log.info("Prediction model loaded in the master; forking workers")
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Player, PlayerStat, PlayerRecord, Ranking
+from .models import (
+    Player, PlayerStat, PlayerRecord, Ranking, ImportManifest, PlayerAlias, RankingWeek, Match, HeadToHead,
+    PlayerFeatures,
+)
 
 
 @admin.register(Player)
@@ -34,3 +37,47 @@ class RankingSnapshotAdmin(admin.ModelAdmin):
     date_hierarchy = "date"   # 👈 adds navigation by year → month → day
     ordering = ("-date", "rank")
 
+
+
+@admin.register(ImportManifest)
+class ImportManifestAdmin(admin.ModelAdmin):
+    list_display = ("path", "rows", "size", "sha256", "imported_at")
+    search_fields = ("path",)
+    ordering = ("-imported_at",)
+
+
+@admin.register(PlayerAlias)
+class PlayerAliasAdmin(admin.ModelAdmin):
+    list_display = ("alias", "key", "player")
+    search_fields = ("alias", "key", "player__name")
+    autocomplete_fields = ("player",)
+
+
+@admin.register(RankingWeek)
+class RankingWeekAdmin(admin.ModelAdmin):
+    list_display = ("date", "is_published", "row_count", "published_at")
+    list_filter = ("is_published",)
+    ordering = ("-date",)
+
+
+@admin.register(Match)
+class MatchAdmin(admin.ModelAdmin):
+    list_display = ("tourney_date", "tourney_name", "round", "winner", "loser", "surface", "score")
+    search_fields = ("tourney_name", "winner__name", "loser__name")
+    list_filter = ("surface", "tourney_level")
+    date_hierarchy = "tourney_date"
+    raw_id_fields = ("winner", "loser")
+
+
+@admin.register(HeadToHead)
+class HeadToHeadAdmin(admin.ModelAdmin):
+    list_display = ("player_a", "player_b", "a_wins", "b_wins", "last_match_date")
+    search_fields = ("player_a__name", "player_b__name")
+    raw_id_fields = ("player_a", "player_b")
+
+
+@admin.register(PlayerFeatures)
+class PlayerFeaturesAdmin(admin.ModelAdmin):
+    list_display = ("player", "rank", "points", "height_cm", "age", "hand_right", "ranking_date", "refreshed_at")
+    search_fields = ("player__name",)
+    raw_id_fields = ("player",)
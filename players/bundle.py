@@ -0,0 +1,232 @@
+"""Portable dataset bundle: the player, ranking and match tables in one zip file.
+
+The bundle holds a ``manifest.json`` and one CSV member per table. The
+manifest records the format version, the column list of each table, its
+row count and the sha256 of its CSV. Loading checks every checksum before
+it writes anything. On PostgreSQL each CSV is streamed in with ``COPY``;
+other backends fall back to batched ``executemany`` INSERTs.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import zipfile
+from datetime import date, datetime
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from players.models import (
+    HeadToHead, Match, Player, PlayerAlias, PlayerRecord, PlayerStat, Ranking, RankingWeek,
+)
+from players.derived import refresh_player_features
+from players.publishing import touch_publish_stamp
+
+FORMAT_VERSION = 1
+NULL = r"\N"
+CHUNK_SIZE = 5000
+
+# load order: parents before the tables that reference them
+BUNDLE_MODELS = [Player, PlayerStat, PlayerRecord, PlayerAlias, RankingWeek, Ranking, Match, HeadToHead]
+
+
+class BundleError(Exception):
+    pass
+
+
+def _columns(model):
+    return [field.column for field in model._meta.concrete_fields]
+
+
+def _member(model):
+    return f"{model._meta.db_table}.csv"
+
+
+def _text(value):
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _write_table(archive, model):
+    """Stream one table into a CSV member; returns (rows, sha256)."""
+    digest = hashlib.sha256()
+    rows = 0
+    fields = [field.attname for field in model._meta.concrete_fields]
+    values = model.objects.order_by("pk").values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+    with archive.open(_member(model), "w") as member:
+        while chunk := list(islice(values, CHUNK_SIZE)):
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerows(
+                [_text(value) for value in row] for row in chunk
+            )
+            data = buffer.getvalue().encode("utf-8")
+            digest.update(data)
+            member.write(data)
+            rows += len(chunk)
+    return rows, digest.hexdigest()
+
+
+def _snapshot_transaction():
+    """Make the transaction just opened read every table from one snapshot.
+
+    PostgreSQL's default READ COMMITTED takes a new snapshot per statement,
+    so an import committing mid-export could pair new rankings with old
+    players. REPEATABLE READ must be set before the first query, which is
+    only possible when this is the outermost transaction. SQLite already
+    reads a transaction from one snapshot.
+    """
+    if connection.vendor == "postgresql" and not connection.savepoint_ids:
+        with connection.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+
+def export_bundle(path):
+    """Write every table of BUNDLE_MODELS to `path`; returns the manifest."""
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": timezone.now().isoformat(),
+        "tables": {},
+    }
+    tmp_path = f"{path}.tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        with transaction.atomic():
+            # one snapshot of all tables, so foreign keys stay consistent
+            _snapshot_transaction()
+            for model in BUNDLE_MODELS:
+                rows, sha256 = _write_table(archive, model)
+                manifest["tables"][model._meta.db_table] = {
+                    "columns": _columns(model),
+                    "rows": rows,
+                    "sha256": sha256,
+                }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read("manifest.json"))
+    except KeyError:
+        raise BundleError("not a dataset bundle: manifest.json is missing")
+
+    version = manifest.get("format_version")
+    if version != FORMAT_VERSION:
+        raise BundleError(f"unsupported bundle format version {version}")
+
+    for model in BUNDLE_MODELS:
+        table = manifest["tables"].get(model._meta.db_table)
+        if table is None:
+            raise BundleError(f"bundle has no {model._meta.db_table} table")
+        if table["columns"] != _columns(model):
+            raise BundleError(
+                f"{model._meta.db_table}: bundle columns {table['columns']} do not match "
+                f"the current schema {_columns(model)}; migrate or re-export"
+            )
+    return manifest
+
+
+def verify_bundle(archive, manifest):
+    """Recompute every member's sha256 and compare it with the manifest."""
+    for model in BUNDLE_MODELS:
+        digest = hashlib.sha256()
+        with archive.open(_member(model)) as member:
+            for chunk in iter(lambda: member.read(1 << 20), b""):
+                digest.update(chunk)
+        if digest.hexdigest() != manifest["tables"][model._meta.db_table]["sha256"]:
+            raise BundleError(f"{_member(model)}: checksum mismatch")
+
+
+def _copy_table(archive, model, columns):
+    quote = connection.ops.quote_name
+    sql = (
+        f"COPY {quote(model._meta.db_table)} ({', '.join(quote(c) for c in columns)}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{NULL}')"
+    )
+    with archive.open(_member(model)) as member, connection.cursor() as cursor:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(sql, member)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                for chunk in iter(lambda: member.read(1 << 20), b""):
+                    copy.write(chunk)
+
+
+def _converter(field):
+    """Function turning one CSV text value into the value to insert for `field`."""
+    internal_type = (field.target_field if field.is_relation else field).get_internal_type()
+    if internal_type.endswith(("IntegerField", "AutoField")):
+        return int
+    if internal_type == "FloatField":
+        return float
+    if internal_type in ("CharField", "TextField", "URLField", "FileField", "ImageField", "DateField"):
+        return str
+    return lambda value: field.get_db_prep_save(field.to_python(value), connection)
+
+
+def _insert_table(archive, model, columns):
+    """Plain executemany INSERTs, for backends without COPY."""
+    fields = {field.column: field for field in model._meta.concrete_fields}
+    converters = [_converter(fields[column]) for column in columns]
+    quote = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(quote(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    with archive.open(_member(model)) as member, connection.cursor() as cursor:
+        reader = csv.reader(io.TextIOWrapper(member, encoding="utf-8", newline=""))
+        while chunk := list(islice(reader, CHUNK_SIZE)):
+            cursor.executemany(sql, [
+                [None if value == NULL else convert(value) for convert, value in zip(converters, row)]
+                for row in chunk
+            ])
+
+
+def load_bundle(path, clear=None):
+    """Verify `path` and load it into the bundle tables; returns the manifest.
+
+    The tables must be empty unless `clear` is given: it is called to empty
+    them once the bundle has passed verification, in the same transaction
+    as the load.
+    """
+    if not zipfile.is_zipfile(path):
+        raise BundleError(f"{path} is not a dataset bundle")
+
+    with zipfile.ZipFile(path) as archive, transaction.atomic():
+        manifest = read_manifest(archive)
+        verify_bundle(archive, manifest)
+
+        if clear is not None:
+            clear()
+        not_empty = [model.__name__ for model in BUNDLE_MODELS if model.objects.exists()]
+        if not_empty:
+            raise BundleError(f"target tables are not empty: {', '.join(not_empty)}")
+
+        for model in BUNDLE_MODELS:
+            table = manifest["tables"][model._meta.db_table]
+            if connection.vendor == "postgresql":
+                _copy_table(archive, model, table["columns"])
+            else:
+                _insert_table(archive, model, table["columns"])
+
+            loaded = model.objects.count()
+            if loaded != table["rows"]:
+                raise BundleError(f"{model._meta.db_table}: loaded {loaded} rows, expected {table['rows']}")
+
+        # explicit ids were inserted, so move the id sequences past them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), BUNDLE_MODELS):
+                cursor.execute(sql)
+        # PlayerFeatures is derived, so it is rebuilt rather than shipped
+        refresh_player_features()
+        transaction.on_commit(touch_publish_stamp)
+    return manifest
@@ -0,0 +1,83 @@
+"""Set-based maintenance of data derived from other tables: Ranking.age and PlayerFeatures."""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, DateField, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+from django.db.models.lookups import LessThan
+
+from players.models import Player, PlayerFeatures, Ranking
+from players.publishing import touch_publish_stamp
+
+
+def _month_day(expression):
+    return ExtractMonth(expression) * 100 + ExtractDay(expression)
+
+
+def backfill_ranking_ages(player_ids=None):
+    """Recompute Ranking.age from each player's birth_date in one UPDATE.
+
+    Limited to `player_ids` when given. Players without a birth date get
+    NULL. Returns the number of rows updated.
+    """
+    birth_date = Subquery(
+        Player.objects.filter(pk=OuterRef("player_id")).values("birth_date")[:1],
+        output_field=DateField(),
+    )
+    # completed years: year difference, minus one before the birthday
+    age = (
+        ExtractYear("date")
+        - ExtractYear(birth_date)
+        - Case(
+            When(LessThan(_month_day("date"), _month_day(birth_date)), then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+    rankings = Ranking.objects.all()
+    if player_ids is not None:
+        rankings = rankings.filter(player_id__in=list(player_ids))
+    return rankings.update(age=age)
+
+
+PLAYER_FEATURE_FIELDS = ["id", "height_cm", "plays", "birth_date"]
+
+
+def refresh_player_features(player_ids=None):
+    """Rebuild PlayerFeatures in one transaction; returns the number of rows.
+
+    Limited to `player_ids` when given. Two reads (players, and their
+    latest published rankings) and batched inserts. Prediction caches drop
+    those players' entries (all entries by default) once it commits.
+    """
+    players = Player.objects.only(*PLAYER_FEATURE_FIELDS)
+    current = PlayerFeatures.objects.all()
+    if player_ids is not None:
+        player_ids = list(player_ids)
+        players = players.filter(pk__in=player_ids)
+        current = current.filter(player_id__in=player_ids)
+    latest = {ranking.player_id: ranking for ranking in Ranking.objects.latest_published(players.values("pk"))}
+    rows = [PlayerFeatures.from_player(player, latest.get(player.pk)) for player in players]
+
+    with transaction.atomic():
+        current.delete()
+        PlayerFeatures.objects.bulk_create(rows, batch_size=1000)
+        transaction.on_commit(partial(touch_publish_stamp, player_ids))
+    return len(rows)
+
+
+def player_features(player_ids):
+    """{player id: PlayerFeatures} for `player_ids`, in one query.
+
+    Players added since the last refresh are built on the fly (two more
+    queries), so a stale or empty table only costs speed.
+    """
+    player_ids = set(player_ids)
+    features = PlayerFeatures.objects.in_bulk(player_ids)
+    missing = player_ids - features.keys()
+    if missing:
+        latest = {ranking.player_id: ranking for ranking in Ranking.objects.latest_published(missing)}
+        for player in Player.objects.filter(pk__in=missing).only(*PLAYER_FEATURE_FIELDS):
+            features[player.pk] = PlayerFeatures.from_player(player, latest.get(player.pk))
+    return features
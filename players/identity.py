@@ -0,0 +1,97 @@
+"""Player identity resolution shared by the import and photo commands.
+
+Names are matched on a folded key — accents stripped, case folded,
+punctuation dropped and tokens sorted — so "Stan Wawrinka", "WAWRINKA
+Stan" and "Stan-Wawrinka" all resolve to the same player. Known spelling
+variants are persisted in PlayerAlias. The whole index is loaded once
+into a dict, so each lookup is O(1) with no query.
+"""
+import re
+import unicodedata
+
+from players.models import Player, PlayerAlias
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def fold_name(name):
+    if not name:
+        return None
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    tokens = _NON_ALNUM.sub(" ", stripped.casefold()).split()
+    return " ".join(sorted(tokens)) or None
+
+
+class PlayerResolver:
+    """In-memory name -> Player index (id, name and birth_date loaded).
+
+    Supports the small mapping API the importers use (`in`, `[]`, `get`,
+    assignment, `values()`); `resolve()` additionally records misses for
+    `miss_report()`. `taken` holds every known player ID, so new IDs can be
+    allocated (models.generate_player_ids) without querying again.
+    """
+
+    def __init__(self, taken=None):
+        self._index = {}
+        self._players = {}
+        self.taken = taken if taken is not None else set()
+        self.misses = {}
+
+    @classmethod
+    def load(cls, taken=None):
+        """Build the index with one query for players and one for aliases.
+
+        If a `taken` set is given, every existing player ID is added to it;
+        it becomes the resolver's `taken`.
+        """
+        resolver = cls(taken)
+        for player in Player.objects.only("id", "name", "birth_date").order_by("id"):
+            resolver._players[player.pk] = player
+            resolver._index.setdefault(fold_name(player.name), player)
+            resolver.taken.add(player.pk)
+        # aliases are explicit, so they win over a colliding folded name
+        for key, player_id in PlayerAlias.objects.values_list("key", "player_id"):
+            if player_id in resolver._players:
+                resolver._index[key] = resolver._players[player_id]
+        return resolver
+
+    def get(self, name, default=None):
+        return self._index.get(fold_name(name), default)
+
+    def __contains__(self, name):
+        return fold_name(name) in self._index
+
+    def __getitem__(self, name):
+        player = self.get(name)
+        if player is None:
+            raise KeyError(name)
+        return player
+
+    def __setitem__(self, name, player):
+        self._players[player.pk] = player
+        self.taken.add(player.pk)
+        self._index[fold_name(name)] = player
+
+    def values(self):
+        return self._players.values()
+
+    def resolve(self, name, source=None):
+        """Return the Player for `name`, or None after recording the miss."""
+        player = self.get(name)
+        if player is None:
+            self.misses.setdefault(name, source)
+        return player
+
+    def add_alias(self, alias, player):
+        """Persist `alias` as another spelling of `player` and index it."""
+        key = fold_name(alias)
+        PlayerAlias.objects.update_or_create(key=key, defaults={"alias": alias, "player": player})
+        self[alias] = player
+
+    def miss_report(self):
+        """One line per unresolved name, sorted, with where it came from."""
+        return [
+            f"{name} ({source})" if source else name
+            for name, source in sorted(self.misses.items(), key=lambda item: str(item[0]))
+        ]
@@ -0,0 +1,63 @@
+import json
+
+# characters that can only continue a number, never follow a complete item
+NUMBER_TAIL = "0123456789.eE+-"
+
+
+def iter_json_array(filepath, chunk_size=1 << 16):
+    """Yield the items of a top-level JSON array one at a time.
+
+    The file is read in `chunk_size` pieces and only the unparsed tail is kept
+    in memory, so memory use does not grow with the size of the file.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(filepath, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip(chars):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        skip(" \t\r\n")
+        if pos >= len(buffer) or buffer[pos] != "[":
+            raise ValueError(f"{filepath}: expected a JSON array")
+        pos += 1
+
+        while True:
+            skip(" \t\r\n,")
+            if pos >= len(buffer):
+                raise ValueError(f"{filepath}: unexpected end of JSON array")
+            if buffer[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if not eof and (end == len(buffer) or buffer[end] in NUMBER_TAIL):
+                # a number at the end of the buffer may continue in the next chunk,
+                # and one cut after "-0." or "1e" decodes as its shorter prefix
+                fill()
+                continue
+
+            pos = end
+            yield item
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from players.identity import PlayerResolver
+from players.models import Player
+
+
+class Command(BaseCommand):
+    help = "Record another spelling of a player's name for the identity resolver"
+
+    def add_arguments(self, parser):
+        parser.add_argument("alias", type=str, help='Name as it appears in the source, e.g. "Lu Yen-Hsun"')
+        parser.add_argument("player_id", type=str, help="ID of the player it refers to")
+
+    def handle(self, *args, **options):
+        try:
+            player = Player.objects.get(pk=options["player_id"])
+        except Player.DoesNotExist:
+            raise CommandError(f"No player with id {options['player_id']}")
+
+        PlayerResolver().add_alias(options["alias"], player)
+        self.stdout.write(self.style.SUCCESS(f"✅ {options['alias']} → {player}"))
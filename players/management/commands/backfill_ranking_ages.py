@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from players.derived import backfill_ranking_ages
+
+
+class Command(BaseCommand):
+    help = "Recompute Ranking.age for every snapshot from the players' birth dates"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", nargs="+", type=str, help="Only these player IDs")
+
+    def handle(self, *args, **options):
+        updated = backfill_ranking_ages(options["players"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Recomputed age on {updated} ranking rows"))
@@ -0,0 +1,23 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from players.bundle import export_bundle
+
+
+class Command(BaseCommand):
+    help = "Dump players, stats, records and rankings into one compressed dataset bundle"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", type=str, default="data/break_point_bundle.zip", help="Bundle file to write")
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        manifest = export_bundle(path)
+
+        for table, info in manifest["tables"].items():
+            self.stdout.write(f"{table}: {info['rows']:,} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {path} ({os.path.getsize(path) / 1024 / 1024:,.1f} MB)"
+        ))
@@ -0,0 +1,152 @@
+import os
+import json
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+SYLLABLES = ["an", "bel", "cor", "da", "el", "fen", "gar", "hu", "ix", "jo", "ka", "lor",
+             "mi", "nov", "or", "pa", "quin", "ro", "sa", "tel", "u", "vic", "wen", "zu"]
+COUNTRIES = ["usa", "ita", "fra", "esp", "ger", "arg", "gbr", "jpn", "aus", "srb", "bra", "cze"]
+
+
+def synthetic_name(rng, taken):
+    while True:
+        first = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 3))).title()
+        last = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).title()
+        name = f"{first} {last}"
+        if name not in taken:
+            taken.add(name)
+            return name
+
+
+def signed(value, plus=""):
+    if value == 0:
+        return "-"
+    return f"{plus}{value}" if value > 0 else str(value)
+
+
+def player_entry(rng, name, birth_date, country):
+    """One players_data.json entry, shaped like scraping_players_data's output."""
+    height_cm = rng.randint(170, 205)
+    weight_kg = rng.randint(65, 95)
+    return {
+        "name": name,
+        "url": f"https://www.atptour.com/en/players/{name.lower().replace(' ', '-')}/x000/overview",
+        "Overview": {
+            "Country": country.upper(),
+            "Birthplace": "Synthetic City",
+            "Plays": rng.choice(["Right-Handed, Two-Handed Backhand", "Left-Handed, One-Handed Backhand"]),
+            "Coach": "-",
+            "Turned pro": str(birth_date.year + 18),
+        },
+        "Stats": {
+            "Serve": {
+                "Aces": str(rng.randint(0, 5000)),
+                "Double Faults": str(rng.randint(0, 2000)),
+                "1st Serve": f"{rng.randint(50, 70)}%",
+                "1st Serve Points Won": f"{rng.randint(60, 80)}%",
+                "2nd Serve Points Won": f"{rng.randint(40, 60)}%",
+                "Break Points Faced": str(rng.randint(0, 3000)),
+                "Break Points Saved": f"{rng.randint(50, 70)}%",
+                "Service Games Played": str(rng.randint(0, 8000)),
+                "Service Games Won": f"{rng.randint(70, 90)}%",
+                "Total Service Points Won": f"{rng.randint(55, 70)}%",
+            },
+            "Return": {
+                "1st Serve Return Points Won": f"{rng.randint(25, 35)}%",
+                "2nd Serve Return Points Won": f"{rng.randint(45, 55)}%",
+                "Break Points Opportunities": str(rng.randint(0, 4000)),
+                "Break Points Converted": f"{rng.randint(35, 45)}%",
+                "Return Games Played": str(rng.randint(0, 8000)),
+                "Return Games Won": f"{rng.randint(15, 30)}%",
+                "Return Points Won": f"{rng.randint(35, 42)}%",
+                "Total Points Won": f"{rng.randint(45, 55)}%",
+            },
+        },
+        "YTD": {
+            "Rank": "-",
+            "Move": "-",
+            "W-L": f"{rng.randint(0, 60)} - {rng.randint(0, 30)}",
+            "Titles": str(rng.randint(0, 5)),
+            "Prize Money": f"${rng.randint(0, 5_000_000):,}",
+        },
+        "Career": {
+            "W-L": f"{rng.randint(0, 600)} - {rng.randint(0, 300)}",
+            "Titles": str(rng.randint(0, 30)),
+            "Prize Money Singles & Doubles Combined": f"${rng.randint(0, 50_000_000):,}",
+        },
+        "birth_date": birth_date.isoformat(),
+        "weight_lbs": round(weight_kg * 2.2046),
+        "weight_kg": weight_kg,
+        "height_feet": int(height_cm / 30.48),
+        "height_inches": round(height_cm / 2.54) % 12,
+        "height_cm": height_cm,
+        "career_high_rank": rng.randint(1, 2000),
+        "career_high_rank_date": "2020-01-06",
+    }
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic players and weekly ranking JSON for import benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=2000, help="Number of players")
+        parser.add_argument("--weeks", type=int, default=52, help="Number of weekly ranking snapshots")
+        parser.add_argument("--start", type=str, default="2020-01-06", help="Date of the first week (YYYY-MM-DD)")
+        parser.add_argument("--output", type=str, default="data/synthetic", help="Output folder")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        output = options["output"]
+        rankings_dir = os.path.join(output, "rankings")
+        os.makedirs(rankings_dir, exist_ok=True)
+
+        taken = set()
+        players = []
+        for _ in range(options["players"]):
+            birth_date = date(1985, 1, 1) + timedelta(days=rng.randint(0, 7000))
+            players.append((synthetic_name(rng, taken), birth_date, rng.choice(COUNTRIES)))
+
+        players_path = os.path.join(output, "players_data.json")
+        with open(players_path, "w", encoding="utf-8") as f:
+            json.dump([player_entry(rng, *p) for p in players], f, ensure_ascii=False, indent=2)
+
+        bios = {name: (birth_date, country) for name, birth_date, country in players}
+        points = {name: rng.randint(1, 12000) for name in bios}
+        previous_rank = {}
+        week = date.fromisoformat(options["start"])
+        for _ in range(options["weeks"]):
+            for name in points:
+                points[name] = max(1, points[name] + rng.randint(-300, 300))
+            order = sorted(points, key=points.get, reverse=True)
+
+            # rows in the exact shape scrap_new_ranking writes
+            week_rows = []
+            for rank, name in enumerate(order, start=1):
+                birth_date, country = bios[name]
+                # negative is a climb, as on the ATP site (the ranking template shows it as "↑")
+                move = rank - previous_rank.get(name, rank)
+                week_rows.append({
+                    "Rank": str(rank),
+                    "Rank_change": signed(move),
+                    "Player": name,
+                    "Age": str((week - birth_date).days // 365),
+                    # the scraper strips the separators from Points, but not from Dropping or Next Best
+                    "Points": str(points[name]),
+                    "Earn_Drop": signed(rng.randint(-500, 500), plus="+"),
+                    "Tournaments": str(rng.randint(5, 30)),
+                    "Dropping": f"{rng.randint(10, 1000):,}" if rng.random() < 0.1 else "-",
+                    "Next Best": f"{rng.randint(10, 500):,}" if rng.random() < 0.05 else "-",
+                    "Country": country,
+                })
+            previous_rank = {name: rank for rank, name in enumerate(order, start=1)}
+
+            with open(os.path.join(rankings_dir, f"{week.isoformat()}.json"), "w", encoding="utf-8") as f:
+                json.dump(week_rows, f, ensure_ascii=False, indent=2)
+            week += timedelta(days=7)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {len(players)} players to {players_path} and {options['weeks']} weeks to {rankings_dir}"
+        ))
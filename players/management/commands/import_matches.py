@@ -0,0 +1,75 @@
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from players.identity import PlayerResolver
+from players.management.commands.import_tennis_data import (
+    file_changed, file_fingerprint, load_manifest, record_import,
+)
+from players.matches import import_match_file, rebuild_head_to_head
+from players.publishing import touch_publish_stamp
+
+
+def match_files(paths):
+    """CSV files named by `paths` (files, or folders searched one level deep), in name order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".csv"))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise CommandError(f"{path} does not exist")
+    return files
+
+
+class Command(BaseCommand):
+    help = "Import historical ATP match results (tennis_atp CSV layout) and update the head-to-head index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", help="Match CSV files, or folders of them (e.g. atp_matches_2024.csv)")
+        parser.add_argument("--force", action="store_true", help="Re-read files even if unchanged")
+        parser.add_argument("--rebuild-h2h", action="store_true",
+                            help="Recompute the head-to-head index from every stored match")
+        parser.add_argument("--build-pairwise", action="store_true",
+                            help="Rebuild the pairwise prediction tables afterwards (a few minutes)")
+
+    def handle(self, *args, **options):
+        paths = match_files(options["paths"])
+        if not options["force"]:
+            manifest = load_manifest()
+            changed = [path for path in paths if file_changed(path, manifest)]
+            if len(changed) < len(paths):
+                self.stdout.write(f"Skipped {len(paths) - len(changed)} unchanged files.")
+            paths = changed
+
+        resolver = PlayerResolver.load()
+        inserted = 0
+        for path in paths:
+            fingerprint = file_fingerprint(path)
+            rows, new, skipped = import_match_file(path, resolver)
+            record_import(fingerprint, rows)
+            inserted += new
+            self.stdout.write(f"{os.path.basename(path)}: {new} new matches, {skipped} rows skipped")
+
+        misses = resolver.miss_report()
+        if misses:
+            self.stdout.write(f"{len(misses)} player names not found (run add_player_alias for the ones that matter)")
+            if options["verbosity"] > 1:
+                for line in misses:
+                    self.stdout.write(f"  {line}")
+
+        if options["rebuild_h2h"]:
+            pairs = rebuild_head_to_head()
+            self.stdout.write(f"Head-to-head index rebuilt: {pairs} pairs")
+
+        if inserted or options["rebuild_h2h"]:
+            # cached predictions and pairwise tables were computed with the old head-to-head records
+            touch_publish_stamp()
+            if options["build_pairwise"]:
+                self.stdout.write("Rebuilding pairwise prediction tables...")
+                call_command("build_pairwise", stdout=self.stdout)
+            else:
+                self.stdout.write("Pairwise prediction tables are stale until build_pairwise runs.")
+        self.stdout.write(self.style.SUCCESS(f"✅ {inserted} matches imported from {len(paths)} files"))
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from players.identity import PlayerResolver
 from players.models import Player
 import os
 
@@ -9,20 +10,29 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         base_folder = "data/media/photos_by_name"  # adjust your actual folder path here
 
+        resolver = PlayerResolver.load()
+
         # Iterate through photos
-        count = 0
+        updated = []
         for filename in os.listdir(base_folder):
             if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
                 continue
 
-            name = os.path.splitext(filename)[0].replace("_", " ").title()
-            try:
-                player = Player.objects.get(name=name)
-                player.photo.name = f"players/photos_by_name/{filename}"
-                player.save(update_fields=["photo"])
-                count += 1
-                self.stdout.write(self.style.SUCCESS(f"✅ Added photo for {name}"))
-            except Player.DoesNotExist:
-                self.stdout.write(self.style.WARNING(f"⚠️ No player found for {name}"))
-
-        self.stdout.write(self.style.SUCCESS(f"\n✅ Imported {count} photos total"))
+            name = os.path.splitext(filename)[0].replace("_", " ")
+            player = resolver.resolve(name, source=filename)
+            if player is None:
+                continue
+
+            player.photo = f"players/photos_by_name/{filename}"
+            updated.append(player)
+            self.stdout.write(self.style.SUCCESS(f"✅ Added photo for {player.name}"))
+
+        Player.objects.bulk_update(updated, ["photo"], batch_size=500)
+
+        misses = resolver.miss_report()
+        if misses:
+            self.stdout.write(self.style.WARNING(f"⚠️ No player found for {len(misses)} photos:"))
+            for line in misses:
+                self.stdout.write(self.style.WARNING(f"   {line}"))
+
+        self.stdout.write(self.style.SUCCESS(f"\n✅ Imported {len(updated)} photos total"))
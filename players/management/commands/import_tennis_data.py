@@ -1,11 +1,32 @@
 import os
 import json
+import hashlib
+import time
+import resource
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
 
-from players.models import Player, PlayerStat, PlayerRecord, Ranking
+from players.derived import backfill_ranking_ages, refresh_player_features
+from players.identity import PlayerResolver, fold_name
+from players.jsonstream import iter_json_array
+from players.models import (
+    Player, PlayerStat, PlayerRecord, Ranking, RankingStaging, RankingWeek, ImportManifest, PlayerAlias,
+    Match, HeadToHead, PlayerFeatures, generate_player_ids,
+)
+from players.publishing import (
+    RankingValidationError, clear_stage, prepare_week, publish_week, stage_rankings, touch_publish_stamp,
+)
+from players.ranking_archive import MISSING, archive_files, is_archive, iter_snapshots
 
 
 
@@ -59,144 +80,689 @@ def calculate_age(birth_date, on_date=None):
     )
 
 
+BATCH_SIZE = 1000
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def load_player_map(taken=None):
+    """Name -> Player resolver (id, name, birth_date only), loaded with one query plus aliases.
+
+    If a `taken` set is given, every existing player ID is added to it.
+    """
+    return PlayerResolver.load(taken)
+
+
 # ---------- Import players + stats ----------
+PLAYER_FIELDS = [
+    "url", "birth_date", "country", "birthplace", "plays", "coach", "turned_pro",
+    "weight_lbs", "weight_kg", "height_cm", "height_feet", "height_inches",
+    "career_high_rank", "career_high_rank_date",
+]
+STAT_FIELDS = [
+    "aces", "double_faults", "first_serve_pct", "first_serve_points_won",
+    "second_serve_points_won", "break_points_faced", "break_points_saved",
+    "service_games_played", "service_games_won", "total_service_points_won",
+    "first_serve_return_points_won", "second_serve_return_points_won",
+    "break_points_opportunities", "break_points_converted", "return_games_played",
+    "return_games_won", "return_points_won", "total_points_won",
+]
+RECORD_FIELDS = ["rank", "move", "wl_record", "titles", "prize_money"]
+
+
+def build_player_rows(row, player_id):
+    """Turn one players_data.json entry into unsaved Player, PlayerStat and PlayerRecord objects."""
+    # Safe dicts
+    overview = row.get("Overview") or {}
+    if not isinstance(overview, dict):
+        overview = {}
+
+    stats = row.get("Stats") or {}
+    if not isinstance(stats, dict):
+        stats = {}
+
+    serve = stats.get("Serve") or {}
+    if not isinstance(serve, dict):
+        serve = {}
+
+    ret = stats.get("Return") or {}
+    if not isinstance(ret, dict):
+        ret = {}
+
+    ytd = row.get("YTD") or {}
+    if not isinstance(ytd, dict):
+        ytd = {}
+
+    career = row.get("Career") or {}
+    if not isinstance(career, dict):
+        career = {}
+
+    # ---- Player ----
+    player = Player(
+        id=player_id,
+        name=normalize_name(row["name"]),
+        url=row.get("url"),
+        birth_date=to_date(row.get("birth_date")),
+        country=overview.get("Country"),
+        birthplace=overview.get("Birthplace"),
+        plays=overview.get("Plays"),
+        coach=overview.get("Coach"),
+        turned_pro=to_int(overview.get("Turned pro")),
+        weight_lbs=to_int(row.get("weight_lbs")),
+        weight_kg=to_int(row.get("weight_kg")),
+        height_cm=to_int(row.get("height_cm")),
+        height_feet=to_int(row.get("height_feet")),
+        height_inches=to_int(row.get("height_inches")),
+        career_high_rank=to_int(row.get("career_high_rank")),
+        career_high_rank_date=to_date(row.get("career_high_rank_date")),
+    )
+
+    # ---- Stats ----
+    stat = PlayerStat(
+        player_id=player_id,
+        aces=to_int(serve.get("Aces")),
+        double_faults=to_int(serve.get("Double Faults")),
+        first_serve_pct=to_float(serve.get("1st Serve")),
+        first_serve_points_won=to_float(serve.get("1st Serve Points Won")),
+        second_serve_points_won=to_float(serve.get("2nd Serve Points Won")),
+        break_points_faced=to_int(serve.get("Break Points Faced")),
+        break_points_saved=to_float(serve.get("Break Points Saved")),
+        service_games_played=to_int(serve.get("Service Games Played")),
+        service_games_won=to_float(serve.get("Service Games Won")),
+        total_service_points_won=to_float(serve.get("Total Service Points Won")),
+
+        first_serve_return_points_won=to_float(ret.get("1st Serve Return Points Won")),
+        second_serve_return_points_won=to_float(ret.get("2nd Serve Return Points Won")),
+        break_points_opportunities=to_int(ret.get("Break Points Opportunities")),
+        break_points_converted=to_float(ret.get("Break Points Converted")),
+        return_games_played=to_int(ret.get("Return Games Played")),
+        return_games_won=to_float(ret.get("Return Games Won")),
+        return_points_won=to_float(ret.get("Return Points Won")),
+        total_points_won=to_float(ret.get("Total Points Won")),
+    )
+
+    # ---- Records ----
+    ytd_record = PlayerRecord(
+        player_id=player_id, season="YTD",
+        rank=to_int(ytd.get("Rank")),
+        move=ytd.get("Move") if ytd.get("Move") != "-" else None,
+        wl_record=ytd.get("W-L"),
+        titles=to_int(ytd.get("Titles")),
+        prize_money=ytd.get("Prize Money"),
+    )
+
+    career_record = PlayerRecord(
+        player_id=player_id, season="Career",
+        rank=None,
+        move=None,
+        wl_record=career.get("W-L"),
+        titles=to_int(career.get("Titles")),
+        prize_money=career.get("Prize Money Singles & Doubles Combined"),
+    )
+
+    return player, stat, [ytd_record, career_record]
+
+
 def import_players(filepath):
-    with open(filepath, "r", encoding="utf-8") as f:
-        players = json.load(f)
-
-    for row in players:
-        # Safe dicts
-        overview = row.get("Overview") or {}
-        if not isinstance(overview, dict):
-            overview = {}
-
-        stats = row.get("Stats") or {}
-        if not isinstance(stats, dict):
-            stats = {}
-
-        serve = stats.get("Serve") or {}
-        if not isinstance(serve, dict):
-            serve = {}
-
-        ret = stats.get("Return") or {}
-        if not isinstance(ret, dict):
-            ret = {}
-
-        ytd = row.get("YTD") or {}
-        if not isinstance(ytd, dict):
-            ytd = {}
-
-        career = row.get("Career") or {}
-        if not isinstance(career, dict):
-            career = {}
-
-        # ---- Player ----
-        player, _ = Player.objects.update_or_create(
-            name=normalize_name(row["name"]),
-            defaults={
-                "url": row.get("url"),
-                "birth_date": to_date(row.get("birth_date")),
-                "country": overview.get("Country"),
-                "birthplace": overview.get("Birthplace"),
-                "plays": overview.get("Plays"),
-                "coach": overview.get("Coach"),
-                "turned_pro": to_int(overview.get("Turned pro")),
-                "weight_lbs": to_int(row.get("weight_lbs")),
-                "weight_kg": to_int(row.get("weight_kg")),
-                "height_cm": to_int(row.get("height_cm")),
-                "height_feet": to_int(row.get("height_feet")),
-                "height_inches": to_int(row.get("height_inches")),
-                "career_high_rank": to_int(row.get("career_high_rank")),
-                "career_high_rank_date": to_date(row.get("career_high_rank_date")),
-            }
-        )
+    """Upsert players, stats and records in bulk: one lookup query, then a few INSERT ... ON CONFLICT per batch.
 
-        # ---- Stats ----
-        PlayerStat.objects.update_or_create(
-            player=player,
-            defaults={
-                "aces": to_int(serve.get("Aces")),
-                "double_faults": to_int(serve.get("Double Faults")),
-                "first_serve_pct": to_float(serve.get("1st Serve")),
-                "first_serve_points_won": to_float(serve.get("1st Serve Points Won")),
-                "second_serve_points_won": to_float(serve.get("2nd Serve Points Won")),
-                "break_points_faced": to_int(serve.get("Break Points Faced")),
-                "break_points_saved": to_float(serve.get("Break Points Saved")),
-                "service_games_played": to_int(serve.get("Service Games Played")),
-                "service_games_won": to_float(serve.get("Service Games Won")),
-                "total_service_points_won": to_float(serve.get("Total Service Points Won")),
-
-                "first_serve_return_points_won": to_float(ret.get("1st Serve Return Points Won")),
-                "second_serve_return_points_won": to_float(ret.get("2nd Serve Return Points Won")),
-                "break_points_opportunities": to_int(ret.get("Break Points Opportunities")),
-                "break_points_converted": to_float(ret.get("Break Points Converted")),
-                "return_games_played": to_int(ret.get("Return Games Played")),
-                "return_games_won": to_float(ret.get("Return Games Won")),
-                "return_points_won": to_float(ret.get("Return Points Won")),
-                "total_points_won": to_float(ret.get("Total Points Won")),
-            }
-        )
+    Ranking ages of players whose birth date changed are recomputed afterwards.
+    """
+    player_map = load_player_map()
+    count = 0
+    birth_date_changed = []
 
-        # ---- Records ----
-        PlayerRecord.objects.update_or_create(
-            player=player, season="YTD",
-            defaults={
-                "rank": to_int(ytd.get("Rank")),
-                "move": ytd.get("Move") if ytd.get("Move") != "-" else None,
-                "wl_record": ytd.get("W-L"),
-                "titles": to_int(ytd.get("Titles")),
-                "prize_money": ytd.get("Prize Money"),
-            }
-        )
+    with transaction.atomic():
+        for batch in chunked(iter_json_array(filepath), BATCH_SIZE):
+            # last entry wins for names repeated inside a batch
+            rows = {fold_name(row["name"]): row for row in batch}.values()
+            new_names = [row["name"] for row in rows if row["name"] not in player_map]
+            new_ids = dict(zip(new_names, generate_player_ids(len(new_names), player_map.taken)))
+
+            players, stats, records = [], [], []
+            for row in rows:
+                existing = player_map.get(row["name"])
+                player_id = existing.pk if existing else new_ids[row["name"]]
+                player, stat, player_records = build_player_rows(row, player_id)
+                if existing and existing.birth_date != player.birth_date:
+                    birth_date_changed.append(player_id)
+                players.append(player)
+                stats.append(stat)
+                records.extend(player_records)
+
+            Player.objects.bulk_create(
+                players, update_conflicts=True, unique_fields=["id"], update_fields=PLAYER_FIELDS,
+            )
+            PlayerStat.objects.bulk_create(
+                stats, update_conflicts=True, unique_fields=["player"], update_fields=STAT_FIELDS,
+            )
+            PlayerRecord.objects.bulk_create(
+                records, update_conflicts=True, unique_fields=["player", "season"],
+                update_fields=RECORD_FIELDS,
+            )
+            for player in players:
+                player_map[player.name] = player
+            count += len(players)
 
-        PlayerRecord.objects.update_or_create(
-            player=player, season="Career",
-            defaults={
-                "rank": None,
-                "move": None,
-                "wl_record": career.get("W-L"),
-                "titles": to_int(career.get("Titles")),
-                "prize_money": career.get("Prize Money Singles & Doubles Combined"),
-            }
-        )
+        if birth_date_changed:
+            backfill_ranking_ages(birth_date_changed)
+    return count
 
 
 # ---------- Import ranking snapshots ----------
-def import_ranking_file(filepath):
+RANKING_FIELDS = [
+    "rank", "rank_change", "age", "points", "earn_drop",
+    "tournaments", "dropping", "next_best", "country",
+]
+
+
+def normalize_ranking_row(row):
+    return {
+        "name": normalize_name(row.get("Player")),
+        "rank": to_int(row.get("Rank")),
+        "rank_change": to_int(row.get("Rank_change")),
+        "points": to_int(row.get("Points")),
+        "earn_drop": to_int(row.get("Earn_Drop")),
+        "tournaments": to_int(row.get("Tournaments")),
+        "dropping": to_int(row.get("Dropping")),
+        "next_best": to_int(row.get("Next Best")),
+        "country": row.get("Country"),
+    }
+
+
+def snapshot_date_from_filename(filepath):
     filename = os.path.basename(filepath)
-    snapshot_date = datetime.strptime(filename.replace(".json", ""), "%Y-%m-%d").date()
+    return datetime.strptime(filename.replace(".json", ""), "%Y-%m-%d").date()
+
+
+def create_missing_players(rows, player_map):
+    """Create every player of `rows` not yet in `player_map` with a single bulk insert.
+
+    New IDs are allocated from the IDs `player_map` already knows, so this
+    costs no query beyond the insert.
+    """
+    missing = {}
+    for row in rows:
+        name = row["name"]
+        if name and name not in player_map:
+            missing.setdefault(fold_name(name), (name, row.get("country")))
+    if not missing:
+        return 0
+
+    new_ids = generate_player_ids(len(missing), player_map.taken)
+    new_players = [
+        Player(id=player_id, name=name, country=country)
+        for player_id, (name, country) in zip(new_ids, missing.values())
+    ]
+    Player.objects.bulk_create(new_players, batch_size=BATCH_SIZE)
+    for player in new_players:
+        player_map[player.name] = player
+    return len(new_players)
+
+
+def build_rankings(snapshot_date, rows, player_map, seen):
+    """Unsaved Ranking objects for `rows`, skipping unknown names and players already in `seen`."""
+    rankings = []
+    for row in rows:
+        player = player_map.get(row["name"])
+        if player is None or player.pk in seen:
+            continue
+        seen.add(player.pk)
+        rankings.append(Ranking(
+            player_id=player.pk,
+            date=snapshot_date,
+            age=calculate_age(player.birth_date, snapshot_date),
+            **{field: row[field] for field in RANKING_FIELDS if field != "age"},
+        ))
+    return rankings
+
+
+def upsert_rankings(rankings):
+    Ranking.objects.bulk_create(
+        rankings,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["player", "date"],
+        update_fields=RANKING_FIELDS,
+    )
+
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        rankings = json.load(f)
+def load_ranking_week(snapshot_date, rows, player_map):
+    """Load one week of normalized ranking rows in batched inserts, without publishing it.
 
+    `rows` may be a generator: each batch is written as soon as it is read.
+    A week that is not live yet is upserted straight into Ranking; a
+    published week is loaded into RankingStaging and swapped in on publish.
+    Returns (staged, rows loaded).
+    """
+    staged = prepare_week(snapshot_date)
+    seen = set()
     with transaction.atomic():
-        for row in rankings:
-            player, _ = Player.objects.get_or_create(
-                name=normalize_name(row["Player"]),
-                defaults={"country": row.get("Country")}
-            )
+        for batch in chunked(rows, BATCH_SIZE):
+            create_missing_players(batch, player_map)
+            rankings = build_rankings(snapshot_date, batch, player_map, seen)
+            if staged:
+                stage_rankings(rankings, BATCH_SIZE)
+            else:
+                upsert_rankings(rankings)
+    return staged, len(seen)
+
+
+def write_ranking_snapshot(snapshot_date, rows, player_map, record=None):
+    """Load one week of normalized ranking rows, then validate and publish it.
+
+    `record(rows)`, if given, runs inside the publish transaction.
+    """
+    staged, count = load_ranking_week(snapshot_date, rows, player_map)
+    publish_week(snapshot_date, staged, record=partial(record, count) if record else None)
+    return count
+
+
+def iter_ranking_file(filepath):
+    return (normalize_ranking_row(row) for row in iter_json_array(filepath))
 
-            Ranking.objects.update_or_create(
-                player=player,
-                date=snapshot_date,
-                defaults={
-                    "rank": to_int(row.get("Rank")),
-                    "rank_change": row.get("Rank_change") if row.get("Rank_change") != "-" else None,
-                    "age": calculate_age(player.birth_date, snapshot_date),
-                    "points": to_int(row.get("Points")),
-                    "earn_drop": row.get("Earn_Drop") if row.get("Earn_Drop") != "-" else None,
-                    "tournaments": to_int(row.get("Tournaments")),
-                    "dropping": row.get("Dropping") if row.get("Dropping") != "-" else None,
-                    "next_best": row.get("Next Best") if row.get("Next Best") != "-" else None,
-                    "country": row.get("Country"),
-                }
-            )
+
+# ---------- Parallel ranking import ----------
+def concurrent_writes():
+    """Whether several connections can load weeks at once.
+
+    SQLite fails a deferred transaction with "database is locked" as soon
+    as a second connection writes, unless transactions start IMMEDIATE.
+    """
+    options = connection.settings_dict.get("OPTIONS", {})
+    return connection.vendor != "sqlite" or options.get("transaction_mode") == "IMMEDIATE"
+
+
+# state of a --workers process, set up once by init_ranking_loader
+_loader = {}
+
+
+def init_ranking_loader(player_lock):
+    """Process pool initializer: a connection of its own and the player index, loaded once."""
+    connections.close_all()
+    _loader["lock"] = player_lock
+    _loader["players"] = load_player_map()
+
+
+def load_ranking_file(filepath):
+    """Parse, resolve and load one snapshot in a worker process, unpublished.
+
+    Returns (fingerprint, date, staged, rows); the file is fingerprinted before it is read.
+
+    New players are created under the pool's lock, after reloading the
+    index so players another worker has just created are reused.
+    """
+    fingerprint = file_fingerprint(filepath)
+    snapshot_date = snapshot_date_from_filename(filepath)
+    rows = list(iter_ranking_file(filepath))
+    if any(row["name"] and row["name"] not in _loader["players"] for row in rows):
+        with _loader["lock"]:
+            _loader["players"] = load_player_map()
+            create_missing_players(rows, _loader["players"])
+    staged, count = load_ranking_week(snapshot_date, rows, _loader["players"])
+    return fingerprint, snapshot_date, staged, count
+
+
+# ---------- Reset ----------
+# children before parents; --clear empties all of these
+CLEAR_MODELS = [
+    Match, HeadToHead, PlayerFeatures, Ranking, RankingStaging, RankingWeek, PlayerRecord, PlayerStat,
+    PlayerAlias, Player, ImportManifest,
+]
+
+
+def clear_tables(models=CLEAR_MODELS):
+    """Empty `models` in one transaction using the backend's flush SQL.
+
+    That is TRUNCATE ... RESTART IDENTITY on PostgreSQL and DELETE plus a
+    sequence reset elsewhere; no rows are loaded into Python.
+    """
+    tables = [model._meta.db_table for model in models]
+    sql_list = connection.ops.sql_flush(no_style(), tables, reset_sequences=True)
+    connection.ops.execute_sql_flush(sql_list)
+    transaction.on_commit(touch_publish_stamp)
+
+    if connection.vendor == "postgresql":
+        # refresh planner statistics so the following import doesn't plan against the old row counts
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE " + ", ".join(connection.ops.quote_name(t) for t in tables))
+
+
+# ---------- Import manifest ----------
+def file_sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_changed(filepath, manifest):
+    """True when `filepath` has no manifest entry or its content differs from the recorded hash."""
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    entry = manifest.get(path)
+    if entry is None:
+        return True
+    if entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+        return False
+    if entry.size == stat.st_size and entry.sha256 == file_sha256(path):
+        # touched but identical: remember the new mtime so the hash is skipped next time
+        entry.mtime = stat.st_mtime
+        entry.save(update_fields=["mtime"])
+        return False
+    return True
+
+
+def file_fingerprint(filepath):
+    """Path, size, mtime and hash of a file, taken before it is read, for record_import."""
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_sha256(path)}
+
+
+def record_import(fingerprint, rows):
+    """Save a file's manifest entry; a file changed since `fingerprint` was taken is re-imported next run."""
+    ImportManifest.objects.update_or_create(
+        path=fingerprint["path"],
+        defaults={
+            "size": fingerprint["size"],
+            "mtime": fingerprint["mtime"],
+            "sha256": fingerprint["sha256"],
+            "rows": rows,
+        },
+    )
+
+
+def load_manifest():
+    return {entry.path: entry for entry in ImportManifest.objects.all()}
+
+
+def import_ranking_file(filepath, player_map=None):
+    """Import one snapshot; its manifest entry is written in the transaction that publishes it."""
+    fingerprint = file_fingerprint(filepath)
+    snapshot_date = snapshot_date_from_filename(filepath)
+    if player_map is None:
+        player_map = load_player_map()
+
+    return write_ranking_snapshot(
+        snapshot_date, iter_ranking_file(filepath), player_map, record=partial(record_import, fingerprint),
+    )
+
+
+# ---------- Delta import ----------
+def ranking_values(ranking):
+    return tuple(getattr(ranking, field) for field in RANKING_FIELDS)
 
 
-def import_rankings(folder):
-    for filename in os.listdir(folder):
-        if filename.endswith(".json"):
-            import_ranking_file(os.path.join(folder, filename))
+def import_ranking_delta(filepath, player_map=None):
+    """Import one snapshot, writing only rows that differ from what is stored for that week.
+
+    This only saves work on a re-import of a stored week. A new week has
+    nothing stored to diff against, so every row is written and everyone's
+    derived data (player features, prediction caches, pairwise tables, all
+    keyed by the latest week) goes stale; the diff against the previous
+    week (entrants, leavers and movers) is reported, not used. Returns a
+    change log dict. When nothing differs, the live week is left alone:
+    nothing is published, so caches and derived tables stay valid.
+    """
+    fingerprint = file_fingerprint(filepath)
+    snapshot_date = snapshot_date_from_filename(filepath)
+    rows = list(iter_ranking_file(filepath))
+    if player_map is None:
+        player_map = load_player_map()
+
+    staged = prepare_week(snapshot_date)
+    with transaction.atomic():
+        create_missing_players(rows, player_map)
+        current = {r.player_id: r for r in build_rankings(snapshot_date, rows, player_map, set())}
+
+        stored = {r.player_id: r for r in Ranking.objects.filter(date=snapshot_date)}
+        changed = [
+            ranking for player_id, ranking in current.items()
+            if player_id not in stored or ranking_values(stored[player_id]) != ranking_values(ranking)
+        ]
+        removed = [player_id for player_id in stored if player_id not in current]
+
+        if staged:
+            stage_rankings(changed, BATCH_SIZE)
+        else:
+            upsert_rankings(changed)
+
+    # Predictions only read the latest week: re-importing it affects the changed players,
+    # re-importing an older live week affects nobody, and a new week affects everyone.
+    if not staged:
+        affected = None
+    elif RankingWeek.objects.filter(is_published=True, date__gt=snapshot_date).exists():
+        affected = []
+    else:
+        affected = [r.player_id for r in changed] + removed
+
+    if changed or removed or not staged:
+        publish_week(
+            snapshot_date, staged, complete=not staged, removed=removed,
+            record=partial(record_import, fingerprint, len(current)), player_ids=affected,
+        )
+    else:
+        record_import(fingerprint, len(current))
+
+    previous_date = (
+        Ranking.objects.published().filter(date__lt=snapshot_date).order_by("-date")
+        .values_list("date", flat=True).first()
+    )
+    previous = dict(
+        Ranking.objects.filter(date=previous_date).values_list("player_id", "rank")
+    ) if previous_date else {}
+
+    names = {player.pk: player.name for player in player_map.values()}
+    entrants = [
+        {"player_id": pid, "name": names.get(pid), "rank": r.rank}
+        for pid, r in current.items() if pid not in previous
+    ]
+    leavers = [
+        {"player_id": pid, "name": names.get(pid), "rank": rank}
+        for pid, rank in previous.items() if pid not in current
+    ]
+    movers = [
+        {"player_id": pid, "name": names.get(pid), "from": previous[pid], "to": r.rank}
+        for pid, r in current.items() if pid in previous and previous[pid] != r.rank
+    ]
+
+    return {
+        "date": snapshot_date.isoformat(),
+        "previous_date": previous_date.isoformat() if previous_date else None,
+        "rows": len(current),
+        "written": len(changed),
+        "deleted": len(removed),
+        # players whose stored row for this week was written or removed
+        "changed_players": [r.player_id for r in changed] + removed,
+        # players whose predictions changed; None means everyone's
+        "affected_players": affected,
+        "entrants": entrants,
+        "leavers": leavers,
+        "movers": movers,
+    }
+
+
+def ranking_files(folder):
+    """Snapshot files of `folder` in chronological order."""
+    paths = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".json")]
+    return sorted(paths, key=snapshot_date_from_filename)
+
+
+def archive_ranking_rows(columns):
+    """Normalized ranking rows (as normalize_ranking_row builds them) for one archived week."""
+    names = [normalize_name(str(name)) for name in columns["names"]]
+    countries = [str(country) for country in columns["countries"]]
+    ints = {
+        field: [None if value == MISSING else value for value in columns[field].tolist()]
+        for field in [
+            "rank", "rank_change", "points", "earn_drop", "tournaments", "dropping", "next_best",
+        ]
+    }
+    return [
+        {
+            "name": names[player] if player >= 0 else None,
+            "country": countries[country] if country >= 0 else None,
+            **{field: values[i] for field, values in ints.items()},
+        }
+        for i, (player, country) in enumerate(
+            zip(columns["player"].tolist(), columns["country"].tolist())
+        )
+    ]
+
+
+def import_ranking_archive(folder, force=False):
+    """Import the yearly columnar archive of `folder`; returns (rows, files imported, files skipped)."""
+    paths = archive_files(folder)
+    manifest = {} if force else load_manifest()
+    player_map = load_player_map()
+    total = skipped = 0
+
+    for path in paths:
+        if not force and not file_changed(path, manifest):
+            skipped += 1
+            continue
+        fingerprint = file_fingerprint(path)
+        rows = 0
+        weeks = iter_snapshots(path)
+        week = next(weeks, None)
+        while week is not None:
+            snapshot_date, columns = week
+            week = next(weeks, None)
+            staged, count = load_ranking_week(snapshot_date, archive_ranking_rows(columns), player_map)
+            rows += count
+            # the file is recorded in the transaction that publishes its last week
+            publish_week(snapshot_date, staged, record=None if week else partial(record_import, fingerprint, rows))
+        total += rows
+    return total, len(paths) - skipped, skipped
+
+
+def import_rankings(folder, workers=1, force=False):
+    """Import every new or changed snapshot of `folder`; returns (rows, files imported, files skipped)."""
+    if is_archive(folder):
+        return import_ranking_archive(folder, force)
+
+    paths = ranking_files(folder)
+    if not force:
+        manifest = load_manifest()
+        changed = [path for path in paths if file_changed(path, manifest)]
+        skipped = len(paths) - len(changed)
+        paths = changed
+    else:
+        skipped = 0
+
+    total = 0
+    if workers <= 1 or not concurrent_writes():
+        player_map = load_player_map()
+        for path in paths:
+            total += import_ranking_file(path, player_map)
+        return total, len(paths), skipped
+
+    # Each worker parses, resolves and loads whole weeks through its own connection, one
+    # transaction per file. This process publishes them in date order. At most two files
+    # per worker are in flight, so loaded weeks never pile up here.
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=context,
+        initializer=init_ranking_loader, initargs=(context.Lock(),),
+    )
+    remaining = iter(paths)
+    in_flight = deque(
+        (path, executor.submit(load_ranking_file, path)) for path in islice(remaining, 2 * workers)
+    )
+    try:
+        while in_flight:
+            path, future = in_flight.popleft()
+            fingerprint, snapshot_date, staged, count = future.result()
+            publish_week(snapshot_date, staged, record=partial(record_import, fingerprint, count))
+            total += count
+            for path in islice(remaining, 1):
+                in_flight.append((path, executor.submit(load_ranking_file, path)))
+    except BaseException:
+        executor.shutdown(cancel_futures=True)
+        # weeks the other workers already staged won't be published now
+        for _, future in in_flight:
+            if not future.cancelled() and future.exception() is None:
+                _, snapshot_date, staged, _ = future.result()
+                if staged:
+                    clear_stage(snapshot_date)
+        raise
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return total, len(paths), skipped
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def reset_peak_rss():
+    """Restart this process's peak RSS (VmHWM) at its current RSS; False where Linux /proc isn't available."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb():
+    """VmHWM since the last reset_peak_rss(), else the process-lifetime peak."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@contextmanager
+def measure(results, phase):
+    """Time a phase and count its queries; the caller fills in "rows" and "files".
+
+    peak_rss_mb is this process's peak during the phase where /proc allows
+    resetting it (the process-lifetime peak elsewhere). workers_peak_rss_mb
+    is the largest --workers process that exited during the phase.
+    """
+    stats = {"rows": 0, "files": 0}
+    counter = QueryCounter()
+    per_phase = reset_peak_rss()
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    started = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        yield stats
+
+    stats["wall_s"] = round(time.perf_counter() - started, 3)
+    stats["queries"] = counter.count
+    stats["rows_per_s"] = round(stats["rows"] / stats["wall_s"]) if stats["wall_s"] else None
+    stats["queries_per_file"] = round(counter.count / stats["files"], 1) if stats["files"] else None
+    stats["peak_rss_mb"] = round(peak_rss_kb() / 1024, 1)
+    stats["peak_rss_scope"] = "phase" if per_phase else "process"
+    # RUSAGE_CHILDREN keeps the largest child ever waited for, so only a new maximum is this phase's
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    stats["workers_peak_rss_mb"] = round(children / 1024, 1) if children > children_before else None
+    results[phase] = stats
+
+
+def report(stdout, stats):
+    stdout.write(
+        f"{stats['rows']} rows in {stats['wall_s']:.2f}s ({stats['rows_per_s'] or 0:,} rows/s, "
+        f"{stats['queries']} queries)"
+    )
 
 
 # ---------- Management command ----------
@@ -205,46 +771,135 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--players", type=str, help="Path to players JSON file")
-        parser.add_argument("--rankings", type=str, help="Path to rankings folder")
+        parser.add_argument("--rankings", type=str, help="Path to rankings folder (JSON files or yearly archive)")
         parser.add_argument("--clear", action="store_true", help="Delete old data before import")
         parser.add_argument("--add_latest_ranking", type=str, help="Path to rankings folder")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Processes that parse and load ranking files, each with its own connection")
+        parser.add_argument("--force", action="store_true", help="Re-import files even if unchanged")
+        parser.add_argument("--delta", action="store_true",
+                            help="With --add_latest_ranking: when the week is already stored, only write the rows "
+                                 "that changed. A new week is still written in full and refreshes everyone's "
+                                 "derived data; the previous-week diff is only reported")
+        parser.add_argument("--changelog", type=str, help="With --delta: write the change log JSON here")
+        parser.add_argument("--build-pairwise", action="store_true",
+                            help="Rebuild the pairwise prediction tables after a ranking import (a few minutes; "
+                                 "until then predictions fall back to the model)")
+        parser.add_argument("--benchmark", type=str,
+                            help="Write rows/s, queries per file, peak RSS and wall time per phase to this JSON file")
 
     def handle(self, *args, **options):
+        try:
+            self.run_imports(options)
+        except RankingValidationError as e:
+            raise CommandError(f"Ranking week not published: {e}")
+
+    def run_imports(self, options):
+        results = {}
+        started = time.perf_counter()
+        # set by a --delta import: the players whose predictions changed (None: everyone's)
+        self.affected_players = None
+
         if options["clear"]:
             self.stdout.write("Clearing old data...")
-            Ranking.objects.all().delete()
-            PlayerRecord.objects.all().delete()
-            PlayerStat.objects.all().delete()
-            Player.objects.all().delete()
+            clear_tables()
             self.stdout.write(self.style.SUCCESS("Old data deleted."))
 
         if options["players"]:
             self.stdout.write(f"Importing players from {options['players']}...")
-            import_players(options["players"])
+            with measure(results, "players") as stats:
+                stats["rows"] = import_players(options["players"])
+                stats["files"] = 1
+            report(self.stdout, stats)
             self.stdout.write(self.style.SUCCESS("Players imported."))
 
         if options["rankings"]:
             self.stdout.write(f"Importing rankings from {options['rankings']}...")
-            import_rankings(options["rankings"])
+            with measure(results, "rankings") as stats:
+                stats["rows"], stats["files"], skipped = import_rankings(
+                    options["rankings"], workers=options["workers"], force=options["force"]
+                )
+            if skipped:
+                self.stdout.write(f"Skipped {skipped} unchanged files.")
+            report(self.stdout, stats)
             self.stdout.write(self.style.SUCCESS("Rankings imported."))
 
         if options["add_latest_ranking"]:
             self.stdout.write(f"Importing rankings from {options['add_latest_ranking']}...")
-
-            folder = options["add_latest_ranking"]
-            self.stdout.write(f"Looking for latest ranking file in {folder}...")
-
-            # find all json files
-            json_files = [f for f in os.listdir(folder) if f.endswith(".json")]
-            if not json_files:
-                self.stdout.write(self.style.ERROR("No ranking JSON files found."))
+            with measure(results, "latest_ranking") as stats:
+                self.import_latest_ranking(options, stats)
+            if stats["files"]:
+                report(self.stdout, stats)
+                self.stdout.write(self.style.SUCCESS("Latest ranking imported."))
+
+        ranking_files_imported = sum(
+            results.get(phase, {}).get("files", 0) for phase in ("rankings", "latest_ranking")
+        )
+        affected = None if options["players"] or options["rankings"] else self.affected_players
+        if affected == []:
+            # a delta of an older week: nothing the predictions read has changed
+            ranking_files_imported = 0
+        if ranking_files_imported or options["players"]:
+            self.stdout.write("Refreshing player features...")
+            with measure(results, "player_features") as stats:
+                stats["rows"] = refresh_player_features(affected)
+            report(self.stdout, stats)
+
+        if ranking_files_imported and options["build_pairwise"]:
+            self.stdout.write("Rebuilding pairwise prediction tables...")
+            with measure(results, "pairwise"):
+                call_command("build_pairwise", stdout=self.stdout)
+        elif ranking_files_imported:
+            self.stdout.write("Pairwise prediction tables are stale until build_pairwise runs.")
+
+        if options["benchmark"]:
+            benchmark = {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "db_vendor": connection.vendor,
+                "workers": options["workers"],
+                "total_wall_s": round(time.perf_counter() - started, 3),
+                "phases": results,
+            }
+            with open(options["benchmark"], "w", encoding="utf-8") as f:
+                json.dump(benchmark, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Benchmark written to {options['benchmark']}"))
+
+    def import_latest_ranking(self, options, stats):
+        folder = options["add_latest_ranking"]
+        self.stdout.write(f"Looking for latest ranking file in {folder}...")
+
+        # find all json files
+        json_files = [f for f in os.listdir(folder) if f.endswith(".json")]
+        if not json_files:
+            self.stdout.write(self.style.ERROR("No ranking JSON files found."))
+            return
+
+        # sort by date parsed from filename
+        json_files.sort(key=lambda x: datetime.strptime(x.replace(".json", ""), "%Y-%m-%d"), reverse=True)
+        latest_file = json_files[0]
+        latest_path = os.path.join(folder, latest_file)
+
+        if not options["force"] and not file_changed(latest_path, load_manifest()):
+            self.stdout.write(f"{latest_file} is unchanged since the last import, skipping.")
+            return
+
+        self.stdout.write(f"Importing latest ranking: {latest_file}")
+        if options["delta"]:
+            changes = import_ranking_delta(latest_path)
+            self.stdout.write(
+                f"{len(changes['entrants'])} entrants, {len(changes['leavers'])} leavers, "
+                f"{len(changes['movers'])} movers since {changes['previous_date'] or 'the first week'}; "
+                f"{changes['written']} rows written, {changes['deleted']} deleted"
+            )
+            if options["changelog"]:
+                with open(options["changelog"], "w", encoding="utf-8") as f:
+                    json.dump(changes, f, ensure_ascii=False, indent=2)
+            if not changes["written"] and not changes["deleted"]:
+                self.stdout.write("The stored week already matches; nothing to publish.")
                 return
-
-            # sort by date parsed from filename
-            json_files.sort(key=lambda x: datetime.strptime(x.replace(".json", ""), "%Y-%m-%d"), reverse=True)
-            latest_file = json_files[0]
-            latest_path = os.path.join(folder, latest_file)
-
-            self.stdout.write(f"Importing latest ranking: {latest_file}")
-            import_ranking_file(latest_path)
-            self.stdout.write(self.style.SUCCESS("Latest ranking imported."))
+            stats["files"] = 1
+            stats["rows"] = changes["written"]
+            self.affected_players = changes["affected_players"]
+        else:
+            stats["files"] = 1
+            stats["rows"] = import_ranking_file(latest_path)
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from players.bundle import BundleError, load_bundle
+from players.management.commands.import_tennis_data import clear_tables
+
+
+class Command(BaseCommand):
+    help = "Load a dataset bundle written by export_bundle into an empty database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("bundle", type=str, help="Bundle file to load")
+        parser.add_argument("--replace", action="store_true", help="Empty the player and ranking tables first")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            manifest = load_bundle(options["bundle"], clear_tables if options["replace"] else None)
+        except (BundleError, FileNotFoundError) as e:
+            raise CommandError(str(e))
+
+        rows = sum(info["rows"] for info in manifest["tables"].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Loaded {rows:,} rows from {options['bundle']} in {time.perf_counter() - start:.2f}s"
+        ))
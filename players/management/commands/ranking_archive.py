@@ -0,0 +1,113 @@
+import os
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from players.jsonstream import iter_json_array
+from players.management.commands.import_tennis_data import ranking_files, snapshot_date_from_filename, to_int
+from players.ranking_archive import INT_COLUMNS, MISSING, archive_files, iter_snapshots, write_year
+
+
+def parse_json_row(row):
+    rank = row.get("Rank") or ""
+    return {
+        "player": row.get("Player"),
+        "country": row.get("Country"),
+        "rank_tie": rank.endswith("T"),
+        "rank": to_int(rank),
+        "rank_change": to_int(row.get("Rank_change")),
+        "age": to_int(row.get("Age")),
+        "points": to_int(row.get("Points")),
+        "earn_drop": to_int(row.get("Earn_Drop")),
+        "tournaments": to_int(row.get("Tournaments")),
+        "dropping": to_int(row.get("Dropping")),
+        "next_best": to_int(row.get("Next Best")),
+    }
+
+
+def text(value, fmt="{}"):
+    return "-" if value is None else fmt.format(value)
+
+
+def points_grouped(path):
+    """Whether a JSON snapshot writes Points with thousands separators (older scrapes do)."""
+    return any("," in (row.get("Points") or "") for row in iter_json_array(path))
+
+
+def export_rows(columns):
+    """Rebuild a week's JSON rows as they were scraped, from one archived week."""
+    names, countries = columns["names"], columns["countries"]
+    values = {column: columns[column].tolist() for column in INT_COLUMNS}
+    points_format = "{:,}" if columns["points_grouped"] else "{}"
+
+    rows = []
+    for i, (player, country, tie) in enumerate(
+        zip(columns["player"].tolist(), columns["country"].tolist(), columns["rank_tie"].tolist())
+    ):
+        row = {column: (None if values[column][i] == MISSING else values[column][i]) for column in INT_COLUMNS}
+        rows.append({
+            "Rank": text(row["rank"]) + ("T" if tie else ""),
+            "Rank_change": text(row["rank_change"]),
+            "Player": str(names[player]) if player >= 0 else None,
+            "Age": text(row["age"]),
+            "Points": text(row["points"], points_format),
+            "Earn_Drop": text(row["earn_drop"], "{:+d}"),
+            "Tournaments": text(row["tournaments"]),
+            "Dropping": text(row["dropping"], "{:,}"),
+            "Next Best": text(row["next_best"], "{:,}"),
+            "Country": str(countries[country]) if country >= 0 else None,
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Convert ranking JSON snapshots into the yearly columnar archive (or export it back to JSON)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", type=str, default="data/rankings/ATP", help="Ranking JSON folder")
+        parser.add_argument("--archive", type=str, default="data/rankings/ATP_archive", help="Archive folder")
+        parser.add_argument("--export", action="store_true", help="Write JSON files from the archive instead")
+
+    def handle(self, *args, **options):
+        if options["export"]:
+            self.export_json(options["archive"], options["json"])
+        else:
+            self.build_archive(options["json"], options["archive"])
+
+    def build_archive(self, json_folder, archive_folder):
+        years = defaultdict(list)
+        grouped = set()
+        for path in ranking_files(json_folder):
+            snapshot_date = snapshot_date_from_filename(path)
+            years[snapshot_date.year].append(
+                (snapshot_date, [parse_json_row(row) for row in iter_json_array(path)])
+            )
+            if points_grouped(path):
+                grouped.add(snapshot_date)
+        if not years:
+            raise CommandError(f"No ranking JSON files found in {json_folder}")
+
+        os.makedirs(archive_folder, exist_ok=True)
+        for year, snapshots in sorted(years.items()):
+            path = os.path.join(archive_folder, f"{year}.npz")
+            write_year(path, snapshots, grouped)
+            self.stdout.write(f"{year}: {len(snapshots)} weeks -> {path} ({os.path.getsize(path) / 1024:,.0f} KB)")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Archived {sum(map(len, years.values()))} weeks"))
+
+    def export_json(self, archive_folder, json_folder):
+        paths = archive_files(archive_folder)
+        if not paths:
+            raise CommandError(f"No ranking archive files found in {archive_folder}")
+
+        os.makedirs(json_folder, exist_ok=True)
+        weeks = 0
+        for path in paths:
+            for snapshot_date, columns in iter_snapshots(path):
+                output_path = os.path.join(json_folder, f"{snapshot_date.isoformat()}.json")
+                with open(output_path, "w", encoding="utf-8") as f:
+                    json.dump(export_rows(columns), f, ensure_ascii=False, indent=2)
+                weeks += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Exported {weeks} weeks into {json_folder}"))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from players.derived import refresh_player_features
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized per-player prediction features (import_tennis_data does this itself)"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = refresh_player_features()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Features of {rows:,} players refreshed in {time.perf_counter() - start:.2f}s"
+        ))
@@ -1,5 +1,6 @@
 import os
 from django.conf import settings
+from players.identity import PlayerResolver
 from players.models import Player
 
 
@@ -8,13 +9,13 @@ def renaming():
     new_folder = os.path.join(settings.MEDIA_ROOT, "players/photos")
     os.makedirs(new_folder, exist_ok=True)
 
+    resolver = PlayerResolver.load()
+    updated = []
+
     for filename in os.listdir(old_folder):
         name, ext = os.path.splitext(filename)
-        try:
-            name = name.replace("_", " ")
-            player = Player.objects.get(name__iexact=name.strip())
-        except Player.DoesNotExist:
-            print(f"❌ Not found {filename}")
+        player = resolver.resolve(name.replace("_", " "), source=filename)
+        if player is None:
             continue
 
         old_path = os.path.join(old_folder, filename)
@@ -25,6 +26,11 @@ def renaming():
         os.rename(old_path, new_path)
 
         player.photo = new_rel
-        player.save()
+        updated.append(player)
 
         print(f"✅ {filename} → {new_filename}")
+
+    Player.objects.bulk_update(updated, ["photo"], batch_size=500)
+
+    for line in resolver.miss_report():
+        print(f"❌ Not found {line}")
@@ -0,0 +1,151 @@
+"""Historical match results and the head-to-head index built from them.
+
+import_matches reads ATP match files in the layout of Jeff Sackmann's
+tennis_atp CSVs: one row per match with tourney_id, tourney_name,
+surface, draw_size, tourney_level, tourney_date (YYYYMMDD), match_num,
+the winner_ and loser_ name / seed / entry, score, best_of and round.
+Names are matched with players.identity like the other importers; rows
+naming a player we don't know are skipped and reported.
+
+HeadToHead holds one row per pair of players that have met, keyed on the
+unordered pair, with overall and per-surface win counts. Importing a file
+only inserts the matches that are not stored yet, and adds exactly those
+results to the affected pairs, so the index stays current without a
+rebuild. rebuild_head_to_head() recomputes it from Match from scratch.
+"""
+import csv
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+
+from players.models import HeadToHead, Match
+
+BATCH_SIZE = 1000
+SURFACES = {"Hard": "hard", "Clay": "clay", "Grass": "grass", "Carpet": "carpet"}
+COUNT_FIELDS = ["a_wins", "b_wins"] + [
+    f"{surface}_{side}_wins" for surface in HeadToHead.SURFACES for side in ("a", "b")
+]
+
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value):
+    return (value or "").strip() or None
+
+
+def parse_match_row(row, resolver, source=None):
+    """Unsaved Match for one CSV row, or None if a player is unknown or the row is incomplete."""
+    if not (_text(row.get("winner_name")) and _text(row.get("loser_name")) and _text(row.get("tourney_id"))):
+        return None
+    winner = resolver.resolve(row["winner_name"], source)
+    loser = resolver.resolve(row["loser_name"], source)
+    match_num = _int(row.get("match_num"))
+    try:
+        tourney_date = datetime.strptime(row.get("tourney_date", "").strip(), "%Y%m%d").date()
+    except ValueError:
+        return None
+    if winner is None or loser is None or winner.pk == loser.pk or match_num is None:
+        return None
+
+    return Match(
+        tourney_id=row["tourney_id"].strip(),
+        tourney_name=row.get("tourney_name", "").strip(),
+        tourney_date=tourney_date,
+        tourney_level=row.get("tourney_level", "").strip(),
+        surface=_text(row.get("surface")),
+        draw_size=_int(row.get("draw_size")),
+        best_of=_int(row.get("best_of")),
+        round=row.get("round", "").strip(),
+        match_num=match_num,
+        winner_id=winner.pk,
+        loser_id=loser.pk,
+        winner_seed=_int(row.get("winner_seed")),
+        loser_seed=_int(row.get("loser_seed")),
+        winner_entry=_text(row.get("winner_entry")),
+        loser_entry=_text(row.get("loser_entry")),
+        score=_text(row.get("score")),
+    )
+
+
+def head_to_head_deltas(matches):
+    """Per unordered pair (a, b): the count increments and the latest date of a batch of matches."""
+    counts = defaultdict(lambda: dict.fromkeys(COUNT_FIELDS, 0))
+    last_dates = {}
+    for match in matches:
+        a, b = sorted([match.winner_id, match.loser_id])
+        side = "a" if match.winner_id == a else "b"
+        counts[(a, b)][f"{side}_wins"] += 1
+        surface = SURFACES.get(match.surface)
+        if surface:
+            counts[(a, b)][f"{surface}_{side}_wins"] += 1
+        if (a, b) not in last_dates or match.tourney_date > last_dates[(a, b)]:
+            last_dates[(a, b)] = match.tourney_date
+    return counts, last_dates
+
+
+def write_head_to_head(counts, last_dates, current):
+    """Add `counts` to the `current` records of their pairs; pairs meeting for the first time are created."""
+    changed, created = [], []
+    for (a, b), delta in counts.items():
+        record = current.get((a, b))
+        if record is None:
+            record = HeadToHead(player_a_id=a, player_b_id=b)
+            created.append(record)
+        else:
+            changed.append(record)
+        for field, increment in delta.items():
+            setattr(record, field, getattr(record, field) + increment)
+        if record.last_match_date is None or last_dates[(a, b)] > record.last_match_date:
+            record.last_match_date = last_dates[(a, b)]
+
+    HeadToHead.objects.bulk_update(changed, COUNT_FIELDS + ["last_match_date"], batch_size=BATCH_SIZE)
+    HeadToHead.objects.bulk_create(created, batch_size=BATCH_SIZE)
+    return len(changed) + len(created)
+
+
+def update_head_to_head(matches):
+    """Add newly stored `matches` to HeadToHead: one read of the affected pairs, then batched writes."""
+    counts, last_dates = head_to_head_deltas(matches)
+    if not counts:
+        return 0
+    return write_head_to_head(counts, last_dates, HeadToHead.objects.for_pairs(counts.keys()))
+
+
+def import_match_file(filepath, resolver):
+    """Store the matches of one CSV that aren't stored yet and fold them into HeadToHead.
+
+    Returns (rows, inserted, skipped): skipped rows named an unknown player
+    or were incomplete.
+    """
+    with open(filepath, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    parsed = {}
+    for row in rows:
+        match = parse_match_row(row, resolver, source=filepath)
+        if match is not None:
+            parsed.setdefault((match.tourney_id, match.match_num), match)
+
+    with transaction.atomic():
+        stored = set(
+            Match.objects.filter(tourney_id__in={key[0] for key in parsed})
+            .values_list("tourney_id", "match_num")
+        )
+        new = [match for key, match in parsed.items() if key not in stored]
+        Match.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        update_head_to_head(new)
+    return len(rows), len(new), len(rows) - len(parsed)
+
+
+def rebuild_head_to_head():
+    """Recompute HeadToHead from every stored Match."""
+    matches = Match.objects.only("winner_id", "loser_id", "surface", "tourney_date").iterator(chunk_size=10_000)
+    with transaction.atomic():
+        HeadToHead.objects.all().delete()
+        return write_head_to_head(*head_to_head_deltas(matches), current={})
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0012_alter_player_id_alter_player_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportManifest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("path", models.CharField(max_length=500, unique=True)),
+                ("size", models.BigIntegerField()),
+                ("mtime", models.FloatField()),
+                ("sha256", models.CharField(max_length=64)),
+                ("rows", models.IntegerField(default=0)),
+                ("imported_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0013_importmanifest"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayerAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("alias", models.CharField(max_length=200)),
+                ("key", models.CharField(max_length=200, unique=True)),
+                (
+                    "player",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="aliases",
+                        to="players.player",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0014_playeralias"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RankingWeek",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True)),
+                ("is_published", models.BooleanField(default=False)),
+                ("row_count", models.IntegerField(default=0)),
+                ("published_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-date"],
+            },
+        ),
+        migrations.CreateModel(
+            name="RankingStaging",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(db_index=True)),
+                ("rank", models.IntegerField(blank=True, null=True)),
+                ("rank_change", models.CharField(blank=True, max_length=10, null=True)),
+                ("age", models.IntegerField(blank=True, null=True)),
+                ("points", models.IntegerField(blank=True, null=True)),
+                ("earn_drop", models.CharField(blank=True, max_length=10, null=True)),
+                ("tournaments", models.IntegerField(blank=True, null=True)),
+                ("dropping", models.CharField(blank=True, max_length=10, null=True)),
+                ("next_best", models.CharField(blank=True, max_length=10, null=True)),
+                ("country", models.CharField(blank=True, max_length=10, null=True)),
+                (
+                    "player",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="players.player",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Count
+from django.utils import timezone
+
+
+def publish_existing_weeks(apps, schema_editor):
+    Ranking = apps.get_model("players", "Ranking")
+    RankingWeek = apps.get_model("players", "RankingWeek")
+    now = timezone.now()
+    RankingWeek.objects.bulk_create(
+        [
+            RankingWeek(date=row["date"], is_published=True, row_count=row["rows"], published_at=now)
+            for row in Ranking.objects.order_by().values("date").annotate(rows=Count("id"))
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0015_ranking_staging_and_weeks"),
+    ]
+
+    operations = [
+        migrations.RunPython(publish_existing_weeks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Replace, Trim
+
+MOVEMENT_FIELDS = ["rank_change", "earn_drop", "dropping", "next_best"]
+
+
+def clean_movement_text(apps, schema_editor):
+    """Turn "+250", "1,200" and "-" into plain integer text so the column type can be cast."""
+    Ranking = apps.get_model("players", "Ranking")
+    RankingStaging = apps.get_model("players", "RankingStaging")
+    # staging only holds rows of an unfinished import
+    RankingStaging.objects.all().delete()
+    for field in MOVEMENT_FIELDS:
+        Ranking.objects.filter(**{f"{field}__in": ["-", ""]}).update(**{field: None})
+        Ranking.objects.filter(**{f"{field}__isnull": False}).update(
+            **{field: Trim(Replace(Replace(F(field), Value("+"), Value("")), Value(","), Value("")))}
+        )
+    if schema_editor.connection.vendor == "postgresql":
+        # run the foreign key checks these UPDATEs deferred; ALTER TABLE refuses to run while they are pending
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0016_publish_existing_ranking_weeks"),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_movement_text, migrations.RunPython.noop),
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=field,
+                field=models.IntegerField(blank=True, null=True),
+            )
+            for model_name in ["ranking", "rankingstaging"]
+            for field in MOVEMENT_FIELDS
+        ],
+        migrations.AddIndex(
+            model_name="ranking",
+            index=models.Index(fields=["date", "rank_change"], name="ranking_date_rank_change_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ranking",
+            index=models.Index(fields=["date", "dropping"], name="ranking_date_dropping_idx"),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0017_ranking_movement_integers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HeadToHead",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("a_wins", models.IntegerField(default=0)),
+                ("b_wins", models.IntegerField(default=0)),
+                ("hard_a_wins", models.IntegerField(default=0)),
+                ("hard_b_wins", models.IntegerField(default=0)),
+                ("clay_a_wins", models.IntegerField(default=0)),
+                ("clay_b_wins", models.IntegerField(default=0)),
+                ("grass_a_wins", models.IntegerField(default=0)),
+                ("grass_b_wins", models.IntegerField(default=0)),
+                ("carpet_a_wins", models.IntegerField(default=0)),
+                ("carpet_b_wins", models.IntegerField(default=0)),
+                ("last_match_date", models.DateField(blank=True, null=True)),
+                (
+                    "player_a",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="players.player",
+                    ),
+                ),
+                (
+                    "player_b",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="players.player",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(("player_a__lt", models.F("player_b"))),
+                        name="h2h_ordered_pair",
+                    )
+                ],
+                "unique_together": {("player_a", "player_b")},
+            },
+        ),
+        migrations.CreateModel(
+            name="Match",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tourney_id", models.CharField(max_length=50)),
+                ("tourney_name", models.CharField(max_length=200)),
+                ("tourney_date", models.DateField(db_index=True)),
+                ("tourney_level", models.CharField(max_length=5)),
+                ("surface", models.CharField(blank=True, max_length=10, null=True)),
+                ("draw_size", models.IntegerField(blank=True, null=True)),
+                ("best_of", models.IntegerField(blank=True, null=True)),
+                ("round", models.CharField(max_length=10)),
+                ("match_num", models.IntegerField()),
+                ("winner_seed", models.IntegerField(blank=True, null=True)),
+                ("loser_seed", models.IntegerField(blank=True, null=True)),
+                ("winner_entry", models.CharField(blank=True, max_length=5, null=True)),
+                ("loser_entry", models.CharField(blank=True, max_length=5, null=True)),
+                ("score", models.CharField(blank=True, max_length=100, null=True)),
+                (
+                    "loser",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="matches_lost",
+                        to="players.player",
+                    ),
+                ),
+                (
+                    "winner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="matches_won",
+                        to="players.player",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["tourney_date", "match_num"],
+                "unique_together": {("tourney_id", "match_num")},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0018_matches_and_head_to_head"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayerFeatures",
+            fields=[
+                (
+                    "player",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="features",
+                        serialize=False,
+                        to="players.player",
+                    ),
+                ),
+                ("ranking_date", models.DateField(blank=True, null=True)),
+                ("rank", models.IntegerField(blank=True, null=True)),
+                ("points", models.IntegerField(blank=True, null=True)),
+                ("height_cm", models.IntegerField(blank=True, null=True)),
+                ("age", models.IntegerField(blank=True, null=True)),
+                ("hand_right", models.BooleanField(default=False)),
+                ("refreshed_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
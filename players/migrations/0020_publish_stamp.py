@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:28
+
+import time
+
+from django.db import migrations, models
+
+
+def create_stamp(apps, schema_editor):
+    """Start the stamp at the latest published week, so workers have one row to lock and poll."""
+    RankingWeek = apps.get_model("players", "RankingWeek")
+    PublishStamp = apps.get_model("players", "PublishStamp")
+    latest = RankingWeek.objects.filter(is_published=True).order_by("-date").values_list("date", flat=True).first()
+    version = time.time_ns()
+    PublishStamp.objects.create(pk=1, date=latest, version=version, base=version, players=[])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0019_player_features"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublishStamp",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(blank=True, null=True)),
+                ("version", models.BigIntegerField()),
+                ("base", models.BigIntegerField()),
+                ("players", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_stamp, migrations.RunPython.noop),
+    ]
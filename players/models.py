@@ -24,6 +24,17 @@ def generate_player_id():
             return new_id
 
 
+def generate_player_ids(count, taken):
+    """Generate `count` unique IDs in memory, skipping (and extending) the `taken` set."""
+    new_ids = []
+    while len(new_ids) < count:
+        new_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
+        if new_id not in taken:
+            taken.add(new_id)
+            new_ids.append(new_id)
+    return new_ids
+
+
 def player_name_photo_path(instance, filename):
     ext = filename.split('.')[-1]
     clean_name = instance.name.replace(" ", "_")
@@ -124,20 +135,235 @@ class PlayerRecord(models.Model):
 
 
 
+class RankingQuerySet(models.QuerySet):
+    def published(self):
+        """Only rows of weeks that have been validated and published."""
+        return self.filter(date__in=RankingWeek.objects.filter(is_published=True).values("date"))
+
+    def latest_published(self, player_ids):
+        """Row of the most recent published week of each of `player_ids`, in a single query.
+
+        Driven from Player, so each player costs one (player_id, date) index probe.
+        """
+        latest = (
+            self.model.objects.published().filter(player=models.OuterRef("pk"))
+            .order_by("-date").values("pk")[:1]
+        )
+        return self.filter(
+            pk__in=Player.objects.filter(pk__in=player_ids).values(latest_id=models.Subquery(latest))
+        )
+
+
 class Ranking(models.Model):
     player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="rankings")
     date = models.DateField()
 
     rank = models.IntegerField(blank=True, null=True)
-    rank_change = models.CharField(max_length=10, blank=True, null=True)
+    rank_change = models.IntegerField(blank=True, null=True)
     age = models.IntegerField(blank=True, null=True)
     points = models.IntegerField(blank=True, null=True)
-    earn_drop = models.CharField(max_length=10, blank=True, null=True)
+    earn_drop = models.IntegerField(blank=True, null=True)
     tournaments = models.IntegerField(blank=True, null=True)
-    dropping = models.CharField(max_length=10, blank=True, null=True)
-    next_best = models.CharField(max_length=10, blank=True, null=True)
+    dropping = models.IntegerField(blank=True, null=True)
+    next_best = models.IntegerField(blank=True, null=True)
     country = models.CharField(max_length=10, blank=True, null=True)
 
+    objects = RankingQuerySet.as_manager()
+
     class Meta:
         unique_together = ("player", "date")
         ordering = ["date", "rank"]
+        indexes = [
+            # "biggest climbers" / "most points dropping" within one week
+            models.Index(fields=["date", "rank_change"], name="ranking_date_rank_change_idx"),
+            models.Index(fields=["date", "dropping"], name="ranking_date_dropping_idx"),
+        ]
+
+
+class RankingStaging(models.Model):
+    """Rows of a ranking week being re-imported, swapped into Ranking on publish."""
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="+")
+    date = models.DateField(db_index=True)
+
+    rank = models.IntegerField(blank=True, null=True)
+    rank_change = models.IntegerField(blank=True, null=True)
+    age = models.IntegerField(blank=True, null=True)
+    points = models.IntegerField(blank=True, null=True)
+    earn_drop = models.IntegerField(blank=True, null=True)
+    tournaments = models.IntegerField(blank=True, null=True)
+    dropping = models.IntegerField(blank=True, null=True)
+    next_best = models.IntegerField(blank=True, null=True)
+    country = models.CharField(max_length=10, blank=True, null=True)
+
+
+class RankingWeek(models.Model):
+    """Publication state of one ranking date; the site only reads published weeks."""
+    date = models.DateField(unique=True)
+    is_published = models.BooleanField(default=False)
+    row_count = models.IntegerField(default=0)
+    published_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.date} ({'published' if self.is_published else 'draft'})"
+
+
+class PublishStamp(models.Model):
+    """The single row web workers poll to tell whether published data changed (players.publishing)."""
+    date = models.DateField(blank=True, null=True)
+    version = models.BigIntegerField()
+    base = models.BigIntegerField()
+    players = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.date} (version {self.version})"
+
+
+class ImportManifest(models.Model):
+    """One row per imported data file, used to skip files that have not changed."""
+    path = models.CharField(max_length=500, unique=True)
+    size = models.BigIntegerField()
+    mtime = models.FloatField()
+    sha256 = models.CharField(max_length=64)
+    rows = models.IntegerField(default=0)
+    imported_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.path} ({self.rows} rows)"
+
+
+class PlayerAlias(models.Model):
+    """Another spelling of a player's name; `key` is the folded form from players.identity.fold_name."""
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="aliases")
+    alias = models.CharField(max_length=200)
+    key = models.CharField(max_length=200, unique=True)
+
+    def __str__(self):
+        return f"{self.alias} → {self.player.name}"
+
+
+class PlayerFeatures(models.Model):
+    """What the match model needs to know about one player, materialized.
+
+    Rebuilt from Player and the player's latest published Ranking by
+    players.derived.refresh_player_features at the end of every player or
+    ranking import, so a prediction reads both players' rows in one query.
+    `age` is as of the refresh; `rank`, `points` and `ranking_date` are None
+    for players without a published ranking.
+    """
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name="features")
+    ranking_date = models.DateField(blank=True, null=True)
+    rank = models.IntegerField(blank=True, null=True)
+    points = models.IntegerField(blank=True, null=True)
+    height_cm = models.IntegerField(blank=True, null=True)
+    age = models.IntegerField(blank=True, null=True)
+    hand_right = models.BooleanField(default=False)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.player_id} (rank {self.rank})"
+
+    @classmethod
+    def from_player(cls, player, ranking):
+        """Unsaved row for `player` and their latest published `ranking` (or None)."""
+        return cls(
+            player_id=player.pk,
+            ranking_date=ranking.date if ranking else None,
+            rank=ranking.rank if ranking else None,
+            points=ranking.points if ranking else None,
+            height_cm=player.height_cm,
+            age=player.age,
+            hand_right="Right" in (player.plays or ""),
+        )
+
+
+class Match(models.Model):
+    """One singles result from the historical ATP match files (Sackmann's CSV layout)."""
+    tourney_id = models.CharField(max_length=50)
+    tourney_name = models.CharField(max_length=200)
+    tourney_date = models.DateField(db_index=True)
+    tourney_level = models.CharField(max_length=5)
+    surface = models.CharField(max_length=10, blank=True, null=True)
+    draw_size = models.IntegerField(blank=True, null=True)
+    best_of = models.IntegerField(blank=True, null=True)
+    round = models.CharField(max_length=10)
+    match_num = models.IntegerField()
+
+    winner = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="matches_won")
+    loser = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="matches_lost")
+    winner_seed = models.IntegerField(blank=True, null=True)
+    loser_seed = models.IntegerField(blank=True, null=True)
+    winner_entry = models.CharField(max_length=5, blank=True, null=True)
+    loser_entry = models.CharField(max_length=5, blank=True, null=True)
+    score = models.CharField(max_length=100, blank=True, null=True)
+
+    class Meta:
+        unique_together = ("tourney_id", "match_num")
+        ordering = ["tourney_date", "match_num"]
+
+    def __str__(self):
+        return f"{self.tourney_name} {self.round}: {self.winner_id} d. {self.loser_id}"
+
+
+class HeadToHeadQuerySet(models.QuerySet):
+    def for_pair(self, p1_id, p2_id):
+        """The record of two players in either order, or None."""
+        a, b = sorted([p1_id, p2_id])
+        return self.filter(player_a=a, player_b=b).first()
+
+    def for_pairs(self, pairs):
+        """{(a, b): HeadToHead} for the unordered pairs among `pairs` that have met, in one query."""
+        wanted = {tuple(sorted(pair)) for pair in pairs}
+        player_ids = {player_id for pair in wanted for player_id in pair}
+        records = self.filter(player_a__in=player_ids, player_b__in=player_ids)
+        return {
+            (h2h.player_a_id, h2h.player_b_id): h2h for h2h in records
+            if (h2h.player_a_id, h2h.player_b_id) in wanted
+        }
+
+
+class HeadToHead(models.Model):
+    """Meetings between two players, keyed on the unordered pair (player_a has the smaller id).
+
+    Built from Match by players.matches and updated as new results are imported.
+    """
+    SURFACES = ["hard", "clay", "grass", "carpet"]
+
+    player_a = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="+")
+    player_b = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="+")
+
+    a_wins = models.IntegerField(default=0)
+    b_wins = models.IntegerField(default=0)
+    hard_a_wins = models.IntegerField(default=0)
+    hard_b_wins = models.IntegerField(default=0)
+    clay_a_wins = models.IntegerField(default=0)
+    clay_b_wins = models.IntegerField(default=0)
+    grass_a_wins = models.IntegerField(default=0)
+    grass_b_wins = models.IntegerField(default=0)
+    carpet_a_wins = models.IntegerField(default=0)
+    carpet_b_wins = models.IntegerField(default=0)
+    last_match_date = models.DateField(blank=True, null=True)
+
+    objects = HeadToHeadQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("player_a", "player_b")
+        constraints = [
+            models.CheckConstraint(condition=models.Q(player_a__lt=models.F("player_b")), name="h2h_ordered_pair"),
+        ]
+
+    def __str__(self):
+        return f"{self.player_a_id} {self.a_wins}-{self.b_wins} {self.player_b_id}"
+
+    def wins(self, player_id, surface=None):
+        """Matches `player_id` won against the other player, overall or on one surface."""
+        side = "a" if player_id == self.player_a_id else "b"
+        return getattr(self, f"{surface}_{side}_wins" if surface else f"{side}_wins")
+
+    def winrate(self, player_id):
+        """Share of the pair's meetings won by `player_id`; 0.5 before they have met."""
+        total = self.a_wins + self.b_wins
+        return self.wins(player_id) / total if total else 0.5
@@ -0,0 +1,208 @@
+"""Validate-then-publish for ranking weeks.
+
+The site only reads weeks whose RankingWeek is published
+(``Ranking.objects.published()``). A week that has never been published
+is loaded straight into Ranking, where it stays invisible until publishing
+flips its flag. A week that is already live is re-imported into
+RankingStaging instead. Publishing then swaps the staged rows in with a
+few set-based statements, so readers never see a half-written week and
+the hot rows are only locked for that short swap.
+
+Every publish moves the publish stamp on: one PublishStamp row holding
+the latest published date and a version that changes on every touch.
+Living in the database, it is shared by every web worker on every host.
+Workers poll it (current_publish_stamp) at most every STAMP_POLL_SECONDS,
+so a lookup usually costs no query and a publish reaches them within
+that delay. The stamp also carries "base", the version of the last
+touch that concerned everyone. A delta re-import of the live week keeps
+the base and adds its players to "players", everyone changed since the
+base. A cache that saw a stamp with the same base then only drops those
+players' entries.
+"""
+import time
+from functools import partial
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from players.models import PublishStamp, Ranking, RankingStaging, RankingWeek
+
+# a week with fewer rows than this share of the previous one is treated as a truncated scrape
+MIN_ROW_RATIO = 0.5
+STAMP_POLL_SECONDS = 2.0
+
+# (time.monotonic() of the last read, stamp read) of this process
+_polled = (None, None)
+
+
+class RankingValidationError(Exception):
+    pass
+
+
+def is_published(snapshot_date):
+    return RankingWeek.objects.filter(date=snapshot_date, is_published=True).exists()
+
+
+def touch_publish_stamp(player_ids=None):
+    """Move the publish stamp on, in one short transaction.
+
+    `player_ids` limits the change to those players; by default anything
+    derived from the published data is stale.
+    """
+    global _polled
+    latest = RankingWeek.objects.filter(is_published=True).order_by("-date").values_list("date", flat=True).first()
+    version = time.time_ns()
+    with transaction.atomic():
+        stamp, created = PublishStamp.objects.select_for_update().get_or_create(
+            pk=1, defaults={"date": latest, "version": version, "base": version},
+        )
+        if not created:
+            if player_ids is not None and stamp.date == latest:
+                stamp.players = sorted(set(stamp.players) | set(player_ids))
+            else:
+                stamp.base, stamp.players = version, []
+            stamp.date, stamp.version = latest, version
+            stamp.save()
+    # this process sees its own publish at once
+    _polled = (None, None)
+
+
+def read_publish_stamp():
+    """The stamp as a dict: "date" (latest published, ISO), "version", "base" and "players"; or None."""
+    stamp = PublishStamp.objects.filter(pk=1).values("date", "version", "base", "players").first()
+    if stamp is None:
+        return None
+    return {**stamp, "date": stamp["date"].isoformat() if stamp["date"] else None}
+
+
+def current_publish_stamp():
+    """read_publish_stamp(), re-read at most every STAMP_POLL_SECONDS by this process."""
+    global _polled
+    read_at, stamp = _polled
+    now = time.monotonic()
+    if read_at is None or now - read_at >= STAMP_POLL_SECONDS:
+        stamp = read_publish_stamp()
+        _polled = (now, stamp)
+    return stamp
+
+
+def clear_stage(snapshot_date):
+    RankingStaging.objects.filter(date=snapshot_date).delete()
+
+
+def prepare_week(snapshot_date):
+    """Get a week ready to be loaded; returns whether it goes to RankingStaging.
+
+    A live week is staged, in a cleared stage. A week that was never
+    published is loaded straight into Ranking, after deleting what an
+    earlier load that failed validation left there, so players who have
+    since left the file don't linger in it.
+    """
+    staged = is_published(snapshot_date)
+    if staged:
+        clear_stage(snapshot_date)
+    else:
+        Ranking.objects.filter(date=snapshot_date).delete()
+    return staged
+
+
+def stage_rankings(rankings, batch_size=1000):
+    RankingStaging.objects.bulk_create(
+        [
+            RankingStaging(**{
+                field.attname: getattr(ranking, field.attname)
+                for field in RankingStaging._meta.concrete_fields if not field.primary_key
+            })
+            for ranking in rankings
+        ],
+        batch_size=batch_size,
+    )
+
+
+def validate_week(snapshot_date, rows, complete=True):
+    """Check row count and ranks of `rows` (a queryset of one week) before it goes live."""
+    count = rows.count()
+    if complete and count == 0:
+        raise RankingValidationError(f"{snapshot_date}: no ranking rows to publish")
+
+    if rows.filter(rank__lt=1).exists():
+        raise RankingValidationError(f"{snapshot_date}: ranks must be positive")
+    if complete and not rows.filter(rank=1).exists():
+        raise RankingValidationError(f"{snapshot_date}: the week has no rank 1")
+
+    previous = (
+        RankingWeek.objects.filter(is_published=True, date__lt=snapshot_date)
+        .order_by("-date").values_list("row_count", flat=True).first()
+    )
+    if complete and previous and count < previous * MIN_ROW_RATIO:
+        raise RankingValidationError(
+            f"{snapshot_date}: only {count} rows against {previous} the week before"
+        )
+    return count
+
+
+def _swap_from_stage(snapshot_date, complete, removed):
+    columns = [
+        field.column for field in RankingStaging._meta.concrete_fields if not field.primary_key
+    ]
+    quote = connection.ops.quote_name
+    ranking_table = quote(Ranking._meta.db_table)
+    staging_table = quote(RankingStaging._meta.db_table)
+    column_list = ", ".join(quote(c) for c in columns)
+    updates = ", ".join(
+        f"{quote(c)} = excluded.{quote(c)}" for c in columns if c not in ("player_id", "date")
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {ranking_table} ({column_list}) "
+            f"SELECT {column_list} FROM {staging_table} WHERE {quote('date')} = %s "
+            f"ON CONFLICT ({quote('player_id')}, {quote('date')}) DO UPDATE SET {updates}",
+            [snapshot_date],
+        )
+        if complete:
+            cursor.execute(
+                f"DELETE FROM {ranking_table} WHERE {quote('date')} = %s AND {quote('player_id')} NOT IN "
+                f"(SELECT {quote('player_id')} FROM {staging_table} WHERE {quote('date')} = %s)",
+                [snapshot_date, snapshot_date],
+            )
+    if removed:
+        Ranking.objects.filter(date=snapshot_date, player_id__in=removed).delete()
+
+
+def publish_week(snapshot_date, staged, complete=True, removed=(), record=None, player_ids=None):
+    """Validate a loaded week and make it visible, in one short transaction.
+
+    `staged` tells whether the rows sit in RankingStaging (re-import of a
+    live week) or were written straight into Ranking (new week).
+    `complete=False` means the staged rows are only the changed ones of a
+    delta import; `removed` lists players to drop from the week.
+    `record()`, if given, runs in the same transaction; the importer saves
+    the file's manifest entry there, so a week is never live without it.
+    `player_ids` is passed on to touch_publish_stamp; an empty list means
+    nothing served from the latest week changed, and the stamp is left alone.
+    The week's staged rows are cleared whether or not it passes validation.
+    """
+    try:
+        with transaction.atomic():
+            if staged:
+                validate_week(snapshot_date, RankingStaging.objects.filter(date=snapshot_date), complete)
+                _swap_from_stage(snapshot_date, complete, removed)
+                count = Ranking.objects.filter(date=snapshot_date).count()
+            else:
+                if removed:
+                    Ranking.objects.filter(date=snapshot_date, player_id__in=removed).delete()
+                count = validate_week(snapshot_date, Ranking.objects.filter(date=snapshot_date))
+
+            RankingWeek.objects.update_or_create(
+                date=snapshot_date,
+                defaults={"is_published": True, "row_count": count, "published_at": timezone.now()},
+            )
+            if record:
+                record()
+            if player_ids is None or player_ids:
+                transaction.on_commit(partial(touch_publish_stamp, player_ids))
+    finally:
+        if staged:
+            clear_stage(snapshot_date)
+    return count
@@ -0,0 +1,153 @@
+"""Compact columnar storage for the weekly ranking history.
+
+One compressed ``<year>.npz`` file per year holds every snapshot of that
+year as typed int32 columns. Player names and countries are
+dictionary-encoded: the file keeps each distinct string once and the rows
+store an index into that list. Missing values ("-" in the scraped JSON)
+are stored as ``MISSING``. Older scrapes wrote Points with thousands
+separators ("10,235") and scrap_new_ranking writes them without
+("10235"); each week keeps a ``points_grouped`` flag so an export
+reproduces the file it came from.
+"""
+import os
+from datetime import date
+
+import numpy as np
+
+FORMAT_VERSION = 2
+# version 1 had no points_grouped; its weeks are exported with separators, as they were then
+READABLE_VERSIONS = (1, 2)
+MISSING = np.iinfo(np.int32).min
+
+INT_COLUMNS = [
+    "rank", "rank_change", "age", "points", "earn_drop",
+    "tournaments", "dropping", "next_best",
+]
+
+
+def archive_files(folder):
+    """Yearly archive files of `folder`, oldest first."""
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if f.endswith(".npz") and f[:-4].isdigit()
+    )
+
+
+def is_archive(folder):
+    return os.path.isdir(folder) and bool(archive_files(folder))
+
+
+def _encode(values):
+    """Dictionary-encode a list of strings (None allowed) into (codes, dictionary)."""
+    dictionary = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+        else:
+            codes[i] = dictionary.setdefault(value, len(dictionary))
+    return codes, np.array(list(dictionary), dtype=str)
+
+
+def write_year(path, snapshots, points_grouped=()):
+    """Write `snapshots` — (date, rows) pairs — to one archive file.
+
+    Each row is a dict with a "player" and "country" string, a "rank_tie"
+    flag, and ints (or None) for every name in INT_COLUMNS.
+    `points_grouped` holds the dates whose Points had thousands separators.
+    """
+    snapshots = sorted(snapshots, key=lambda snapshot: snapshot[0])
+    rows = [row for _, week in snapshots for row in week]
+
+    offsets = np.zeros(len(snapshots) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(week) for _, week in snapshots])
+
+    player, names = _encode([row["player"] for row in rows])
+    country, countries = _encode([row["country"] for row in rows])
+    columns = {
+        column: np.array(
+            [MISSING if row[column] is None else row[column] for row in rows], dtype=np.int32
+        )
+        for column in INT_COLUMNS
+    }
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            format_version=np.int32(FORMAT_VERSION),
+            dates=np.array([d.isoformat() for d, _ in snapshots], dtype="datetime64[D]"),
+            points_grouped=np.array([d in points_grouped for d, _ in snapshots], dtype=bool),
+            offsets=offsets,
+            names=names,
+            player=player,
+            countries=countries,
+            country=country,
+            rank_tie=np.array([bool(row["rank_tie"]) for row in rows], dtype=bool),
+            **columns,
+        )
+    os.replace(tmp_path, path)
+
+
+def read_year(path):
+    """Load one archive file into a dict of numpy arrays."""
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data["format_version"])
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"{path}: unsupported archive format version {version}")
+        year = {key: data[key] for key in data.files}
+    year.setdefault("points_grouped", np.ones(len(year["dates"]), dtype=bool))
+    return year
+
+
+def iter_snapshots(path):
+    """Yield (date, columns) per snapshot of an archive file, columns sliced to that week.
+
+    columns also holds the shared "names"/"countries" dictionaries and the
+    week's "points_grouped" flag.
+    """
+    data = read_year(path)
+    offsets = data["offsets"]
+    for i, day in enumerate(data["dates"]):
+        start, end = offsets[i], offsets[i + 1]
+        columns = {
+            key: data[key][start:end]
+            for key in ["player", "country", "rank_tie", *INT_COLUMNS]
+        }
+        columns["names"] = data["names"]
+        columns["countries"] = data["countries"]
+        columns["points_grouped"] = bool(data["points_grouped"][i])
+        yield date.fromisoformat(str(day)), columns
+
+
+def load_history(folder):
+    """Concatenate every year of `folder` into flat columns for analytics.
+
+    Returns a dict with a per-row "date" (datetime64[D]), the INT_COLUMNS
+    with MISSING sentinels, "rank_tie", and "player"/"country" codes into
+    the shared "names"/"countries" dictionaries.
+    """
+    names, countries = {}, {}
+    parts = []
+    for path in archive_files(folder):
+        data = read_year(path)
+        # the trailing -1 keeps code -1 (no value) mapped to -1
+        name_codes = np.array(
+            [names.setdefault(n, len(names)) for n in data["names"]] + [-1], dtype=np.int32
+        )
+        country_codes = np.array(
+            [countries.setdefault(c, len(countries)) for c in data["countries"]] + [-1], dtype=np.int32
+        )
+        part = {column: data[column] for column in ["rank_tie", *INT_COLUMNS]}
+        part["date"] = np.repeat(data["dates"], np.diff(data["offsets"]))
+        part["player"] = name_codes[data["player"]]
+        part["country"] = country_codes[data["country"]]
+        parts.append(part)
+
+    if not parts:
+        raise FileNotFoundError(f"No ranking archive files in {folder}")
+
+    history = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    history["names"] = np.array(list(names), dtype=str)
+    history["countries"] = np.array(list(countries), dtype=str)
+    return history
@@ -1,3 +1,919 @@
-from django.test import TestCase
+import csv
+import datetime
+import json
+import os
+import tempfile
+import zipfile
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from players.bundle import BUNDLE_MODELS, BundleError, export_bundle, load_bundle
+from players.derived import backfill_ranking_ages, player_features, refresh_player_features
+from players.identity import PlayerResolver, fold_name
+from players.jsonstream import iter_json_array
+from players.management.commands.import_tennis_data import (
+    CLEAR_MODELS, calculate_age, clear_tables, concurrent_writes, create_missing_players, import_players,
+    import_ranking_delta, import_ranking_file, import_rankings, load_player_map,
+)
+from players.matches import COUNT_FIELDS
+from players.models import (
+    HeadToHead, ImportManifest, Match, Player, PlayerAlias, PlayerFeatures, PlayerRecord, PlayerStat, PublishStamp,
+    Ranking, RankingStaging, RankingWeek,
+)
+from players.publishing import (
+    RankingValidationError, current_publish_stamp, prepare_week, publish_week, read_publish_stamp, stage_rankings,
+    touch_publish_stamp,
+)
+from players.ranking_archive import iter_snapshots, read_year
+
+WEEK1 = datetime.date(2020, 1, 6)
+WEEK2 = datetime.date(2020, 1, 13)
+WEEK3 = datetime.date(2020, 1, 20)
+
+
+def ranking_row(rank, name, points, **fields):
+    """One entry of a scraped ranking file, every value a string as scrap_new_ranking writes it."""
+    return {
+        "Rank": str(rank), "Rank_change": "-", "Player": name, "Age": "30", "Points": str(points),
+        "Earn_Drop": "-", "Tournaments": "20", "Dropping": "-", "Next Best": "-", "Country": "sui",
+        **fields,
+    }
+
+
+def player_entry(name, **fields):
+    """One players_data.json entry, as scraping_players_data writes it."""
+    return {
+        "name": name,
+        "url": f"https://www.atptour.com/en/players/{name.lower().replace(' ', '-')}/overview",
+        "Overview": {"Country": "Switzerland", "Plays": "Right-Handed, One-Handed Backhand", "Coach": "Magnus Norman"},
+        "Stats": {
+            "Serve": {"Aces": "7,034", "1st Serve": "56%", "Service Games Won": "86%"},
+            "Return": {"Return Games Won": "24%"},
+        },
+        "YTD": {"Rank": "16", "Move": "-", "W-L": "30 - 12", "Titles": "1", "Prize Money": "$1,234,567"},
+        "Career": {"W-L": "580 - 276", "Titles": "16", "Prize Money Singles & Doubles Combined": "$37,000,000"},
+        "birth_date": "1985-03-28",
+        "height_cm": 183,
+        **fields,
+    }
+
+
+class TempDataMixin:
+    """Temporary data folder, so tests never touch data/."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.folder = tmp.name
+
+    def write_json(self, name, data):
+        path = os.path.join(self.folder, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return path
+
+    def write_week(self, snapshot_date, rows, folder="rankings"):
+        return self.write_json(os.path.join(folder, f"{snapshot_date.isoformat()}.json"), rows)
+
+
+class ImportTestCase(TempDataMixin, TestCase):
+    pass
+
+
+class BulkUpsertTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.stan = Player.objects.create(id="STANW", name="Stan Wawrinka")
+
+    def test_new_players_are_created_with_unique_ids(self):
+        path = self.write_week(WEEK1, [
+            ranking_row(1, "Stan Wawrinka", "9,000"),
+            ranking_row(2, "Roger Federer", "8,000"),
+            ranking_row(3, "Rafael Nadal", "7,000"),
+        ])
+        self.assertEqual(import_ranking_file(path), 3)
+
+        rankings = {r.player.name: r for r in Ranking.objects.select_related("player")}
+        self.assertEqual(rankings["Stan Wawrinka"].player_id, "STANW")
+        ids = [r.player_id for r in rankings.values()]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertTrue(all(len(player_id) == 5 for player_id in ids))
+        self.assertEqual(rankings["Roger Federer"].points, 8000)
+
+    def test_reimport_updates_rows_in_place(self):
+        path = self.write_week(WEEK1, [ranking_row(1, "Stan Wawrinka", 9000), ranking_row(2, "Roger Federer", 8000)])
+        import_ranking_file(path)
+        self.write_week(WEEK1, [ranking_row(1, "Roger Federer", 9500), ranking_row(2, "Stan Wawrinka", 9000)])
+        self.assertEqual(import_ranking_file(path), 2)
+
+        self.assertEqual(Player.objects.count(), 2)
+        self.assertEqual(
+            dict(Ranking.objects.values_list("player__name", "rank")),
+            {"Roger Federer": 1, "Stan Wawrinka": 2},
+        )
+
+    def test_repeated_player_keeps_first_row(self):
+        path = self.write_week(WEEK1, [ranking_row(1, "Stan Wawrinka", 9000), ranking_row(7, "STAN WAWRINKA", 10)])
+        self.assertEqual(import_ranking_file(path), 1)
+        self.assertEqual(Ranking.objects.get().rank, 1)
+
+    def test_missing_players_cost_one_insert(self):
+        player_map = load_player_map()
+        rows = [{"name": "Roger Federer", "country": "sui"}, {"name": "Rafael Nadal", "country": "esp"},
+                {"name": "Stan Wawrinka", "country": "sui"}]
+        # IDs come from the resolver's in-memory set, not another query
+        with self.assertNumQueries(1):
+            self.assertEqual(create_missing_players(rows, player_map), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(create_missing_players(rows, player_map), 0)
+        self.assertEqual(player_map.taken, set(Player.objects.values_list("id", flat=True)))
+
+    def test_resolver_tracks_taken_ids(self):
+        resolver = PlayerResolver.load()
+        self.assertEqual(resolver.taken, {"STANW"})
+        resolver["Roger Federer"] = Player(id="ROGER", name="Roger Federer")
+        self.assertEqual(resolver.taken, {"STANW", "ROGER"})
+
+
+class ParallelImportTests(TempDataMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        # players come and go between weeks, so the workers create players concurrently
+        names = ["Stan Wawrinka", "Roger Federer", "Rafael Nadal", "Andy Murray", "Novak Djokovic", "Dominic Thiem"]
+        for week, snapshot_date in enumerate([WEEK1, WEEK2, WEEK3]):
+            self.write_week(snapshot_date, [
+                ranking_row(rank, name, 10_000 - 100 * rank - week)
+                for rank, name in enumerate(names[week:week + 4], start=1)
+            ])
+        self.rankings = os.path.join(self.folder, "rankings")
+
+    def imported(self, workers):
+        clear_tables()
+        rows, files, skipped = import_rankings(self.rankings, workers=workers, force=True)
+        self.assertEqual((rows, files, skipped), (12, 3, 0))
+        self.assertFalse(Player.objects.values("name").annotate(n=Count("id")).filter(n__gt=1).exists())
+        self.assertEqual(RankingWeek.objects.filter(is_published=True).count(), 3)
+        return sorted(Ranking.objects.values_list("date", "player__name", "rank", "points"))
+
+    def test_workers_load_what_one_process_loads(self):
+        if not concurrent_writes():
+            self.skipTest("the database takes one writer at a time, so --workers runs in one process")
+        self.assertEqual(self.imported(workers=2), self.imported(workers=1))
+
+    def test_failed_week_leaves_no_staged_rows(self):
+        import_rankings(self.rankings, workers=2)
+        # a re-scrape of the middle week that lost its top rows
+        self.write_week(WEEK2, [ranking_row(3, "Novak Djokovic", 1)])
+        with self.assertRaises(RankingValidationError):
+            import_rankings(self.rankings, workers=2, force=True)
+        self.assertFalse(RankingStaging.objects.exists())
+        self.assertEqual(Ranking.objects.filter(date=WEEK2).count(), 4)
+
+
+class ImportManifestTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.week1 = self.write_week(WEEK1, [ranking_row(1, "Stan Wawrinka", 9000), ranking_row(2, "Roger Federer", 8000)])
+        self.week2 = self.write_week(WEEK2, [ranking_row(1, "Roger Federer", 9500), ranking_row(2, "Stan Wawrinka", 9000)])
+        self.rankings = os.path.join(self.folder, "rankings")
+        self.assertEqual(import_rankings(self.rankings), (4, 2, 0))
+
+    def test_unchanged_files_are_skipped(self):
+        with mock.patch("players.management.commands.import_tennis_data.file_sha256") as sha256:
+            self.assertEqual(import_rankings(self.rankings), (0, 0, 2))
+        # size and mtime match: not even hashed
+        sha256.assert_not_called()
+
+    def test_force_reimports(self):
+        self.assertEqual(import_rankings(self.rankings, force=True), (4, 2, 0))
+
+    def test_touched_but_identical_file_is_skipped(self):
+        stat = os.stat(self.week1)
+        os.utime(self.week1, (stat.st_atime, stat.st_mtime + 60))
+        self.assertEqual(import_rankings(self.rankings), (0, 0, 2))
+        # the new mtime is remembered, so the next run doesn't hash it again
+        entry = ImportManifest.objects.get(path=os.path.abspath(self.week1))
+        self.assertEqual(entry.mtime, stat.st_mtime + 60)
+        with mock.patch("players.management.commands.import_tennis_data.file_sha256") as sha256:
+            self.assertEqual(import_rankings(self.rankings), (0, 0, 2))
+        sha256.assert_not_called()
+
+    def test_changed_file_is_reimported(self):
+        self.write_week(WEEK2, [ranking_row(1, "Roger Federer", 9600), ranking_row(2, "Stan Wawrinka", 9000)])
+        self.assertEqual(import_rankings(self.rankings), (2, 1, 1))
+        self.assertEqual(Ranking.objects.get(date=WEEK2, rank=1).points, 9600)
+
+    def test_week_that_fails_validation_is_not_recorded(self):
+        self.write_week(WEEK2, [ranking_row(2, "Stan Wawrinka", 9000)])
+        with self.assertRaises(RankingValidationError):
+            import_rankings(self.rankings)
+        # recorded in the publish transaction, so the old entry stands and the file is retried
+        entry = ImportManifest.objects.get(path=os.path.abspath(self.week2))
+        self.assertNotEqual(entry.size, os.path.getsize(self.week2))
+        self.assertEqual(entry.rows, 2)
+
+
+class IterJsonArrayTests(TempDataMixin, SimpleTestCase):
+    def write(self, text):
+        path = os.path.join(self.folder, "data.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_items_split_across_chunks(self):
+        items = [
+            {"name": "Stan Wawrinka", "points": 1234567},
+            {"name": 'quote " and ] bracket, comma', "nested": [1, [2, {"a": None}]]},
+            12345678901234567890,
+            -0.000125,
+            "Ñandú",
+            [],
+            {},
+            True,
+        ]
+        text = json.dumps(items, ensure_ascii=False, indent=1)
+        path = self.write(text)
+        # every split point of the file falls on a chunk boundary for some size
+        for chunk_size in range(1, len(text) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_array(path, chunk_size=chunk_size)), items)
+
+    def test_number_cut_at_chunk_end(self):
+        path = self.write("[12345,678]")
+        for chunk_size in range(1, 12):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_array(path, chunk_size=chunk_size)), [12345, 678])
+
+    def test_empty_array_and_whitespace(self):
+        self.assertEqual(list(iter_json_array(self.write(" \n [ ] \n"), chunk_size=1)), [])
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(self.write('{"a": 1}')))
+
+    def test_truncated_array(self):
+        for text in ['[{"a": 1}, ', '[{"a": 1}, {"b": ']:
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                list(iter_json_array(self.write(text), chunk_size=4))
+
+
+class PlayerImportTests(ImportTestCase):
+    def import_entries(self, entries):
+        return import_players(self.write_json("players_data.json", entries))
+
+    def test_players_stats_and_records(self):
+        self.assertEqual(self.import_entries([player_entry("Stan Wawrinka"), player_entry("Roger Federer")]), 2)
+
+        stan = Player.objects.get(name="Stan Wawrinka")
+        self.assertEqual((stan.country, stan.coach, stan.height_cm), ("Switzerland", "Magnus Norman", 183))
+        self.assertEqual(stan.birth_date, datetime.date(1985, 3, 28))
+        self.assertEqual((stan.stats.aces, stan.stats.first_serve_pct, stan.stats.return_games_won), (7034, 56.0, 24.0))
+        records = {record.season: record for record in stan.records.all()}
+        self.assertEqual((records["YTD"].rank, records["YTD"].move, records["YTD"].wl_record), (16, None, "30 - 12"))
+        self.assertEqual(records["Career"].titles, 16)
+
+    def test_reimport_updates_and_keeps_ids(self):
+        self.import_entries([player_entry("Stan Wawrinka"), player_entry("Roger Federer")])
+        ids = dict(Player.objects.values_list("name", "id"))
+
+        changed = player_entry("Stan Wawrinka", Overview={"Coach": "Richard Krajicek"})
+        self.import_entries([changed, player_entry("Roger Federer"), player_entry("Rafael Nadal")])
+
+        after = dict(Player.objects.values_list("name", "id"))
+        self.assertEqual({name: after[name] for name in ids}, ids)
+        self.assertNotIn(after["Rafael Nadal"], ids.values())
+        self.assertEqual(Player.objects.get(name="Stan Wawrinka").coach, "Richard Krajicek")
+        self.assertEqual((PlayerStat.objects.count(), PlayerRecord.objects.count()), (3, 6))
+
+    def test_name_repeated_in_a_batch_keeps_last_entry(self):
+        self.import_entries([player_entry("Stan Wawrinka", height_cm=180), player_entry("STAN WAWRINKA", height_cm=183)])
+        self.assertEqual(Player.objects.get().height_cm, 183)
+
+    def test_birth_date_change_recomputes_ranking_ages(self):
+        self.import_entries([player_entry("Stan Wawrinka", birth_date="1985-03-28")])
+        import_ranking_file(self.write_week(WEEK1, [ranking_row(1, "Stan Wawrinka", 9000)]))
+        self.assertEqual(Ranking.objects.get().age, 34)
+
+        self.import_entries([player_entry("Stan Wawrinka", birth_date="1986-06-01")])
+        self.assertEqual(Ranking.objects.get().age, 33)
+
+    def test_queries_do_not_grow_with_players(self):
+        def queries(entries):
+            with CaptureQueriesContext(connection) as captured:
+                self.import_entries(entries)
+            return len(captured)
+
+        self.assertEqual(queries([player_entry(f"Player {i}") for i in range(3)]),
+                         queries([player_entry(f"Other {i}") for i in range(30)]))
+        # SQLite caps the parameters of one statement, so large inserts are split, but never per player
+        self.assertLess(queries([player_entry(f"Third {i}") for i in range(300)]), 30)
+
+
+class RankingArchiveTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        # an older scrape, with thousands separators, and one by the current scraper, without
+        self.weeks = {
+            WEEK1: [
+                ranking_row(1, "Stan Wawrinka", "10,235", Rank_change="2", Earn_Drop="+170", Dropping="1,000"),
+                ranking_row("2T", "Roger Federer", "9,870", Rank_change="-1", Country="sui"),
+                ranking_row("2T", "Rafael Nadal", "9,870", Age="-", Tournaments="-", Country="esp"),
+            ],
+            WEEK2: [
+                ranking_row(1, "Roger Federer", "11540", Rank_change="-1", Earn_Drop="+50", **{"Next Best": "45"}),
+                ranking_row(2, "Stan Wawrinka", "10950", Rank_change="1"),
+                ranking_row(3, "Rafael Nadal", "980"),
+            ],
+        }
+        for snapshot_date, rows in self.weeks.items():
+            self.write_week(snapshot_date, rows)
+        self.json_folder = os.path.join(self.folder, "rankings")
+        self.archive = os.path.join(self.folder, "archive")
+        call_command("ranking_archive", json=self.json_folder, archive=self.archive, stdout=StringIO())
+
+    def test_export_reproduces_the_scraped_files(self):
+        exported = os.path.join(self.folder, "exported")
+        call_command("ranking_archive", export=True, json=exported, archive=self.archive, stdout=StringIO())
+        for snapshot_date, rows in self.weeks.items():
+            with self.subTest(week=snapshot_date):
+                with open(os.path.join(exported, f"{snapshot_date.isoformat()}.json"), encoding="utf-8") as f:
+                    self.assertEqual(json.load(f), rows)
+
+    def test_weeks_keep_their_points_format(self):
+        self.assertEqual(
+            [(day, columns["points_grouped"]) for day, columns in iter_snapshots(os.path.join(self.archive, "2020.npz"))],
+            [(WEEK1, True), (WEEK2, False)],
+        )
+
+    def test_version_1_files_export_with_separators(self):
+        path = os.path.join(self.archive, "2020.npz")
+        year = read_year(path)
+        del year["points_grouped"]
+        year["format_version"] = np.int32(1)
+        np.savez_compressed(path, **year)
+        self.assertEqual([columns["points_grouped"] for _, columns in iter_snapshots(path)], [True, True])
+
+    def test_archive_imports_like_the_json(self):
+        def imported(folder):
+            # every row is rewritten, so a column the archive drops would show
+            import_rankings(folder, force=True)
+            return sorted(Ranking.objects.values_list(
+                "date", "player__name", "rank", "rank_change", "points", "earn_drop", "age", "tournaments",
+                "dropping", "next_best", "country",
+            ))
+
+        self.assertEqual(imported(self.archive), imported(self.json_folder))
+
+
+class DeltaImportTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.week1 = [ranking_row(1, "Stan Wawrinka", 9000), ranking_row(2, "Roger Federer", 8000),
+                      ranking_row(3, "Rafael Nadal", 7000)]
+        with self.captureOnCommitCallbacks(execute=True):
+            import_ranking_delta(self.write_week(WEEK1, self.week1))
+        self.ids = dict(Player.objects.values_list("name", "pk"))
+        self.stamp = read_publish_stamp()
+
+    def reimport(self, rows, snapshot_date=WEEK1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_ranking_delta(self.write_week(snapshot_date, rows))
+
+    def test_new_week_is_written_in_full(self):
+        changes = self.reimport([ranking_row(1, "Roger Federer", 9500), ranking_row(2, "Stan Wawrinka", 9000),
+                                 ranking_row(3, "Andy Murray", 6000)], WEEK2)
+        self.assertEqual((changes["written"], changes["affected_players"]), (3, None))
+        self.assertEqual(changes["previous_date"], "2020-01-06")
+        self.assertEqual([e["name"] for e in changes["entrants"]], ["Andy Murray"])
+        self.assertEqual([e["name"] for e in changes["leavers"]], ["Rafael Nadal"])
+        self.assertEqual({m["name"]: (m["from"], m["to"]) for m in changes["movers"]},
+                         {"Roger Federer": (2, 1), "Stan Wawrinka": (1, 2)})
+        stamp = read_publish_stamp()
+        self.assertEqual((stamp["date"], stamp["players"]), ("2020-01-13", []))
+        self.assertNotEqual(stamp["base"], self.stamp["base"])
+
+    def test_reimport_writes_only_changed_rows(self):
+        self.week1[2] = ranking_row(3, "Rafael Nadal", 7100)
+        changes = self.reimport(self.week1)
+        nadal = self.ids["Rafael Nadal"]
+        self.assertEqual((changes["written"], changes["deleted"]), (1, 0))
+        self.assertEqual(changes["affected_players"], [nadal])
+        self.assertEqual(Ranking.objects.get(player_id=nadal, date=WEEK1).points, 7100)
+        # the stamp keeps its base and names the player, so caches drop only their entries
+        stamp = read_publish_stamp()
+        self.assertEqual((stamp["base"], stamp["players"]), (self.stamp["base"], [nadal]))
+
+    def test_reimport_drops_players_who_left(self):
+        changes = self.reimport(self.week1[:2])
+        self.assertEqual((changes["written"], changes["deleted"]), (0, 1))
+        self.assertEqual(Ranking.objects.filter(date=WEEK1).count(), 2)
+        self.assertEqual(RankingWeek.objects.get(date=WEEK1).row_count, 2)
+        self.assertEqual(read_publish_stamp()["players"], [self.ids["Rafael Nadal"]])
+
+    def test_unchanged_reimport_publishes_nothing(self):
+        changes = self.reimport(self.week1)
+        self.assertEqual((changes["written"], changes["deleted"]), (0, 0))
+        self.assertEqual(read_publish_stamp(), self.stamp)
+
+    def test_older_week_affects_nobody(self):
+        self.reimport([ranking_row(1, "Roger Federer", 9500), ranking_row(2, "Stan Wawrinka", 9000)], WEEK2)
+        stamp = read_publish_stamp()
+        self.week1[0] = ranking_row(1, "Stan Wawrinka", 9100)
+        changes = self.reimport(self.week1)
+        self.assertEqual((changes["written"], changes["affected_players"]), (1, []))
+        self.assertEqual(read_publish_stamp(), stamp)
+
+
+class SyntheticDataTests(ImportTestCase):
+    def test_generated_data_imports(self):
+        call_command("generate_synthetic_data", players=40, weeks=3, output=self.folder, stdout=StringIO())
+        self.assertEqual(import_players(os.path.join(self.folder, "players_data.json")), 40)
+        self.assertEqual(import_rankings(os.path.join(self.folder, "rankings")), (120, 3, 0))
+
+        ids = dict(Player.objects.values_list("name", "pk"))
+        with open(os.path.join(self.folder, "rankings", f"{WEEK3.isoformat()}.json"), encoding="utf-8") as f:
+            rows = json.load(f)
+        self.assertFalse(any("," in row["Points"] for row in rows))
+        stored = {ranking.player_id: ranking for ranking in Ranking.objects.filter(date=WEEK3)}
+        for row in rows:
+            ranking = stored[ids[row["Player"]]]
+            self.assertEqual(
+                (ranking.rank, ranking.points, ranking.dropping, ranking.country),
+                (int(row["Rank"]), int(row["Points"]),
+                 None if row["Dropping"] == "-" else int(row["Dropping"].replace(",", "")), row["Country"]),
+            )
+
+
+class ClearTablesTests(TempDataMixin, TransactionTestCase):
+    # a TransactionTestCase: PostgreSQL won't TRUNCATE tables written earlier in the same transaction
+    def setUp(self):
+        super().setUp()
+        import_players(self.write_json("players.json", [player_entry("Stan Wawrinka"), player_entry("Roger Federer")]))
+        self.write_week(WEEK1, [ranking_row(1, "Stan Wawrinka", 9000), ranking_row(2, "Roger Federer", 8000)])
+        import_rankings(os.path.join(self.folder, "rankings"))
+
+    def test_empties_every_import_table_without_loading_rows(self):
+        with mock.patch("players.management.commands.import_tennis_data.touch_publish_stamp") as touch, \
+                CaptureQueriesContext(connection) as queries:
+            clear_tables()
+        self.assertFalse([q["sql"] for q in queries if q["sql"].lstrip().upper().startswith("SELECT")])
+        for model in CLEAR_MODELS:
+            with self.subTest(model=model.__name__):
+                self.assertFalse(model.objects.exists())
+        touch.assert_called_once_with()
+
+    def test_sequences_restart(self):
+        clear_tables()
+        import_rankings(os.path.join(self.folder, "rankings"))
+        self.assertEqual(sorted(Ranking.objects.values_list("pk", flat=True)), [1, 2])
+
+    def test_only_the_given_models(self):
+        clear_tables([Ranking, RankingWeek, ImportManifest])
+        self.assertFalse(Ranking.objects.exists())
+        self.assertEqual(Player.objects.count(), 2)
+        self.assertTrue(PlayerStat.objects.exists())
+
+
+class FoldNameTests(SimpleTestCase):
+    def test_spellings_fold_together(self):
+        key = fold_name("Stan Wawrinka")
+        for name in ["WAWRINKA Stan", "Stan-Wawrinka", "  stan   wawrinka ", "Stàn Wawrïnka"]:
+            with self.subTest(name=name):
+                self.assertEqual(fold_name(name), key)
+
+    def test_empty(self):
+        for name in [None, "", " - . "]:
+            with self.subTest(name=name):
+                self.assertIsNone(fold_name(name))
+
+
+class PlayerResolverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stan = Player.objects.create(id="STANW", name="Stan Wawrinka")
+        cls.rafa = Player.objects.create(id="RAFAN", name="Rafael Nadal")
+
+    def test_lookup_by_folded_name(self):
+        resolver = PlayerResolver.load()
+        self.assertEqual(resolver["wawrinka, stan"], self.stan)
+        self.assertIn("Rafael NADAL", resolver)
+        self.assertIsNone(resolver.get("Roger Federer"))
+        with self.assertRaises(KeyError):
+            resolver["Roger Federer"]
+
+    def test_alias_wins_over_folded_name(self):
+        # "Stan Wawrinka" folds to the same key, but the alias says otherwise
+        PlayerAlias.objects.create(player=self.rafa, alias="Wawrinka Stan", key=fold_name("Wawrinka Stan"))
+        self.assertEqual(PlayerResolver.load()["Stan Wawrinka"], self.rafa)
+
+    def test_add_alias_persists(self):
+        resolver = PlayerResolver.load()
+        resolver.add_alias("Rafa", self.rafa)
+        self.assertEqual(resolver["RAFA"], self.rafa)
+        self.assertEqual(PlayerResolver.load()["rafa"], self.rafa)
+
+    def test_misses_are_reported(self):
+        resolver = PlayerResolver.load()
+        self.assertIsNone(resolver.resolve("Roger Federer", "2020-01-06.json"))
+        self.assertEqual(resolver.resolve("Stan Wawrinka"), self.stan)
+        self.assertEqual(resolver.miss_report(), ["Roger Federer (2020-01-06.json)"])
+
+
+class PublishWeekTests(ImportTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.players = [Player.objects.create(id=f"P000{i}", name=f"Player {i}") for i in range(1, 5)]
+
+    def rankings(self, snapshot_date, ranks, model=Ranking):
+        return [
+            model(player=player, date=snapshot_date, rank=rank, points=1000 - rank)
+            for player, rank in zip(self.players, ranks)
+        ]
+
+    def load(self, snapshot_date, ranks, **options):
+        """Load a week the way the importer does and publish it."""
+        staged = prepare_week(snapshot_date)
+        if staged:
+            stage_rankings(self.rankings(snapshot_date, ranks, RankingStaging))
+        else:
+            Ranking.objects.bulk_create(self.rankings(snapshot_date, ranks))
+        return publish_week(snapshot_date, staged, **options)
+
+    def live_ranks(self, snapshot_date):
+        return dict(Ranking.objects.published().filter(date=snapshot_date).values_list("player_id", "rank"))
+
+    def test_new_week_is_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            count = self.load(WEEK1, [1, 2, 3, 4])
+        self.assertEqual(count, 4)
+        week = RankingWeek.objects.get(date=WEEK1)
+        self.assertTrue(week.is_published)
+        self.assertEqual(week.row_count, 4)
+        self.assertEqual(read_publish_stamp()["date"], "2020-01-06")
+
+    def test_invalid_new_week_stays_hidden(self):
+        for ranks, message in [([2, 3, 4, 5], "no rank 1"), ([1, 0, 2, 3], "ranks must be positive")]:
+            with self.subTest(ranks=ranks):
+                with self.assertRaisesMessage(RankingValidationError, message):
+                    self.load(WEEK1, ranks)
+                self.assertFalse(RankingWeek.objects.filter(date=WEEK1, is_published=True).exists())
+                self.assertEqual(self.live_ranks(WEEK1), {})
+
+    def test_reload_of_unpublished_week_replaces_leftovers(self):
+        Ranking.objects.bulk_create(self.rankings(WEEK1, [2, 3, 4, 5]))
+        with self.assertRaises(RankingValidationError):
+            publish_week(WEEK1, prepare_week(WEEK1))
+        # the next load only has three players; the fourth must not linger
+        self.players = self.players[:3]
+        self.assertEqual(self.load(WEEK1, [1, 2, 3]), 3)
+        self.assertEqual(self.live_ranks(WEEK1), {"P0001": 1, "P0002": 2, "P0003": 3})
+
+    def test_reimport_swaps_in_staged_rows(self):
+        self.load(WEEK1, [1, 2, 3, 4])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load(WEEK1, [4, 3, 2, 1])
+        self.assertEqual(self.live_ranks(WEEK1), {"P0001": 4, "P0002": 3, "P0003": 2, "P0004": 1})
+        self.assertFalse(RankingStaging.objects.exists())
+
+    def test_reimport_that_shrinks_drops_missing_players(self):
+        self.load(WEEK1, [1, 2, 3, 4])
+        self.load(WEEK2, [1, 2, 3, 4])
+        self.players = self.players[:3]
+        self.assertEqual(self.load(WEEK2, [1, 2, 3]), 3)
+        self.assertEqual(self.live_ranks(WEEK2), {"P0001": 1, "P0002": 2, "P0003": 3})
+        self.assertEqual(RankingWeek.objects.get(date=WEEK2).row_count, 3)
+
+    def test_truncated_reimport_is_rejected(self):
+        self.load(WEEK1, [1, 2, 3, 4])
+        self.load(WEEK2, [1, 2, 3, 4])
+        self.players = self.players[:1]
+        with self.assertRaisesMessage(RankingValidationError, "only 1 rows against 4"):
+            self.load(WEEK2, [1])
+        self.assertEqual(len(self.live_ranks(WEEK2)), 4)
+        self.assertFalse(RankingStaging.objects.exists())
+
+    def test_failed_record_rolls_back_the_swap(self):
+        self.load(WEEK1, [1, 2, 3, 4])
+
+        def record():
+            raise OSError("manifest write failed")
+
+        with self.assertRaises(OSError):
+            self.load(WEEK1, [4, 3, 2, 1], record=record)
+        self.assertEqual(self.live_ranks(WEEK1), {"P0001": 1, "P0002": 2, "P0003": 3, "P0004": 4})
+        self.assertFalse(RankingStaging.objects.exists())
+
+
+class BackfillRankingAgesTests(TestCase):
+    BIRTH_DATES = [
+        datetime.date(1988, 2, 29), datetime.date(1990, 1, 1), datetime.date(1985, 12, 31),
+        datetime.date(1995, 6, 15), None,
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        players = Player.objects.bulk_create(
+            Player(id=f"P000{i}", name=f"Player {i}", birth_date=birth_date)
+            for i, birth_date in enumerate(cls.BIRTH_DATES)
+        )
+        # around every birthday, including Feb 28 and Mar 1 of leap and common years
+        dates = sorted({
+            day + datetime.timedelta(days=offset)
+            for year in (2019, 2020, 2023, 2024)
+            for day in [datetime.date(year, 1, 1), datetime.date(year, 2, 28), datetime.date(year, 6, 15),
+                        datetime.date(year, 12, 31)]
+            for offset in (-1, 0, 1)
+        })
+        Ranking.objects.bulk_create(
+            Ranking(player=player, date=day, rank=rank, age=0)
+            for day in dates for rank, player in enumerate(players, start=1)
+        )
+
+    def test_matches_calculate_age(self):
+        self.assertEqual(backfill_ranking_ages(), Ranking.objects.count())
+        for ranking in Ranking.objects.select_related("player"):
+            with self.subTest(birth_date=ranking.player.birth_date, date=ranking.date):
+                self.assertEqual(ranking.age, calculate_age(ranking.player.birth_date, ranking.date))
+
+    def test_only_the_given_players(self):
+        self.assertEqual(backfill_ranking_ages(["P0001"]), Ranking.objects.filter(player_id="P0001").count())
+        self.assertFalse(Ranking.objects.filter(player_id="P0001", age=0).exists())
+        self.assertFalse(Ranking.objects.exclude(player_id="P0001").exclude(age=0).exists())
+
+
+class MovementMigrationTests(TransactionTestCase):
+    """0017 casts the scraped movement text ("+12", "1,234", "-") to integers."""
+
+    before = [("players", "0016_publish_existing_ranking_weeks")]
+    after = [("players", "0017_ranking_movement_integers")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        self.addCleanup(self.migrate_to_latest)
+
+    def migrate_to_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_text_is_cast_to_integers(self):
+        apps = self.executor.loader.project_state(self.before).apps
+        player = apps.get_model("players", "Player").objects.create(id="P0001", name="Player 1")
+        Ranking = apps.get_model("players", "Ranking")
+        values = [("+12", "-3", "1,234", "-"), ("-", "+250", "", " 45 ")]
+        for day, (rank_change, earn_drop, dropping, next_best) in enumerate(values, start=1):
+            Ranking.objects.create(
+                player=player, date=datetime.date(2020, 1, day), rank=day, rank_change=rank_change,
+                earn_drop=earn_drop, dropping=dropping, next_best=next_best,
+            )
+
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.after)
+        Ranking = self.executor.loader.project_state(self.after).apps.get_model("players", "Ranking")
+        self.assertEqual(
+            list(Ranking.objects.order_by("date").values_list("rank_change", "earn_drop", "dropping", "next_best")),
+            [(12, -3, 1234, None), (None, 250, None, 45)],
+        )
+
+
+class BundleTests(TempDataMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        import_players(self.write_json("players.json", [
+            player_entry("Stan Wawrinka"), player_entry("Roger Federer", birth_date="1981-08-08", height_cm=None),
+        ]))
+        self.write_week(WEEK1, [ranking_row(1, "Stan Wawrinka", 9000, Rank_change="2", Earn_Drop="+170"),
+                                ranking_row(2, "Roger Federer", 8000, Dropping="1,000")])
+        self.write_week(WEEK2, [ranking_row(1, "Roger Federer", 9500), ranking_row(2, "Stan Wawrinka", 9000)])
+        import_rankings(os.path.join(self.folder, "rankings"))
+        stan, roger = sorted(Player.objects.values_list("pk", flat=True))
+        PlayerAlias.objects.create(player_id=stan, alias="Stanislas Wawrinka", key=fold_name("Stanislas Wawrinka"))
+        Match.objects.create(
+            tourney_id="2020-580", tourney_name="Australian Open", tourney_date=WEEK2, tourney_level="G",
+            surface="Hard", draw_size=128, best_of=5, round="F", match_num=1, winner_id=stan, loser_id=roger,
+            score='6-4 3-6 7-6(5) "RET"',
+        )
+        HeadToHead.objects.create(player_a_id=stan, player_b_id=roger, a_wins=1, hard_a_wins=1,
+                                  last_match_date=WEEK2)
+        self.path = os.path.join(self.folder, "dataset.zip")
+
+    def tables(self):
+        return {model.__name__: list(model.objects.order_by("pk").values_list()) for model in BUNDLE_MODELS}
+
+    def test_round_trip(self):
+        manifest = export_bundle(self.path)
+        self.assertEqual(manifest["tables"]["players_ranking"]["rows"], 4)
+        exported = self.tables()
+
+        clear_tables()
+        load_bundle(self.path)
+        self.assertEqual(self.tables(), exported)
+        self.assertEqual(PlayerFeatures.objects.count(), 2)
+        # sequences moved past the loaded ids
+        Ranking.objects.create(player_id=Player.objects.first().pk, date=WEEK3, rank=1)
+
+    def test_tables_must_be_empty_unless_replaced(self):
+        export_bundle(self.path)
+        with self.assertRaisesMessage(BundleError, "target tables are not empty"):
+            load_bundle(self.path)
+        load_bundle(self.path, clear=clear_tables)
+        self.assertEqual(Ranking.objects.count(), 4)
+
+    def test_checksum_mismatch_is_rejected(self):
+        export_bundle(self.path)
+        tampered = os.path.join(self.folder, "tampered.zip")
+        with zipfile.ZipFile(self.path) as source, zipfile.ZipFile(tampered, "w") as target:
+            for item in source.infolist():
+                data = source.read(item)
+                if item.filename == "players_ranking.csv":
+                    data = data.replace(b"9500", b"9600")
+                target.writestr(item, data)
+
+        clear_tables()
+        with self.assertRaisesMessage(BundleError, "players_ranking.csv: checksum mismatch"):
+            load_bundle(tampered)
+        self.assertFalse(Player.objects.exists())
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL sets the export's isolation level")
+    def test_export_reads_one_snapshot(self):
+        with CaptureQueriesContext(connection) as queries:
+            export_bundle(self.path)
+        self.assertEqual(
+            [q["sql"] for q in queries[:2]], ["BEGIN", "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"],
+        )
+
+
+class PublishStampTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        RankingWeek.objects.create(date=WEEK1, is_published=True, row_count=1)
+
+    def test_touch_starts_a_new_base(self):
+        touch_publish_stamp(["P0001"])
+        before = read_publish_stamp()
+        touch_publish_stamp()
+        stamp = read_publish_stamp()
+        self.assertEqual(stamp["date"], "2020-01-06")
+        self.assertNotEqual(stamp["version"], before["version"])
+        self.assertEqual((stamp["base"], stamp["players"]), (stamp["version"], []))
+
+    def test_players_add_up_until_the_next_week(self):
+        touch_publish_stamp()
+        base = read_publish_stamp()["base"]
+        touch_publish_stamp(["P0002"])
+        touch_publish_stamp(["P0001"])
+        self.assertEqual(read_publish_stamp()["players"], ["P0001", "P0002"])
+        self.assertEqual(read_publish_stamp()["base"], base)
+
+        RankingWeek.objects.create(date=WEEK2, is_published=True, row_count=1)
+        touch_publish_stamp(["P0003"])
+        stamp = read_publish_stamp()
+        self.assertEqual((stamp["date"], stamp["players"]), ("2020-01-13", []))
+        self.assertNotEqual(stamp["base"], base)
+
+    def test_touch_recreates_a_missing_row(self):
+        PublishStamp.objects.all().delete()
+        self.assertIsNone(read_publish_stamp())
+        touch_publish_stamp(["P0001"])
+        self.assertEqual(read_publish_stamp()["date"], "2020-01-06")
+
+    def test_other_processes_are_polled_at_an_interval(self):
+        touch_publish_stamp()
+        stamp = current_publish_stamp()
+        # another host publishes: this process only sees it once the poll interval has passed
+        PublishStamp.objects.filter(pk=1).update(version=1)
+        self.assertEqual(current_publish_stamp(), stamp)
+        with mock.patch("players.publishing.STAMP_POLL_SECONDS", 0):
+            self.assertEqual(current_publish_stamp()["version"], 1)
+        # its own publish at once
+        touch_publish_stamp()
+        self.assertEqual(current_publish_stamp(), read_publish_stamp())
+
+
+
+def match_row(tourney_id, match_num, winner, loser, surface="Hard", tourney_date="20240101"):
+    """One row of a tennis_atp match CSV, with the columns import_matches reads."""
+    return {
+        "tourney_id": tourney_id, "tourney_name": tourney_id, "surface": surface, "draw_size": "32",
+        "tourney_level": "A", "tourney_date": tourney_date, "match_num": str(match_num),
+        "winner_name": winner, "winner_seed": "", "winner_entry": "", "loser_name": loser, "loser_seed": "",
+        "loser_entry": "", "score": "6-4 6-4", "best_of": "3", "round": "R32",
+    }
+
+
+class MatchImportTests(ImportTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Player.objects.bulk_create([
+            Player(id="P0001", name="Roger Federer"),
+            Player(id="P0002", name="Rafael Nadal"),
+            Player(id="P0003", name="Novak Djokovic"),
+        ])
+
+    def write_matches(self, name, rows):
+        path = os.path.join(self.folder, name)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def import_matches(self, *args):
+        call_command("import_matches", *args, "--force", stdout=StringIO())
+
+    def head_to_head(self):
+        return list(HeadToHead.objects.order_by("player_a", "player_b").values(
+            "player_a", "player_b", "last_match_date", *COUNT_FIELDS,
+        ))
+
+    def test_incremental_index_equals_a_rebuild(self):
+        first = self.write_matches("atp_matches_2023.csv", [
+            match_row("2023-1", 1, "Roger Federer", "Rafael Nadal", "Grass", "20230703"),
+            match_row("2023-1", 2, "Rafael Nadal", "Novak Djokovic", "Clay", "20230703"),
+            match_row("2023-1", 3, "Roger Federer", "Stan Wawrinka"),
+        ])
+        second = self.write_matches("atp_matches_2024.csv", [
+            match_row("2024-1", 1, "Rafael Nadal", "Roger Federer", "Clay", "20240527"),
+            match_row("2024-1", 2, "Novak Djokovic", "Rafael Nadal", "Carpet", "20240527"),
+            match_row("2024-2", 1, "Novak Djokovic", "Roger Federer", "", "20240108"),
+        ])
+        self.import_matches(first)
+        # the second file arrives later; the first is re-read and its matches are not counted twice
+        self.import_matches(first, second)
+        self.assertEqual(Match.objects.count(), 5)
+        incremental = self.head_to_head()
+
+        self.import_matches("--rebuild-h2h")
+        self.assertEqual(self.head_to_head(), incremental)
+        federer_nadal = HeadToHead.objects.for_pair("P0002", "P0001")
+        self.assertEqual((federer_nadal.a_wins, federer_nadal.b_wins), (1, 1))
+        self.assertEqual((federer_nadal.grass_a_wins, federer_nadal.clay_b_wins), (1, 1))
+        self.assertEqual(federer_nadal.last_match_date, datetime.date(2024, 5, 27))
+
+
+class PlayerFeaturesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Player.objects.bulk_create([
+            Player(id="P0001", name="Roger Federer", height_cm=185, plays="Right-Handed, One-Handed Backhand",
+                   birth_date=datetime.date(1981, 8, 8)),
+            Player(id="P0002", name="Rafael Nadal", height_cm=185, plays="Left-Handed, Two-Handed Backhand"),
+            Player(id="P0003", name="Novak Djokovic"),
+        ])
+        RankingWeek.objects.bulk_create([
+            RankingWeek(date=WEEK1, is_published=True, row_count=2),
+            RankingWeek(date=WEEK2, is_published=True, row_count=2),
+            RankingWeek(date=WEEK3, is_published=False, row_count=2),
+        ])
+        Ranking.objects.bulk_create(
+            Ranking(player_id=player_id, date=week, rank=rank + offset, points=1000 - rank - offset)
+            for offset, week in enumerate([WEEK1, WEEK2, WEEK3])
+            for rank, player_id in [(1, "P0001"), (2, "P0002")]
+        )
+
+    def features(self, rows):
+        return {
+            row.player_id: (row.ranking_date, row.rank, row.points, row.height_cm, row.age, row.hand_right)
+            for row in rows
+        }
+
+    def test_refresh_uses_the_latest_published_week(self):
+        self.assertEqual(refresh_player_features(), 3)
+        features = self.features(PlayerFeatures.objects.all())
+        age = Player.objects.get(pk="P0001").age
+        self.assertEqual(features, {
+            "P0001": (WEEK2, 2, 998, 185, age, True),
+            "P0002": (WEEK2, 3, 997, 185, None, False),
+            "P0003": (None, None, None, None, None, False),
+        })
+
+    def test_refresh_only_the_given_players(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_player_features()
+        Player.objects.update(height_cm=190)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(refresh_player_features(["P0001"]), 1)
+        heights = dict(PlayerFeatures.objects.values_list("player_id", "height_cm"))
+        self.assertEqual(heights, {"P0001": 190, "P0002": 185, "P0003": None})
+        self.assertEqual(read_publish_stamp()["players"], ["P0001"])
+
+    def test_missing_players_are_built_on_the_fly(self):
+        refresh_player_features()
+        expected = self.features(PlayerFeatures.objects.all())
+        PlayerFeatures.objects.exclude(pk="P0001").delete()
+
+        with self.assertNumQueries(3):
+            features = player_features(["P0001", "P0002", "P0003", "P0004"])
+        self.assertEqual(self.features(features.values()), expected)
+        self.assertEqual(PlayerFeatures.objects.count(), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(player_features(["P0001"])), ["P0001"])
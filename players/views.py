@@ -1,7 +1,7 @@
 from django.shortcuts import render
 from django.utils.timezone import now
 from datetime import timedelta
-from .models import Ranking, Player, PlayerRecord
+from .models import Ranking, Player, PlayerRecord, RankingWeek
 
 
 def home_page(request):
@@ -14,9 +14,9 @@ def atp_ranking(request):
     selected_date = request.GET.get("date")
 
     available_dates = (
-        Ranking.objects.order_by("-date")
+        RankingWeek.objects.filter(is_published=True)
+        .order_by("-date")
         .values_list("date", flat=True)
-        .distinct()
     )
 
     if not selected_date:
@@ -24,7 +24,7 @@ def atp_ranking(request):
     else:
         latest_date = selected_date
 
-    rankings = Ranking.objects.filter(date=latest_date).select_related("player").order_by("rank")
+    rankings = Ranking.objects.published().filter(date=latest_date).select_related("player").order_by("rank")
 
     if selected_limit != "all":
         try:
@@ -0,0 +1,121 @@
+"""Per-process LRU/TTL cache of match predictions.
+
+Keys are the prediction input as asked: the ordered player pair, the
+match context and the latest published ranking date. The pair is not
+normalized, since with tied ranks predict_matches scores the two orders
+independently and p(B beats A) need not equal 1 - p(A beats B).
+The latest date comes from players.publishing's stamp, polled from the
+database every few seconds. When a new week is published, the stamp
+changes and every worker drops its whole cache at its next poll. After a delta re-import of the live
+week, the stamp keeps its base version and lists the players changed
+since; a worker that saw that base only drops those players' entries.
+The whole cache is also dropped when another model version is activated
+in the registry.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from players.publishing import current_publish_stamp
+from .ml_utils import active_version
+
+CACHE_SIZE = 10_000
+CACHE_TTL = 60 * 60
+
+
+def match_key(p1_id, p2_id, match):
+    """The cache key of a matchup, player1 first."""
+    return (
+        p1_id, p2_id, match.get("player1_seed") or 0, match.get("player2_seed") or 0,
+        match["tourney_level"], match["surface"],
+        int(match["best_of"]), int(match["round_encoded"]), int(match["draw_size"]),
+    )
+
+
+class PredictionCache:
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp_version = None
+        self._stamp_base = None
+        self._model = None
+        self.ranking_date = None
+        self.hits = self.misses = self.evictions = self.invalidations = self.player_invalidations = 0
+
+    def _check_stamp(self):
+        """Drop what a publish or a model change since the last lookup made stale.
+
+        Call with the lock held.
+        """
+        stamp = current_publish_stamp() or {}
+        model = active_version().fingerprint
+        if stamp.get("version") == self._stamp_version and model == self._model:
+            return
+
+        if (model == self._model and self._stamp_base is not None
+                and stamp.get("base") == self._stamp_base and stamp.get("date") == self.ranking_date):
+            players = set(stamp.get("players") or [])
+            stale = [key for key in self._entries if key[1] in players or key[2] in players]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self.player_invalidations += 1
+        else:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+        self._stamp_version = stamp.get("version")
+        self._stamp_base = stamp.get("base")
+        self._model = model
+        self.ranking_date = stamp.get("date")
+
+    def get(self, p1_id, p2_id, match):
+        """Player1's cached win probability, or None."""
+        key = match_key(p1_id, p2_id, match)
+        with self._lock:
+            self._check_stamp()
+            key = (self.ranking_date, *key)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[0]
+
+    def set(self, p1_id, p2_id, match, win_prob):
+        key = match_key(p1_id, p2_id, match)
+        win_prob = float(win_prob)
+        with self._lock:
+            self._check_stamp()
+            key = (self.ranking_date, *key)
+            self._entries[key] = (win_prob, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl,
+                "ranking_date": self.ranking_date,
+                "model": self._model,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "player_invalidations": self.player_invalidations,
+            }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,192 @@
+"""The match model's tree ensemble compiled into flat NumPy arrays.
+
+The HistGradientBoostingClassifier's trees are concatenated into one set
+of node arrays (feature, threshold, missing-goes-left, left child, leaf
+value) with a root index per tree. Each tree is laid out breadth-first so
+a right child always follows its left sibling: one step is
+``left[node] + (x > threshold[node])``. Leaves point at themselves, so
+scoring a batch is a fixed number of vectorized steps over an (n_rows,
+n_trees) array of node indices: after max_depth steps every row sits on
+a leaf in every tree. The probability is the logistic of the baseline
+plus the sum of leaf values, as in sklearn.
+
+The compiled file is a plain .npz of about 150 kB. Scoring it needs
+neither sklearn nor the pickle, and skips sklearn's per-call input
+validation, which is most of the cost of a single-row call. sklearn's
+Cython tree walk is still faster on large batches, so bulk jobs like
+build_pairwise keep using the estimator. export_compiled_model writes it, with the sha256 of the
+pickle it came from; the registry's builtin version serves from it while
+that still matches the pickle. Registered versions keep one .npy per
+array instead (save_folder), so workers can memory-map them.
+"""
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+from django.conf import settings
+
+COMPILED_PATH = os.path.join(settings.BASE_DIR, "predictions", "data", "tennis_model_v1.npz")
+TOLERANCE = 1e-9
+NODE_ARRAYS = ["feature", "threshold", "missing_left", "left", "value", "roots"]
+
+
+class CompileError(Exception):
+    pass
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def adjacent_layout(nodes):
+    """Renumber one tree breadth-first so every right child directly follows its left sibling.
+
+    Returns the old node index of each new position and the new index of each old node.
+    """
+    order = [0]
+    for node in order:
+        if not nodes["is_leaf"][node]:
+            order += [int(nodes["left"][node]), int(nodes["right"][node])]
+    position = np.empty(len(nodes), dtype=np.int64)
+    position[order] = np.arange(len(order))
+    return np.array(order), position
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, missing_left, left, value, roots, depth, baseline,
+                 columns, source_sha256=""):
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_left = missing_left
+        self.left = left
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.baseline = float(baseline)
+        self.columns = list(columns)
+        self.source_sha256 = source_sha256
+        self.feature_names_in_ = np.array(self.columns, dtype=object)
+
+    @classmethod
+    def from_estimator(cls, model, source_sha256=""):
+        """Compile a fitted binary HistGradientBoostingClassifier."""
+        if getattr(model, "n_trees_per_iteration_", None) != 1 or not hasattr(model, "_predictors"):
+            raise CompileError("Only binary HistGradientBoostingClassifier models can be compiled")
+
+        trees = [predictors[0].nodes for predictors in model._predictors]
+        if any(nodes["is_categorical"].any() for nodes in trees):
+            raise CompileError("Categorical splits are not supported")
+
+        parts, roots, offset = [], [], 0
+        for nodes in trees:
+            order, position = adjacent_layout(nodes)
+            tree = nodes[order]
+            is_leaf = tree["is_leaf"].astype(bool)
+            own = np.arange(len(tree)) + offset
+            parts.append((
+                np.where(is_leaf, 0, tree["feature_idx"]),
+                # a leaf's "split" always goes left, to the leaf itself
+                np.where(is_leaf, np.inf, tree["num_threshold"]),
+                np.where(is_leaf, True, tree["missing_go_to_left"].astype(bool)),
+                np.where(is_leaf, own, position[tree["left"]] + offset),
+                np.where(is_leaf, tree["value"], 0.0),
+            ))
+            roots.append(offset)
+            offset += len(tree)
+        feature, threshold, missing_left, left, value = (np.concatenate(column) for column in zip(*parts))
+
+        return cls(
+            feature=feature.astype(np.int32),
+            threshold=threshold.astype(np.float64),
+            missing_left=missing_left,
+            left=left.astype(np.int32),
+            value=value.astype(np.float64),
+            roots=np.array(roots, dtype=np.int32),
+            depth=max(nodes["depth"].max() for nodes in trees),
+            baseline=np.ravel(model._baseline_prediction)[0],
+            columns=getattr(model, "feature_names_in_", []),
+            source_sha256=source_sha256,
+        )
+
+    def save(self, path=COMPILED_PATH):
+        # write next to the target and swap, so a worker never loads a half-written file
+        tmp = f"{path}.tmp.npz"
+        np.savez(
+            tmp, feature=self.feature, threshold=self.threshold, missing_left=self.missing_left,
+            left=self.left, value=self.value, roots=self.roots, depth=self.depth, baseline=self.baseline,
+            columns=np.array(self.columns), source_sha256=np.array(self.source_sha256),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=COMPILED_PATH):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        return cls(
+            **{name: arrays[name] for name in NODE_ARRAYS + ["depth", "baseline"]},
+            columns=arrays["columns"].tolist(),
+            source_sha256=str(arrays["source_sha256"]),
+        )
+
+    def save_folder(self, folder):
+        """One .npy per node array plus forest.json, so load_folder can memory-map them."""
+        os.makedirs(folder, exist_ok=True)
+        for name in NODE_ARRAYS:
+            np.save(os.path.join(folder, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(folder, "forest.json"), "w", encoding="utf-8") as f:
+            json.dump({"depth": self.depth, "baseline": self.baseline, "columns": self.columns,
+                       "source_sha256": self.source_sha256}, f)
+
+    @classmethod
+    def load_folder(cls, folder, mmap_mode="r"):
+        with open(os.path.join(folder, "forest.json"), encoding="utf-8") as f:
+            scalars = json.load(f)
+        return cls(
+            **{name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode=mmap_mode) for name in NODE_ARRAYS},
+            **scalars,
+        )
+
+    def decision_function(self, rows):
+        """Raw scores (log-odds) of a 2D feature matrix."""
+        rows = np.ascontiguousarray(rows, dtype=np.float64)
+        n_rows, n_columns = rows.shape
+        flat = rows.ravel()
+        offsets = (np.arange(n_rows, dtype=np.int64) * n_columns)[:, None]
+        has_missing = np.isnan(flat).any()
+
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots)))
+        for _ in range(self.depth):
+            x = flat[offsets + self.feature[nodes]]
+            go_right = x > self.threshold[nodes]
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.missing_left[nodes], go_right)
+            nodes = self.left[nodes] + go_right
+        return self.baseline + self.value[nodes].sum(axis=1)
+
+    def predict_proba(self, rows):
+        """Same shape and meaning as the estimator's: columns are P(class 0), P(class 1)."""
+        win_prob = 1 / (1 + np.exp(-self.decision_function(rows)))
+        return np.column_stack([1 - win_prob, win_prob])
+
+
+def probe_rows(compiled, n=2000, seed=0):
+    """Rows that exercise every split: each feature drawn from its thresholds, nudged either side."""
+    rng = np.random.default_rng(seed)
+    split = np.isfinite(compiled.threshold)
+    rows = np.zeros((n, len(compiled.columns)))
+    for column in range(len(compiled.columns)):
+        thresholds = compiled.threshold[split & (compiled.feature == column)]
+        if len(thresholds):
+            rows[:, column] = rng.choice(thresholds, n) + rng.choice([-1e-6, 0.0, 1e-6], n)
+    return rows
+
+
+def max_difference(compiled, model, rows):
+    """Largest absolute gap between the compiled and the sklearn probabilities on `rows`."""
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+        expected = model.predict_proba(rows)[:, 1]
+    return float(np.abs(compiled.predict_proba(rows)[:, 1] - expected).max())
@@ -0,0 +1,57 @@
+"""Feature rows for the match model, built straight into NumPy arrays.
+
+The model's column order comes from ``model_features.json``. FeatureLayout
+turns it into a column -> index map once, so building a row is a handful
+of array writes, and swapping the two players is a precomputed index
+permutation instead of renaming columns.
+"""
+import numpy as np
+
+# features that change sign when Player1 and Player2 trade places
+DIRECTIONAL_FEATURES = ["rank_diff", "points_diff", "height_diff", "relative_rank_strength"]
+H2H_FEATURE = "h2h_p1_winrate"
+
+
+def counterpart(column):
+    """The other player's version of `column` (Player1_x <-> Player2_x)."""
+    if column.startswith("Player1_"):
+        return "Player2_" + column[len("Player1_"):]
+    if column.startswith("Player2_"):
+        return "Player1_" + column[len("Player2_"):]
+    return column
+
+
+class FeatureLayout:
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        self.swap_order = np.array(
+            [self.index.get(counterpart(column), i) for i, column in enumerate(self.columns)]
+        )
+        self.negated = np.array(
+            [self.index[column] for column in DIRECTIONAL_FEATURES if column in self.index], dtype=np.intp
+        )
+        self.h2h = self.index.get(H2H_FEATURE)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def empty(self, rows=1):
+        return np.zeros((rows, len(self.columns)), dtype=np.float64)
+
+    def fill(self, row, values):
+        """Write a {column: value} dict into `row`; columns the model doesn't know are ignored."""
+        index = self.index
+        for column, value in values.items():
+            i = index.get(column)
+            if i is not None:
+                row[i] = value
+        return row
+
+    def swap(self, rows):
+        """Copy of `rows` (2-D) with Player1 and Player2 exchanged."""
+        swapped = rows[:, self.swap_order]
+        swapped[:, self.negated] *= -1
+        if self.h2h is not None:
+            swapped[:, self.h2h] = 1.0 - swapped[:, self.h2h]
+        return swapped
@@ -26,13 +26,36 @@ TOURNEY_LEVEL_CHOICES = [
     ("tourney_level_O", "Olympics")
 ]
 
-class PredictForm(forms.Form):
-    player1 = forms.ModelChoiceField(queryset=Player.objects.all(), label="Player 1")
-    player2 = forms.ModelChoiceField(queryset=Player.objects.all(), label="Player 2")
+SAME_PLAYER_ERROR = "player1 and player2 must be different players"
+
+
+class TournamentForm(forms.Form):
     tourney_level = forms.ChoiceField(choices=TOURNEY_LEVEL_CHOICES)
+    best_of = forms.ChoiceField(choices=[(3, "Best of 3"), (5, "Best of 5")])
+    surface = forms.ChoiceField(choices=SURFACE_CHOICES)
+
+
+class MatchForm(TournamentForm):
+    """Tournament context of one matchup."""
     player1_seed = forms.IntegerField(required=False, initial=0)
     player2_seed = forms.IntegerField(required=False, initial=0)
-    best_of = forms.ChoiceField(choices=[(3, "Best of 3"), (5, "Best of 5")])
     round_encoded = forms.ChoiceField(choices=ROUND_CHOICES)
-    surface = forms.ChoiceField(choices=SURFACE_CHOICES)
     draw_size = forms.IntegerField(initial=128)
+
+
+class DrawForm(TournamentForm):
+    simulations = forms.IntegerField(required=False, initial=100_000, min_value=1)
+
+
+class PredictForm(MatchForm):
+    player1 = forms.ModelChoiceField(queryset=Player.objects.all(), label="Player 1")
+    player2 = forms.ModelChoiceField(queryset=Player.objects.all(), label="Player 2")
+
+    field_order = ["player1", "player2"]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        player1, player2 = cleaned_data.get("player1"), cleaned_data.get("player2")
+        if player1 is not None and player1 == player2:
+            self.add_error("player2", SAME_PLAYER_ERROR)
+        return cleaned_data
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.registry import BUILTIN, RegistryError, activate, list_versions, read_pointer, rollback
+
+
+class Command(BaseCommand):
+    help = "Switch the served model version (running workers pick it up on their next prediction), or list versions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("version", nargs="?", type=str, help=f"Version to activate ({BUILTIN} for the shipped model)")
+        parser.add_argument("--rollback", action="store_true", help="Re-activate the previously active version")
+
+    def handle(self, *args, **options):
+        try:
+            if options["rollback"]:
+                self.stdout.write(self.style.SUCCESS(f"✅ Rolled back to {rollback()}"))
+            elif options["version"]:
+                previous = activate(options["version"])
+                self.stdout.write(self.style.SUCCESS(f"✅ {options['version']} is active (was {previous})"))
+            else:
+                self.list_versions()
+                return
+        except RegistryError as e:
+            raise CommandError(str(e))
+        self.stdout.write("Pairwise tables of another version are ignored until build_pairwise runs again.")
+
+    def list_versions(self):
+        pointer = read_pointer()
+        active = pointer["version"] if pointer else BUILTIN
+        self.stdout.write(f"{'*' if active == BUILTIN else ' '} {BUILTIN:<12} shipped with the code")
+        for meta in list_versions():
+            marker = "*" if meta["version"] == active else " "
+            compiled = "compiled" if meta["compiled"] else "estimator"
+            self.stdout.write(
+                f"{marker} {meta['version']:<12} {meta['registered_at']}  {compiled:<9}  {meta['source']}"
+            )
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.compiled import max_difference, probe_rows
+from predictions.ml_utils import active_version
+from predictions.registry import quiet_feature_names
+from .startup_report import memory_kb
+
+
+def forked_memory(load, rows):
+    """Private memory of a fresh child that loads a model and scores `rows`, like a worker without preload."""
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_end)
+            with quiet_feature_names():
+                load().predict_proba(rows)
+            os.write(write_end, json.dumps(memory_kb()).encode())
+        finally:
+            os._exit(0)
+    os.close(write_end)
+    with os.fdopen(read_end) as f:
+        result = json.loads(f.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+def per_call_us(model, rows, runs):
+    """Median microseconds of one predict_proba call on `rows`."""
+    timings = []
+    with quiet_feature_names():
+        for _ in range(runs):
+            started = time.perf_counter()
+            model.predict_proba(rows)
+            timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1e6
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the active model version's compiled form with its sklearn estimator: "
+        "agreement, per-call latency and per-worker memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=200, help="Timed calls per case (the median is kept)")
+        parser.add_argument("--batch", type=int, default=1000, help="Rows in the batch case")
+
+    def handle(self, *args, **options):
+        version = active_version()
+        compiled = version.load_compiled()
+        if compiled is None:
+            raise CommandError(f"Model version {version.name} has no compiled form (see export_compiled_model)")
+
+        rows = probe_rows(compiled, n=options["batch"])
+
+        # measure memory before this process imports sklearn, so each child starts from the same state
+        if hasattr(os, "fork") and os.path.exists("/proc/self/smaps_rollup"):
+            for label, load in [("sklearn", version.load_estimator), ("compiled", version.load_compiled)]:
+                memory = forked_memory(load, rows[:1])
+                self.stdout.write(
+                    f"{label:<9} worker: {memory['private_kb'] / 1024:7.1f} MB private, "
+                    f"{memory['rss_kb'] / 1024:7.1f} MB RSS"
+                )
+        else:
+            self.stdout.write("Per-worker memory needs fork() and /proc (Linux); skipped.")
+
+        model = version.load_estimator()
+        self.stdout.write(f"max |difference| over {len(rows)} probe rows: {max_difference(compiled, model, rows):.1e}")
+
+        for label, batch in [("1 row", rows[:1]), (f"{len(rows)} rows", rows)]:
+            runs = options["runs"] if len(batch) == 1 else max(1, options["runs"] // 10)
+            sklearn_us = per_call_us(model, batch, runs)
+            compiled_us = per_call_us(compiled, batch, runs)
+            self.stdout.write(
+                f"{label:>10}: sklearn {sklearn_us:9.0f} µs, compiled {compiled_us:9.0f} µs "
+                f"({sklearn_us / compiled_us:.1f}x)"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark done"))
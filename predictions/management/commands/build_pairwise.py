@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.pairwise import PAIRWISE_DIR, TOP_PLAYERS, build_tables
+
+
+class Command(BaseCommand):
+    help = "Precompute win probabilities between the top-ranked players for every surface, level and best-of"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=TOP_PLAYERS, help="Number of top-ranked players")
+        parser.add_argument("--output", type=str, default=PAIRWISE_DIR, help="Pairwise tables folder")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        try:
+            build, players = build_tables(options["output"], options["top"], log=log)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Pairwise tables for {players} players written to {build} in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.compiled import (
+    COMPILED_PATH, TOLERANCE, CompileError, CompiledForest, file_sha256, max_difference, probe_rows,
+)
+from predictions.registry import BUILTIN_MODEL_PATH, BuiltinVersion
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile the builtin match model's trees into flat NumPy arrays that the web workers score directly "
+        "(register_model compiles registry versions itself)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", type=str, default=COMPILED_PATH, help="Compiled model file (.npz)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        model = BuiltinVersion().load_estimator()
+        try:
+            compiled = CompiledForest.from_estimator(model, source_sha256=file_sha256(BUILTIN_MODEL_PATH))
+        except CompileError as e:
+            raise CommandError(str(e))
+
+        # check every split against sklearn before anything is written
+        difference = max_difference(compiled, model, probe_rows(compiled))
+        if difference > TOLERANCE:
+            raise CommandError(f"Compiled model differs from {BUILTIN_MODEL_PATH} by up to {difference:.2e}")
+
+        compiled.save(options["output"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(compiled.roots)} trees, {len(compiled.value)} nodes written to {options['output']} "
+            f"(max difference {difference:.1e}) in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.registry import BUILTIN_FEATURES_PATH, RegistryError, activate, register
+
+
+class Command(BaseCommand):
+    help = "Add a fitted model to the model registry as a new version, memory-mappable and compiled when possible"
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", type=str, help="Fitted model (joblib / pickle file)")
+        parser.add_argument("--features", type=str, default=BUILTIN_FEATURES_PATH,
+                            help="JSON list of the columns the model was fitted on, in order")
+        parser.add_argument("--name", type=str, help="Version name (default: the next vN)")
+        parser.add_argument("--activate", action="store_true", help="Activate the new version right away")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            meta = register(options["source"], options["features"], name=options["name"])
+        except (RegistryError, OSError) as e:
+            raise CommandError(str(e))
+
+        compiled = "compiled" if meta["compiled"] else "not compiled, served by the estimator"
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Registered {meta['version']}: {meta['columns']} columns, {compiled} "
+            f"({time.perf_counter() - start:.1f}s)"
+        ))
+        if options["activate"]:
+            previous = activate(meta["version"])
+            self.stdout.write(self.style.SUCCESS(f"✅ {meta['version']} is active (was {previous})"))
+            self.stdout.write("Run build_pairwise to precompute its pairwise tables.")
@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from predictions import ml_utils
+
+
+def memory_kb():
+    """Rss and private (unshared) memory of this process in kB, from /proc/self/smaps_rollup."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Private_Clean", "Private_Dirty"):
+                values[key] = int(rest.split()[0])
+    return {"rss_kb": values["Rss"], "private_kb": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def forked_worker_memory():
+    """Fork a child that predicts once, like a gunicorn worker serving its first request; return its memory."""
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_end)
+            ml_utils.warm_up()
+            os.write(write_end, json.dumps(memory_kb()).encode())
+        finally:
+            os._exit(0)
+    os.close(write_end)
+    with os.fdopen(read_end) as f:
+        result = json.loads(f.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+class Command(BaseCommand):
+    help = "Report CLI startup time and the per-worker memory saved by loading the model before forking"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3, help="Runs of `manage.py check` to time (best is kept)")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        if ml_utils._active is not None and ml_utils._active.loaded:
+            self.stderr.write("The model is already loaded in this process; the numbers would be meaningless.")
+            return
+
+        report = {"check_s": self.time_check(options["runs"])}
+
+        can_fork = hasattr(os, "fork") and os.path.exists("/proc/self/smaps_rollup")
+        if can_fork:
+            # no preload: each worker loads its own model after the fork
+            report["worker_loads_model"] = forked_worker_memory()
+
+        started = time.perf_counter()
+        ml_utils.get_model()
+        report["model_load_s"] = round(time.perf_counter() - started, 3)
+
+        if can_fork:
+            # preload: the master has loaded and warmed the model, workers share it
+            ml_utils.warm_up()
+            import gc
+            gc.freeze()
+            report["worker_shares_model"] = forked_worker_memory()
+            report["private_saved_per_worker_mb"] = round(
+                (report["worker_loads_model"]["private_kb"] - report["worker_shares_model"]["private_kb"]) / 1024, 1
+            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"manage.py check:                  {report['check_s']:.2f}s (model not loaded)")
+        self.stdout.write(f"Model load skipped by CLI runs:   {report['model_load_s']:.2f}s")
+        if can_fork:
+            for label, key in [("Worker loading its own model:", "worker_loads_model"),
+                               ("Worker sharing the preloaded one:", "worker_shares_model")]:
+                memory = report[key]
+                self.stdout.write(
+                    f"{label:<34}{memory['private_kb'] / 1024:7.1f} MB private, {memory['rss_kb'] / 1024:7.1f} MB RSS"
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {report['private_saved_per_worker_mb']} MB less private memory per worker with preload_app"
+            ))
+        else:
+            self.stdout.write("Per-worker memory needs fork() and /proc (Linux); skipped.")
+
+    def time_check(self, runs):
+        command = [sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "check"]
+        best = None
+        for _ in range(max(1, runs)):
+            started = time.perf_counter()
+            subprocess.run(command, check=True, capture_output=True)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best, 3)
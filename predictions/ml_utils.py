@@ -1,56 +1,133 @@
-import pandas as pd
-import joblib
-import os
-import json
-from django.conf import settings  # ✅ use Django BASE_DIR
+import threading
 
-# Absolute paths
-MODEL_PATH = os.path.join(settings.BASE_DIR, "predictions", "data", "tennis_model_v1.pkl")
-FEATURES_PATH = os.path.join(settings.BASE_DIR, "predictions", "data", "model_features.json")
+import numpy as np
+from django.conf import settings
 
-# ✅ Load model and features once
-model = joblib.load(MODEL_PATH)
-with open(FEATURES_PATH, "r") as f:
-    model_columns = json.load(f)
+from . import registry
 
+# The active version comes from the model registry. Its columns are read when it is first
+# needed, the model itself on the first prediction, so management commands that never predict
+# don't pay for loading it (and importing sklearn). gunicorn.conf.py warms it in the master
+# before forking. A new pointer file (activate_model) is picked up on the next call.
+_active = None
+_pointer_stamp = None
+_active_lock = threading.Lock()
 
-def swap_players(row_df):
-    swapped = row_df.copy()
+# from this many rows per call, sklearn's tree walk beats the compiled ensemble (benchmark_model)
+ESTIMATOR_MIN_ROWS = 64
 
-    for col in row_df.columns:
-        if "Player1_" in col:
-            swapped[col.replace("Player1_", "TEMP_")] = row_df[col]
-        elif "Player2_" in col:
-            swapped[col.replace("Player2_", "Player1_")] = row_df[col]
 
-    for col in row_df.columns:
-        if "TEMP_" in col:
-            new_col = col.replace("TEMP_", "Player2_")
-            swapped[new_col] = swapped[col]
+def active_version():
+    """The registry's active ModelVersion, switched when its pointer file changes."""
+    global _active, _pointer_stamp
+    stamp = registry.pointer_stamp()
+    if _active is None or stamp != _pointer_stamp:
+        with _active_lock:
+            if _active is None or stamp != _pointer_stamp:
+                _active = registry.current_version()
+                _pointer_stamp = stamp
+    return _active
 
-    temp_cols = [c for c in swapped.columns if c.startswith("TEMP_")]
-    swapped.drop(columns=temp_cols, inplace=True)
 
-    # Flip directional features
-    for feat in ["rank_diff", "points_diff", "height_diff", "relative_rank_strength"]:
-        if feat in swapped.columns:
-            swapped.at[0, feat] = -swapped.at[0, feat]
+def get_model():
+    return active_version().model
 
-    if "h2h_p1_winrate" in swapped.columns:
-        swapped.at[0, "h2h_p1_winrate"] = 1.0 - swapped.at[0, "h2h_p1_winrate"]
 
-    return swapped
+def get_layout():
+    """FeatureLayout of the active model's columns."""
+    return active_version().layout
 
 
-def predict_match(input_raw):
-    input_raw = input_raw.reindex(columns=model_columns, fill_value=0)
+def load_estimator():
+    """The active version's sklearn estimator itself, freshly loaded."""
+    return active_version().load_estimator()
 
-    if input_raw.at[0, "Player1_rank"] > input_raw.at[0, "Player2_rank"]:
-        swapped = swap_players(input_raw.copy())
-        probs = model.predict_proba(swapped)[0]
-        win_prob = 1 - probs[1]
+
+def warm_up():
+    """Load the models and run a prediction through each, so everything they touch is resident before forking."""
+    predict_matches(get_layout().empty())
+    predict_matches(get_layout().empty(ESTIMATOR_MIN_ROWS))
+
+
+def match_features(f1, f2, match, row=None, h2h=None):
+    """Model row for one matchup.
+
+    `f1` / `f2` are the two players' PlayerFeatures (players.derived.player_features),
+    `match` holds PredictForm's match fields and `h2h` is the pair's
+    HeadToHead (None if they have never met). Writes into `row` when given.
+    """
+    p1_height = f1.height_cm or 180
+    p2_height = f2.height_cm or 180
+    values = {
+        "draw_size": match["draw_size"],
+        "Player1_rank": f1.rank or 999,
+        "Player2_rank": f2.rank or 999,
+        "Player1_rank_points": f1.points or 0,
+        "Player2_rank_points": f2.points or 0,
+        "Player1_ht": p1_height,
+        "Player2_ht": p2_height,
+        "Player1_age": f1.age or 25,
+        "Player2_age": f2.age or 25,
+        "Player1_hand_R": int(f1.hand_right),
+        "Player2_hand_R": int(f2.hand_right),
+        "Player1_seed": match.get("player1_seed") or 0,
+        "Player2_seed": match.get("player2_seed") or 0,
+        "Player1_entry_Direct": 1,
+        "Player2_entry_Direct": 1,
+        "best_of": int(match["best_of"]),
+        "round_encoded": int(match["round_encoded"]),
+        match["surface"]: 1,
+        match["tourney_level"]: 1,
+        "height_diff": p1_height - p2_height,
+        "h2h_p1_winrate": h2h.winrate(f1.player_id) if h2h else 0.5,
+    }
+    # ⚙️ Engineered features
+    if f1.rank and f2.rank:
+        values["rank_diff"] = f1.rank - f2.rank
+        values["points_diff"] = (f1.points or 0) - (f2.points or 0)
+        values["relative_rank_strength"] = (f1.rank - f2.rank) / (f1.rank + f2.rank)
+
+    layout = get_layout()
+    if row is None:
+        row = layout.empty()[0]
     else:
-        probs = model.predict_proba(input_raw)[0]
-        win_prob = probs[1]
+        row[:] = 0
+    return layout.fill(row, values)
 
+
+def predict_matches(rows, model=None, symmetric=None):
+    """Player1's win probability for every row of a feature matrix, in one model call.
+
+    By default the model is always asked with the better-ranked player as
+    Player1. In symmetric mode (settings.PREDICTIONS_SYMMETRIC) each row is
+    scored in both player orders, stacked into the same call, and the two
+    answers are averaged. `model` defaults to the active version's
+    compiled ensemble, or its estimator for calls of ESTIMATOR_MIN_ROWS
+    rows or more.
+    """
+    version = active_version()
+    layout = version.layout
+    if rows.shape[1] != len(layout):
+        raise ValueError(f"Rows have {rows.shape[1]} columns, model {version.name} expects {len(layout)}")
+    if symmetric is None:
+        symmetric = settings.PREDICTIONS_SYMMETRIC
+    if model is None:
+        scored = 2 * len(rows) if symmetric else len(rows)
+        model = version.estimator if scored >= ESTIMATOR_MIN_ROWS else version.model
+    if symmetric:
+        with registry.quiet_feature_names():
+            win_prob = model.predict_proba(np.vstack([rows, layout.swap(rows)]))[:, 1]
+        return (win_prob[:len(rows)] + 1 - win_prob[len(rows):]) / 2
+
+    swapped = rows[:, layout.index["Player1_rank"]] > rows[:, layout.index["Player2_rank"]]
+    oriented = rows.copy()
+    oriented[swapped] = layout.swap(rows[swapped])
+    with registry.quiet_feature_names():
+        win_prob = model.predict_proba(oriented)[:, 1]
+    win_prob[swapped] = 1 - win_prob[swapped]
     return win_prob
+
+
+def predict_match(row):
+    """Player1's win probability for one feature row."""
+    return predict_matches(row.reshape(1, -1))[0]
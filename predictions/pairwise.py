@@ -0,0 +1,238 @@
+"""Precomputed win probabilities between the top-ranked players.
+
+build_pairwise (run after a ranking import, or by the importers when
+given --build-pairwise) scores every pair of the current top players for each surface / tourney level / best-of
+combination and every round, and saves one float16 array per
+combination, shaped (rounds, players, players). Entry [r, i, j] is the
+chance that player i beats player j in round r. Each build goes into its
+own folder, and ``current.json`` is then swapped to point at it; the
+build it replaced is deleted (workers still mapping it keep their open
+files). Web workers memory-map the arrays and pick up a new build when
+that pointer file changes. A common prediction then becomes an array
+lookup.
+
+Each build records the publish stamp it was scored against. Once
+another week or delta is published, the stamp moves on and the tables
+answer nothing until the next build.
+
+Lookups only apply to the context the tables were built for: both
+players unseeded and the default draw size. Anything else falls back to
+the model.
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from django.conf import settings
+
+from players.derived import player_features
+from players.models import HeadToHead, Ranking
+from players.publishing import current_publish_stamp, read_publish_stamp
+from .forms import ROUND_CHOICES, SURFACE_CHOICES, TOURNEY_LEVEL_CHOICES
+from .ml_utils import active_version, match_features, predict_matches
+
+PAIRWISE_DIR = os.path.join(settings.BASE_DIR, "predictions", "data", "pairwise")
+POINTER = "current.json"
+TOP_PLAYERS = 300
+DRAW_SIZE = 128  # PredictForm's default draw size
+BEST_OF = [3, 5]
+ROUNDS = [code for code, _ in ROUND_CHOICES]
+
+
+def table_name(surface, tourney_level, best_of):
+    return f"{surface}__{tourney_level}__bo{best_of}.npy"
+
+
+def pair_rows(rankings, layout):
+    """Feature rows for every pair i < j of `rankings`, in np.triu_indices order."""
+    first, second = np.triu_indices(len(rankings), 1)
+    match = {"draw_size": DRAW_SIZE, "best_of": BEST_OF[0], "round_encoded": ROUNDS[0],
+             "surface": SURFACE_CHOICES[0][0], "tourney_level": TOURNEY_LEVEL_CHOICES[0][0]}
+    player_ids = [ranking.player_id for ranking in rankings]
+    features = player_features(player_ids)
+    h2h = HeadToHead.objects.for_pairs(
+        (player_ids[i], player_ids[j]) for i, j in zip(first.tolist(), second.tolist())
+    )
+    rows = layout.empty(len(first))
+    for row, i, j in zip(rows, first.tolist(), second.tolist()):
+        pair = tuple(sorted([player_ids[i], player_ids[j]]))
+        match_features(features[player_ids[i]], features[player_ids[j]], match, row, h2h=h2h.get(pair))
+    return first, second, rows
+
+
+def set_one_hot(rows, layout, choices, value):
+    """Point a one-hot group (surface or tourney level) at `value`."""
+    for column, _ in choices:
+        if column in layout.index:
+            rows[:, layout.index[column]] = 1 if column == value else 0
+
+
+def data_version(stamp):
+    """The part of a publish stamp a build depends on: the live week and its version."""
+    stamp = stamp or {}
+    return {"date": stamp.get("date"), "version": stamp.get("version")}
+
+
+def read_pointer(folder):
+    """Folder name of the current build, or None."""
+    try:
+        with open(os.path.join(folder, POINTER), encoding="utf-8") as f:
+            return json.load(f)["build"]
+    except FileNotFoundError:
+        return None
+
+
+def build_tables(folder=PAIRWISE_DIR, top=TOP_PLAYERS, log=None):
+    """Score all pairs of the latest week's top `top` players and publish a new build."""
+    # read before the rankings, so a publish during the build leaves it stale rather than mislabelled
+    stamp = read_publish_stamp()
+    latest_date = Ranking.objects.published().order_by("-date").values_list("date", flat=True).first()
+    if latest_date is None:
+        raise ValueError("No published ranking week to build pairwise tables from")
+    rankings = list(
+        Ranking.objects.filter(date=latest_date, rank__lte=top).order_by("rank")
+    )
+
+    build = os.path.join(folder, f"{latest_date.isoformat()}_{time.time_ns()}")
+    os.makedirs(build)
+    try:
+        n = _score_tables(build, rankings, stamp, latest_date, log)
+    except BaseException:
+        shutil.rmtree(build, ignore_errors=True)
+        raise
+
+    # swap the pointer last, so readers only ever see a complete build
+    superseded = read_pointer(folder)
+    tmp_pointer = os.path.join(folder, f"{POINTER}.tmp")
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        json.dump({"build": os.path.basename(build)}, f)
+    os.replace(tmp_pointer, os.path.join(folder, POINTER))
+    if superseded:
+        shutil.rmtree(os.path.join(folder, superseded), ignore_errors=True)
+    return build, n
+
+
+def _score_tables(build, rankings, stamp, latest_date, log=None):
+    """Write every table and the index of a build into `build`; returns the number of players."""
+    version = active_version()
+    layout = version.layout
+    first, second, base = pair_rows(rankings, layout)
+    n = len(rankings)
+    # predict_matches puts the better-ranked player first, so p(j beats i) = 1 - p(i beats j),
+    # except for tied ranks, which it scores in the order given: those pairs are also scored reversed
+    tied = np.zeros(len(base), dtype=bool)
+    if not settings.PREDICTIONS_SYMMETRIC:
+        tied = base[:, layout.index["Player1_rank"]] == base[:, layout.index["Player2_rank"]]
+    # sklearn's tree walk beats the compiled model on batches this large
+    estimator = version.load_estimator()
+
+    for surface, _ in SURFACE_CHOICES:
+        for tourney_level, _ in TOURNEY_LEVEL_CHOICES:
+            for best_of in BEST_OF:
+                rows = base.copy()
+                set_one_hot(rows, layout, SURFACE_CHOICES, surface)
+                set_one_hot(rows, layout, TOURNEY_LEVEL_CHOICES, tourney_level)
+                rows[:, layout.index["best_of"]] = best_of
+
+                table = np.full((len(ROUNDS), n, n), 0.5, dtype=np.float16)
+                for r, round_encoded in enumerate(ROUNDS):
+                    rows[:, layout.index["round_encoded"]] = round_encoded
+                    win_prob = predict_matches(np.vstack([rows, layout.swap(rows[tied])]), estimator)
+                    table[r, first, second] = win_prob[:len(rows)]
+                    table[r, second, first] = 1 - win_prob[:len(rows)]
+                    table[r, second[tied], first[tied]] = win_prob[len(rows):]
+                np.save(os.path.join(build, table_name(surface, tourney_level, best_of)), table)
+                if log:
+                    log(f"{surface} / {tourney_level} / best of {best_of}")
+
+    with open(os.path.join(build, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "ranking_date": latest_date.isoformat(),
+            "data_version": data_version(stamp),
+            "players": [ranking.player_id for ranking in rankings],
+            "draw_size": DRAW_SIZE,
+            "rounds": ROUNDS,
+            "model": version.fingerprint,
+            "symmetric": settings.PREDICTIONS_SYMMETRIC,
+        }, f)
+    return n
+
+
+class PairwiseTables:
+    """Read side: memory-mapped tables of the current build, reloaded when the pointer, the publish stamp or the model changes."""
+
+    def __init__(self, folder=PAIRWISE_DIR):
+        self.folder = folder
+        self._pointer_mtime = None
+        self._stamp_version = None
+        self._model = None
+        self._build = None
+        self._index = None
+        self._players = {}
+        self._tables = {}
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(os.path.join(self.folder, POINTER)).st_mtime_ns
+        except FileNotFoundError:
+            self._index = None
+            return
+        model = active_version().fingerprint
+        stamp = current_publish_stamp()
+        if mtime == self._pointer_mtime and data_version(stamp) == self._stamp_version and model == self._model:
+            return
+
+        build = os.path.join(self.folder, read_pointer(self.folder) or "")
+        try:
+            with open(os.path.join(build, "index.json"), encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            # a new build replaced this one between the two reads; pick it up on the next lookup
+            self._index = None
+            return
+        # tables scored by another model, in the other prediction mode, or from
+        # data published over since, are stale
+        if (index.get("model") != model or index.get("symmetric", False) != settings.PREDICTIONS_SYMMETRIC
+                or index.get("data_version") != data_version(stamp)
+                or index["ranking_date"] != data_version(stamp)["date"]):
+            index = None
+
+        self._pointer_mtime = mtime
+        self._stamp_version = data_version(stamp)
+        self._model = model
+        self._build = build
+        self._index = index
+        self._players = {player_id: i for i, player_id in enumerate(index["players"])} if index else {}
+        self._rounds = {code: r for r, code in enumerate(index["rounds"])} if index else {}
+        self._tables = {}
+
+    def _table(self, surface, tourney_level, best_of):
+        name = table_name(surface, tourney_level, best_of)
+        if name not in self._tables:
+            path = os.path.join(self._build, name)
+            self._tables[name] = np.load(path, mmap_mode="r") if os.path.exists(path) else None
+        return self._tables[name]
+
+    def lookup(self, p1_id, p2_id, match):
+        """Player1's precomputed win probability, or None if this matchup isn't covered."""
+        self._refresh()
+        if self._index is None:
+            return None
+        if match.get("player1_seed") or match.get("player2_seed"):
+            return None
+        if int(match["draw_size"]) != self._index["draw_size"]:
+            return None
+
+        i, j = self._players.get(p1_id), self._players.get(p2_id)
+        r = self._rounds.get(int(match["round_encoded"]))
+        if i is None or j is None or r is None or i == j:
+            return None
+        table = self._table(match["surface"], match["tourney_level"], int(match["best_of"]))
+        if table is None:
+            return None
+        return float(table[r, i, j])
+
+
+tables = PairwiseTables()
@@ -0,0 +1,285 @@
+"""File-based registry of match model versions.
+
+MODELS_DIR/<version>/ holds one version:
+
+- ``model.joblib``: the estimator, dumped uncompressed so that
+  ``joblib.load(mmap_mode="r")`` maps its arrays instead of copying them;
+- ``compiled/``: its predictions.compiled node arrays as .npy files (when
+  the model compiles), memory-mapped as well;
+- ``features.json``: the columns it was fitted on, in order;
+- ``meta.json``: where it came from and when it was registered.
+
+``current.json`` names the active version and the one before it.
+Activating rewrites it with os.replace, so readers see the old pointer or
+the new one, never a mix. ml_utils stats the pointer before each
+prediction and switches to the new version when it changes, so
+workers pick it up without a restart. Every worker maps the same files,
+so the page cache holds one copy of the weights however many workers
+run. A rollback just activates the previous version again.
+
+Without a current.json, the files shipped in predictions/data
+(tennis_model_v1.pkl, model_features.json and the compiled .npz) are
+served as the "builtin" version.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .features import FeatureLayout
+
+MODELS_DIR = os.path.join(settings.BASE_DIR, "predictions", "data", "models")
+POINTER = "current.json"
+BUILTIN = "builtin"
+BUILTIN_MODEL_PATH = os.path.join(settings.BASE_DIR, "predictions", "data", "tennis_model_v1.pkl")
+BUILTIN_FEATURES_PATH = os.path.join(settings.BASE_DIR, "predictions", "data", "model_features.json")
+VERSION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+
+class RegistryError(Exception):
+    pass
+
+
+@contextmanager
+def quiet_feature_names():
+    """Within the block, drop the warning sklearn raises on every call when a model fitted on a DataFrame gets a plain array."""
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+        yield
+
+
+class ModelVersion:
+    """One servable model: its columns, and the model itself, loaded on first use."""
+
+    def __init__(self, name, columns, model_path, compiled_path=None, fingerprint=None):
+        self.name = name
+        self.columns = list(columns)
+        self.layout = FeatureLayout(self.columns)
+        self.model_path = model_path
+        self.compiled_path = compiled_path
+        # identifies the weights (name plus source hash); pairwise tables record it to detect a model change
+        self.fingerprint = fingerprint or name
+        self._model = None
+        self._estimator = None
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self._model is not None or self._estimator is not None
+
+    def _checked(self, model):
+        # rows are positional, so the model must have been fitted on exactly this column order
+        if list(getattr(model, "feature_names_in_", self.columns)) != self.columns:
+            raise RegistryError(f"{self.name}: features.json does not match the model's columns")
+        return model
+
+    @property
+    def model(self):
+        """The compiled ensemble when there is one, else the estimator."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    compiled = self.load_compiled()
+                    self._model = self._checked(compiled) if compiled is not None else self.estimator
+        return self._model
+
+    @property
+    def estimator(self):
+        """The sklearn estimator, loaded on first use; it beats the compiled ensemble on large batches."""
+        if self._estimator is None:
+            with self._lock:
+                if self._estimator is None:
+                    self._estimator = self._checked(self.load_estimator())
+        return self._estimator
+
+    def load_estimator(self):
+        """The sklearn estimator, with its arrays memory-mapped."""
+        import joblib
+
+        return joblib.load(self.model_path, mmap_mode="r")
+
+    def load_compiled(self):
+        from .compiled import CompiledForest
+
+        if self.compiled_path and os.path.isdir(self.compiled_path):
+            return CompiledForest.load_folder(self.compiled_path)
+        return None
+
+
+class BuiltinVersion(ModelVersion):
+    """The pickle shipped with the code, served when nothing has been activated."""
+
+    def __init__(self):
+        from .compiled import file_sha256
+
+        with open(BUILTIN_FEATURES_PATH, encoding="utf-8") as f:
+            columns = json.load(f)
+        self.sha256 = file_sha256(BUILTIN_MODEL_PATH)
+        super().__init__(BUILTIN, columns, BUILTIN_MODEL_PATH, fingerprint=f"{BUILTIN}:{self.sha256[:12]}")
+
+    def load_estimator(self):
+        import joblib
+
+        return joblib.load(self.model_path)
+
+    def load_compiled(self):
+        """export_compiled_model's .npz, while it was compiled from this pickle."""
+        from .compiled import COMPILED_PATH, CompiledForest
+
+        if os.path.exists(COMPILED_PATH):
+            compiled = CompiledForest.load(COMPILED_PATH)
+            if compiled.source_sha256 == self.sha256:
+                return compiled
+        return None
+
+
+def read_pointer(folder=MODELS_DIR):
+    try:
+        with open(os.path.join(folder, POINTER), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def pointer_stamp(folder=MODELS_DIR):
+    """(inode, mtime) of the pointer file, or None while the builtin model is served.
+
+    os.replace gives every activation a new file, so the inode usually
+    tells two activations apart even within one coarse mtime tick.
+    """
+    try:
+        stat = os.stat(os.path.join(folder, POINTER))
+        return stat.st_ino, stat.st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_version(name, folder=MODELS_DIR):
+    if name == BUILTIN:
+        return BuiltinVersion()
+    path = os.path.join(folder, name)
+    try:
+        with open(os.path.join(path, "features.json"), encoding="utf-8") as f:
+            columns = json.load(f)
+    except FileNotFoundError:
+        raise RegistryError(f"No model version {name!r} in {folder}")
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            source_sha256 = json.load(f).get("source_sha256")
+    except FileNotFoundError:
+        source_sha256 = None
+    # a version deleted and registered again under the same name from other weights must not match
+    fingerprint = f"{name}:{source_sha256[:12]}" if source_sha256 else None
+    return ModelVersion(
+        name, columns, os.path.join(path, "model.joblib"), os.path.join(path, "compiled"), fingerprint=fingerprint,
+    )
+
+
+def current_version(folder=MODELS_DIR):
+    """The active ModelVersion (model not loaded yet)."""
+    pointer = read_pointer(folder)
+    return load_version(pointer["version"] if pointer else BUILTIN, folder)
+
+
+def list_versions(folder=MODELS_DIR):
+    """meta.json of every registered version, oldest first."""
+    versions = []
+    for name in os.listdir(folder) if os.path.isdir(folder) else []:
+        meta_path = os.path.join(folder, name, "meta.json")
+        if os.path.isfile(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                versions.append(json.load(f))
+    return sorted(versions, key=lambda meta: meta["registered_at"])
+
+
+def next_version_name(folder=MODELS_DIR):
+    numbers = [int(meta["version"][1:]) for meta in list_versions(folder) if re.fullmatch(r"v\d+", meta["version"])]
+    # the builtin model is v1
+    return f"v{max(numbers, default=1) + 1}"
+
+
+def register(source, features_path=BUILTIN_FEATURES_PATH, name=None, folder=MODELS_DIR):
+    """Copy a fitted model into the registry as a new version (not activated); returns its meta.
+
+    The estimator is re-dumped uncompressed for memory-mapping and, if it
+    is a tree ensemble predictions.compiled supports, compiled next to it.
+    """
+    import joblib
+
+    from .compiled import TOLERANCE, CompileError, CompiledForest, file_sha256, max_difference, probe_rows
+
+    name = name or next_version_name(folder)
+    if not VERSION_NAME.fullmatch(name) or name == BUILTIN:
+        raise RegistryError(f"Invalid version name {name!r}")
+    if os.path.exists(os.path.join(folder, name)):
+        raise RegistryError(f"Version {name!r} already exists")
+
+    with open(features_path, encoding="utf-8") as f:
+        columns = json.load(f)
+    estimator = joblib.load(source)
+    if list(getattr(estimator, "feature_names_in_", columns)) != columns:
+        raise RegistryError(f"{features_path} does not match the columns {source} was fitted on")
+
+    # build in a hidden folder and rename it into place, so a version is complete or absent
+    os.makedirs(folder, exist_ok=True)
+    build = os.path.join(folder, f".{name}.{time.time_ns()}")
+    os.makedirs(build)
+    try:
+        joblib.dump(estimator, os.path.join(build, "model.joblib"))
+        with open(os.path.join(build, "features.json"), "w", encoding="utf-8") as f:
+            json.dump(columns, f)
+
+        source_sha256 = file_sha256(source)
+        try:
+            compiled = CompiledForest.from_estimator(estimator, source_sha256=source_sha256)
+        except CompileError:
+            compiled = None
+        if compiled is not None:
+            if max_difference(compiled, estimator, probe_rows(compiled)) <= TOLERANCE:
+                compiled.save_folder(os.path.join(build, "compiled"))
+            else:
+                compiled = None
+
+        meta = {
+            "version": name,
+            "source": os.path.abspath(source),
+            "source_sha256": source_sha256,
+            "columns": len(columns),
+            "compiled": compiled is not None,
+            "registered_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(os.path.join(build, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.rename(build, os.path.join(folder, name))
+    except BaseException:
+        shutil.rmtree(build, ignore_errors=True)
+        raise
+    return meta
+
+
+def activate(name, folder=MODELS_DIR):
+    """Point the registry at version `name`; workers switch on their next prediction."""
+    load_version(name, folder)  # fails on an unknown version
+    pointer = read_pointer(folder)
+    current = pointer["version"] if pointer else BUILTIN
+    os.makedirs(folder, exist_ok=True)
+    tmp_pointer = os.path.join(folder, f"{POINTER}.tmp")
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        json.dump({"version": name, "previous": current, "activated_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f)
+    os.replace(tmp_pointer, os.path.join(folder, POINTER))
+    return current
+
+
+def rollback(folder=MODELS_DIR):
+    """Re-activate the version that was active before the current one; returns its name."""
+    pointer = read_pointer(folder)
+    if not pointer or not pointer.get("previous"):
+        raise RegistryError("No previous version to roll back to")
+    activate(pointer["previous"], folder)
+    return pointer["previous"]
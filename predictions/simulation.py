@@ -0,0 +1,207 @@
+"""Monte Carlo simulation of a knockout draw.
+
+A draw is a list of 32, 64 or 128 slots in bracket order; each slot holds
+a player (with an optional seed) or None for a bye. Every pair of players
+that can meet, in the round where they would meet, is scored with one
+batched model call. The bracket is then played out for all simulations at
+once: each round is a single vectorized draw over an (n_simulations,
+n_matches) array, SIMULATION_CHUNK simulations at a time so memory stays
+flat however many are asked for.
+"""
+import numpy as np
+
+from players.derived import player_features
+from players.identity import PlayerResolver
+from players.models import HeadToHead, Player
+from .ml_utils import get_layout, match_features, predict_matches
+
+DRAW_SIZES = (32, 64, 128)
+MAX_SIMULATIONS = 500_000
+SIMULATION_CHUNK = 10_000
+
+# bracket rounds, first to last, and their round_encoded value from forms.ROUND_CHOICES;
+# there is no round-of-16 choice, so it is scored like the round of 32
+ROUNDS = ["R128", "R64", "R32", "R16", "QF", "SF", "F"]
+ROUND_CODES = {"R128": 1, "R64": 2, "R32": 3, "R16": 3, "QF": 4, "SF": 5, "F": 6}
+ROUND_CAVEAT = "R16 matches are scored as round of 32 (round_encoded 3): the model has no round-of-16 code"
+
+
+class DrawError(Exception):
+    pass
+
+
+def draw_rounds(draw_size):
+    """Round names of a draw, first to last, e.g. ["R32", "R16", "QF", "SF", "F"] for 32."""
+    return ROUNDS[-(draw_size.bit_length() - 1):]
+
+
+def slot_seed(i, slot, draw_size):
+    seed = slot.get("seed")
+    if seed in (None, "", 0):
+        return 0
+    # int() alone would also take True and truncate 1.5
+    if isinstance(seed, bool) or not isinstance(seed, (int, str)):
+        raise DrawError(f"Slot {i}: seed must be a whole number")
+    try:
+        seed = int(seed)
+    except ValueError:
+        raise DrawError(f"Slot {i}: seed must be a whole number")
+    if not 0 < seed <= draw_size:
+        raise DrawError(f"Slot {i}: seed must be between 1 and {draw_size}")
+    return seed
+
+
+def load_draw(slots):
+    """Validate draw slots and load their players.
+
+    A slot is {"player": id} or {"name": "..."} (matched like the importers
+    match names), with an optional "seed", or None for a bye. Returns
+    (players, features, seeds): the Player and PlayerFeatures of each slot
+    (None for byes) and each slot's seed.
+    """
+    if not isinstance(slots, list) or len(slots) not in DRAW_SIZES:
+        raise DrawError(f"A draw is a list of {', '.join(map(str, DRAW_SIZES))} slots")
+
+    resolver = None
+    ids, seeds = [], []
+    for i, slot in enumerate(slots):
+        if slot is None:
+            ids.append(None)
+            seeds.append(0)
+            continue
+        if not isinstance(slot, dict) or not (slot.get("player") or slot.get("name")):
+            raise DrawError(f'Slot {i}: expected {{"player": id}} or {{"name": "..."}}, or null for a bye')
+
+        if slot.get("player"):
+            if isinstance(slot["player"], bool) or not isinstance(slot["player"], (str, int)):
+                raise DrawError(f"Slot {i}: player must be a player id")
+            ids.append(str(slot["player"]))
+        else:
+            if not isinstance(slot["name"], str):
+                raise DrawError(f"Slot {i}: name must be a string")
+            resolver = resolver or PlayerResolver.load()
+            player = resolver.get(slot["name"])
+            if player is None:
+                raise DrawError(f"Slot {i}: no player named {slot['name']!r}")
+            ids.append(player.pk)
+        seeds.append(slot_seed(i, slot, len(slots)))
+
+    player_ids = {player_id for player_id in ids if player_id}
+    if len(player_ids) != sum(player_id is not None for player_id in ids):
+        raise DrawError("A player appears in more than one slot")
+    players = Player.objects.in_bulk(player_ids)
+    unknown = sorted(player_ids - players.keys())
+    if unknown:
+        raise DrawError(f"Unknown player ids: {', '.join(unknown)}")
+    features = player_features(player_ids)
+
+    return (
+        [players.get(player_id) for player_id in ids],
+        [features.get(player_id) for player_id in ids],
+        seeds,
+    )
+
+
+def meeting_pairs(draw_size, round_index):
+    """Slot pairs (i, j) that can meet in a round: same block, opposite halves."""
+    half = 1 << round_index
+    pairs = []
+    for block in range(0, draw_size, 2 * half):
+        for i in range(block, block + half):
+            for j in range(block + half, block + 2 * half):
+                pairs.append((i, j))
+    return pairs
+
+
+def win_matrix(players, features, seeds, context):
+    """P[r, i, j]: probability that slot i beats slot j if they meet in round r.
+
+    Only pairs that can actually meet in a round are scored, all in one
+    predict_matches call. A player always beats a bye.
+    """
+    draw_size = len(players)
+    rounds = draw_rounds(draw_size)
+    matrix = np.full((len(rounds), draw_size, draw_size), 0.5)
+
+    h2h = HeadToHead.objects.for_pairs(
+        (players[i].pk, players[j].pk)
+        for r in range(len(rounds)) for i, j in meeting_pairs(draw_size, r)
+        if players[i] is not None and players[j] is not None
+    )
+    scored, rows = [], []
+    for r, round_name in enumerate(rounds):
+        match = {**context, "draw_size": draw_size, "round_encoded": ROUND_CODES[round_name]}
+        for i, j in meeting_pairs(draw_size, r):
+            if players[i] is None or players[j] is None:
+                if players[i] is not players[j]:
+                    matrix[r, i, j] = 1.0 if players[j] is None else 0.0
+                    matrix[r, j, i] = 1.0 - matrix[r, i, j]
+                continue
+            row = get_layout().empty()[0]
+            match_features(
+                features[i], features[j],
+                {**match, "player1_seed": seeds[i], "player2_seed": seeds[j]}, row,
+                h2h=h2h.get(tuple(sorted([players[i].pk, players[j].pk]))),
+            )
+            scored.append((r, i, j))
+            rows.append(row)
+
+    if rows:
+        win_probs = predict_matches(np.vstack(rows))
+        r, i, j = np.array(scored).T
+        matrix[r, i, j] = win_probs
+        matrix[r, j, i] = 1.0 - win_probs
+    return matrix
+
+
+def simulate(matrix, simulations=100_000, seed=None):
+    """Play the bracket `simulations` times.
+
+    Returns reach[k, i]: the share of simulations in which slot i won k
+    matches, i.e. reached round k (k = number of rounds means the title).
+    """
+    rng = np.random.default_rng(seed)
+    n_rounds, draw_size, _ = matrix.shape
+    wins = np.zeros((n_rounds + 1, draw_size))
+    wins[0] = simulations
+
+    for start in range(0, simulations, SIMULATION_CHUNK):
+        chunk = min(SIMULATION_CHUNK, simulations - start)
+        alive = np.broadcast_to(np.arange(draw_size, dtype=np.int32), (chunk, draw_size))
+        for r in range(n_rounds):
+            left, right = alive[:, 0::2], alive[:, 1::2]
+            left_wins = rng.random(left.shape) < matrix[r, left, right]
+            alive = np.where(left_wins, left, right)
+            wins[r + 1] += np.bincount(alive.ravel(), minlength=draw_size)
+    return wins / simulations
+
+
+def simulate_draw(slots, context, simulations=100_000, seed=None):
+    """Per-player probabilities of reaching each round of a draw.
+
+    `context` holds the tourney_level, surface and best_of of PredictForm.
+    Byes are left out of the result, which lists ROUND_CAVEAT under "caveats".
+    """
+    if not 0 < simulations <= MAX_SIMULATIONS:
+        raise DrawError(f"simulations must be between 1 and {MAX_SIMULATIONS:,}")
+    players, features, seeds = load_draw(slots)
+    reach = simulate(win_matrix(players, features, seeds, context), simulations, seed)
+
+    # reach[k] is the round after k wins; "W" is the title
+    stages = draw_rounds(len(slots))[1:] + ["W"]
+    return {
+        "draw_size": len(slots),
+        "simulations": simulations,
+        "rounds": stages,
+        "caveats": [ROUND_CAVEAT],
+        "players": [
+            {
+                "slot": i,
+                "id": player.id,
+                "name": player.name,
+                "seed": seeds[i] or None,
+                "reach": {stage: round(float(p), 4) for stage, p in zip(stages, reach[1:, i])},
+            }
+            for i, player in enumerate(players) if player is not None
+        ],
+    }
@@ -1,3 +1,458 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from players.derived import player_features
+from players.models import Player, Ranking, RankingWeek
+from players.publishing import touch_publish_stamp
+from predictions import views
+from predictions.cache import PredictionCache, match_key
+from predictions.compiled import CompileError, CompiledForest, max_difference, probe_rows
+from predictions.features import FeatureLayout
+from predictions.forms import MatchForm
+from predictions.ml_utils import get_layout, match_features, predict_matches
+from predictions.pairwise import POINTER, PairwiseTables, build_tables
+from predictions.registry import (
+    BUILTIN, RegistryError, activate, current_version, list_versions, quiet_feature_names, read_pointer, register,
+    rollback,
+)
+from predictions.simulation import ROUND_CAVEAT, DrawError, load_draw
+
+WEEK = datetime.date(2020, 1, 6)
+MATCH = {
+    "tourney_level": "tourney_level_G", "surface": "surface_Hard",
+    "best_of": 5, "round_encoded": 1, "draw_size": 128,
+}
+
+
+def fit_forest(n_classes=2, missing=True):
+    import pandas as pd
+    from sklearn.ensemble import HistGradientBoostingClassifier
+
+    rng = np.random.default_rng(0)
+    rows = rng.normal(size=(400, 5))
+    labels = (rows[:, 0] + rows[:, 1] * rows[:, 2] > 0).astype(int)
+    if n_classes > 2:
+        labels += (rows[:, 3] > 1).astype(int)
+    if missing:
+        rows[rng.random(rows.shape) < 0.1] = np.nan
+    # fitted on a DataFrame, like the real model, so the compiled form knows its columns
+    frame = pd.DataFrame(rows, columns=[f"f{i}" for i in range(rows.shape[1])])
+    return HistGradientBoostingClassifier(max_iter=30, max_depth=5, random_state=0).fit(frame, labels), rows
+
+
+class PredictionTestCase(TestCase):
+    """Four ranked players, a private prediction cache and no pairwise tables of the real data."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, (rank, points, height_cm, plays) in enumerate([
+            (1, 11000, 188, "Right-Handed"), (2, 9500, 191, "Left-Handed"),
+            (40, 1200, 183, "Right-Handed"), (41, 1190, 178, "Right-Handed"),
+        ], start=1):
+            player = Player.objects.create(
+                id=f"P000{i}", name=f"Player {i}", height_cm=height_cm, plays=plays,
+                birth_date=datetime.date(1995, i, 1),
+            )
+            Ranking.objects.create(player=player, date=WEEK, rank=rank, points=points)
+        RankingWeek.objects.create(date=WEEK, is_published=True, row_count=4)
+
+    def setUp(self):
+        for patcher in [
+            # the stamp rows of earlier tests are rolled back, so don't serve one polled during those
+            mock.patch("players.publishing.STAMP_POLL_SECONDS", 0),
+            mock.patch.object(views, "prediction_cache", PredictionCache()),
+            mock.patch.object(views.pairwise_tables, "lookup", return_value=None),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def expected(self, p1_id, p2_id, match=MATCH):
+        """Player1's win probability scored on its own, straight from the model."""
+        form = MatchForm(match)
+        self.assertTrue(form.is_valid(), form.errors)
+        features = player_features([p1_id, p2_id])
+        return predict_matches(match_features(features[p1_id], features[p2_id], form.cleaned_data)[None])[0]
+
+    def post_json(self, name, body):
+        return self.client.post(reverse(f"predictions:{name}"), json.dumps(body), content_type="application/json")
+
+
+class CompiledForestTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model, cls.rows = fit_forest()
+        cls.compiled = CompiledForest.from_estimator(cls.model, source_sha256="abc")
+
+    def test_matches_sklearn(self):
+        # probe rows sit on, just below and just above every split threshold
+        for rows in [self.rows, probe_rows(self.compiled), self.rows[:1]]:
+            with self.subTest(rows=len(rows)):
+                self.assertLessEqual(max_difference(self.compiled, self.model, rows), 1e-9)
+                np.testing.assert_allclose(
+                    self.compiled.predict_proba(rows).sum(axis=1), np.ones(len(rows)),
+                )
+
+    def test_missing_values_follow_the_fitted_branch(self):
+        rows = np.full((1, self.rows.shape[1]), np.nan)
+        self.assertLessEqual(max_difference(self.compiled, self.model, rows), 1e-9)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.compiled.save(os.path.join(tmp, "model.npz"))
+            self.compiled.save_folder(os.path.join(tmp, "compiled"))
+            for loaded in [CompiledForest.load(os.path.join(tmp, "model.npz")),
+                           CompiledForest.load_folder(os.path.join(tmp, "compiled"))]:
+                with self.subTest(loaded=loaded):
+                    self.assertEqual(loaded.source_sha256, "abc")
+                    np.testing.assert_array_equal(
+                        loaded.predict_proba(self.rows), self.compiled.predict_proba(self.rows),
+                    )
+                    del loaded  # release the memory map before the folder goes
+
+    def test_only_binary_models_compile(self):
+        model, _ = fit_forest(n_classes=3, missing=False)
+        with self.assertRaises(CompileError):
+            CompiledForest.from_estimator(model)
+
+
+class FeatureLayoutTests(SimpleTestCase):
+    def setUp(self):
+        self.layout = FeatureLayout(
+            ["Player1_rank", "Player2_rank", "rank_diff", "h2h_p1_winrate", "best_of", "Player1_height"]
+        )
+        self.rows = np.array([
+            [1, 20, -19, 0.75, 5, 185],
+            [7, 3, 4, 0.0, 3, 0],
+        ], dtype=float)
+
+    def test_swap_exchanges_players(self):
+        np.testing.assert_array_equal(self.layout.swap(self.rows), [
+            [20, 1, 19, 0.25, 5, 185],
+            [3, 7, -4, 1.0, 3, 0],
+        ])
+
+    def test_swap_twice_is_identity(self):
+        np.testing.assert_array_equal(self.layout.swap(self.layout.swap(self.rows)), self.rows)
+
+    def test_swap_copies(self):
+        self.layout.swap(self.rows)
+        self.assertEqual(self.rows[0, 0], 1)
+
+    def test_fill_ignores_unknown_columns(self):
+        row = self.layout.fill(self.layout.empty()[0], {"best_of": 3, "surface_Hard": 1})
+        self.assertEqual(row.tolist(), [0, 0, 0, 0, 3, 0])
+
+
+class PredictViewTests(PredictionTestCase):
+    def predict(self, p1_id, p2_id):
+        return self.client.post(
+            reverse("predictions:predict"), {"player1": p1_id, "player2": p2_id, **MATCH},
+            headers={"x-requested-with": "XMLHttpRequest"},
+        )
+
+    def test_predicts_a_matchup(self):
+        response = self.predict("P0001", "P0003")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["p1_win"], f"{self.expected('P0001', 'P0003') * 100:.2f}%")
+
+    def test_same_player_is_rejected(self):
+        response = self.predict("P0001", "P0001")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("player1 and player2 must be different players", response.json()["error"])
+
+
+class PredictBatchTests(PredictionTestCase):
+    def test_results_follow_the_input_order(self):
+        clay = dict(MATCH, surface="surface_Clay", best_of=3)
+        matches = [("P0001", "P0002", MATCH), ("P0004", "P0001", MATCH), ("P0002", "P0003", clay),
+                   ("P0001", "P0002", clay), ("P0002", "P0001", MATCH)]
+        body = {"matches": [{"player1": p1_id, "player2": p2_id, **match} for p1_id, p2_id, match in matches]}
+
+        # the second request is served from the cache
+        for _ in range(2):
+            response = self.post_json("predict_batch", body)
+            self.assertEqual(response.status_code, 200)
+            results = response.json()["results"]
+            self.assertEqual([(r["p1"], r["p2"]) for r in results],
+                             [(f"Player {p1[-1]}", f"Player {p2[-1]}") for p1, p2, _ in matches])
+            for result, (p1_id, p2_id, match) in zip(results, matches):
+                self.assertAlmostEqual(result["p1_win"], self.expected(p1_id, p2_id, match), delta=1e-4)
+        self.assertEqual(views.prediction_cache.stats()["hits"], len(matches))
+
+    def test_same_player_is_rejected(self):
+        response = self.post_json("predict_batch", {"matches": [
+            {"player1": "P0001", "player2": "P0002", **MATCH}, {"player1": "P0003", "player2": "P0003", **MATCH},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"errors": {"1": "player1 and player2 must be different players"}})
+
+    def test_unknown_players_are_rejected(self):
+        response = self.post_json("predict_batch", {"matches": [{"player1": "P0001", "player2": "NOPE", **MATCH}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Unknown player ids: NOPE"})
+
+
+class DrawSlotTests(TestCase):
+    def test_malformed_slots_raise_draw_error(self):
+        for slot, message in [
+            ({"player": "P0001", "seed": "3a"}, "seed must be a whole number"),
+            ({"player": "P0001", "seed": 1.5}, "seed must be a whole number"),
+            ({"player": "P0001", "seed": True}, "seed must be a whole number"),
+            ({"player": "P0001", "seed": 33}, "seed must be between 1 and 32"),
+            ({"player": True}, "player must be a player id"),
+            ({"player": ["P0001"]}, "player must be a player id"),
+            ({"name": 5}, "name must be a string"),
+            ({"name": {"first": "Stan"}}, "name must be a string"),
+            ("P0001", "expected"),
+        ]:
+            with self.subTest(slot=slot), self.assertRaisesMessage(DrawError, f"Slot 0: {message}"):
+                load_draw([slot] + [None] * 31)
+
+
+class SimulateViewTests(PredictionTestCase):
+    BODY = {
+        "draw": [
+            {"player": "P0001", "seed": 1}, {"player": "P0004"}, {"player": "P0003"}, {"player": "P0002", "seed": 2},
+        ] + [None] * 28,
+        "tourney_level": "tourney_level_G", "surface": "surface_Hard", "best_of": 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user("fan", password="pw")
+        cls.staff = User.objects.create_user("admin", password="pw", is_staff=True)
+
+    def simulate(self, **body):
+        return self.post_json("simulate", {**self.BODY, **body})
+
+    def test_anonymous_requests_are_refused(self):
+        self.assertEqual(self.simulate(simulations=10).status_code, 401)
+
+    def test_simulations_are_capped_by_user(self):
+        self.client.force_login(self.user)
+        response = self.simulate(simulations=views.MAX_WEB_SIMULATIONS + 1)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": f"simulations must be at most {views.MAX_WEB_SIMULATIONS:,}"})
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.simulate(simulations=views.MAX_WEB_SIMULATIONS + 1).status_code, 200)
+
+    def test_result_carries_the_round_caveat(self):
+        self.client.force_login(self.user)
+        result = self.simulate().json()
+        self.assertEqual(result["simulations"], views.MAX_WEB_SIMULATIONS)
+        self.assertEqual(result["caveats"], [ROUND_CAVEAT])
+        self.assertEqual([p["id"] for p in result["players"]], ["P0001", "P0004", "P0003", "P0002"])
+        self.assertAlmostEqual(sum(p["reach"]["W"] for p in result["players"]), 1)
+
+    def test_csrf_is_enforced(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse("predictions:simulate"), json.dumps(self.BODY), content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.stamp = {"date": "2020-01-06", "version": 1, "base": 1, "players": []}
+        for target, replacement in [
+            ("predictions.cache.active_version", lambda: SimpleNamespace(fingerprint="test:0")),
+            ("predictions.cache.current_publish_stamp", lambda: dict(self.stamp)),
+        ]:
+            patcher = mock.patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cache = PredictionCache()
+
+    def publish(self, **stamp):
+        self.stamp.update(stamp)
+
+    def test_key_keeps_player_order(self):
+        match = dict(MATCH, player1_seed=3)
+        key = match_key("AAAAA", "BBBBB", match)
+        reverse = match_key("BBBBB", "AAAAA", dict(MATCH, player2_seed=3))
+        self.assertNotEqual(key, reverse)
+        self.assertEqual(key[:4], ("AAAAA", "BBBBB", 3, 0))
+        self.assertEqual(reverse[:4], ("BBBBB", "AAAAA", 0, 3))
+
+    def test_reversed_pair_is_not_served_flipped(self):
+        # with tied ranks the two orders are scored independently
+        self.cache.set("BBBBB", "AAAAA", MATCH, 0.7)
+        self.assertEqual(self.cache.get("BBBBB", "AAAAA", MATCH), 0.7)
+        self.assertIsNone(self.cache.get("AAAAA", "BBBBB", MATCH))
+
+    def test_new_week_drops_everything(self):
+        self.cache.set("AAAAA", "BBBBB", MATCH, 0.6)
+        self.publish(date="2020-01-13", version=2, base=2)
+        self.assertIsNone(self.cache.get("AAAAA", "BBBBB", MATCH))
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_delta_drops_only_its_players(self):
+        self.cache.set("AAAAA", "BBBBB", MATCH, 0.6)
+        self.cache.set("CCCCC", "DDDDD", MATCH, 0.4)
+        self.publish(version=2, players=["BBBBB"])
+        self.assertIsNone(self.cache.get("AAAAA", "BBBBB", MATCH))
+        self.assertEqual(self.cache.get("CCCCC", "DDDDD", MATCH), 0.4)
+        self.assertEqual(self.cache.stats()["player_invalidations"], 1)
+
+    def test_model_change_drops_everything(self):
+        self.cache.set("AAAAA", "BBBBB", MATCH, 0.6)
+        with mock.patch("predictions.cache.active_version", lambda: SimpleNamespace(fingerprint="test:1")):
+            self.assertIsNone(self.cache.get("AAAAA", "BBBBB", MATCH))
+
+
+class PairwiseTablesTests(PredictionTestCase):
+    def setUp(self):
+        super().setUp()
+        # a tie: predict_matches scores the two orders of this pair independently
+        Ranking.objects.filter(player_id="P0004").update(rank=40)
+        touch_publish_stamp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.folder = tmp.name
+        self.build, _ = build_tables(self.folder)
+        self.tables = PairwiseTables(self.folder)
+
+    def test_lookup_matches_the_model_in_both_orders(self):
+        for p1_id, p2_id in [("P0001", "P0002"), ("P0002", "P0001"), ("P0001", "P0003"), ("P0003", "P0001"),
+                             ("P0003", "P0004"), ("P0004", "P0003")]:
+            for round_encoded in (1, 6):
+                match = dict(MATCH, round_encoded=round_encoded)
+                with self.subTest(p1=p1_id, p2=p2_id, round=round_encoded):
+                    table = self.tables.lookup(p1_id, p2_id, match)
+                    # the tables are float16
+                    self.assertAlmostEqual(table, self.expected(p1_id, p2_id, match), delta=1e-3)
+
+    def test_new_build_replaces_the_old_one(self):
+        build, _ = build_tables(self.folder)
+        self.assertEqual(sorted(os.listdir(self.folder)), sorted([os.path.basename(build), POINTER]))
+        self.assertIsNotNone(self.tables.lookup("P0001", "P0002", MATCH))
+
+    def test_failed_build_is_removed(self):
+        with mock.patch("predictions.pairwise.predict_matches", side_effect=MemoryError):
+            with self.assertRaises(MemoryError):
+                build_tables(self.folder)
+        self.assertEqual(sorted(os.listdir(self.folder)), sorted([os.path.basename(self.build), POINTER]))
+
+    def test_tables_go_stale_when_a_week_is_published(self):
+        self.assertIsNotNone(self.tables.lookup("P0001", "P0002", MATCH))
+        touch_publish_stamp()
+        self.assertIsNone(self.tables.lookup("P0001", "P0002", MATCH))
+
+
+class SymmetricPredictionTests(PredictionTestCase):
+    PAIRS = [("P0001", "P0002"), ("P0001", "P0004"), ("P0003", "P0004"), ("P0002", "P0003")]
+
+    def rows(self):
+        form = MatchForm(MATCH)
+        self.assertTrue(form.is_valid(), form.errors)
+        features = player_features({player_id for pair in self.PAIRS for player_id in pair})
+        rows = get_layout().empty(len(self.PAIRS))
+        for row, (p1_id, p2_id) in zip(rows, self.PAIRS):
+            match_features(features[p1_id], features[p2_id], form.cleaned_data, row)
+        return rows
+
+    def test_both_orders_add_up_to_one(self):
+        # P0003 and P0004 are tied, which the default mode scores in the order given
+        Ranking.objects.filter(player_id="P0004").update(rank=40)
+        rows = self.rows()
+        forward = predict_matches(rows, symmetric=True)
+        backward = predict_matches(get_layout().swap(rows), symmetric=True)
+        np.testing.assert_allclose(forward + backward, np.ones(len(rows)), atol=1e-12)
+
+    @override_settings(PREDICTIONS_SYMMETRIC=True)
+    def test_setting_applies_to_the_endpoints(self):
+        matches = [
+            {"player1": p1_id, "player2": p2_id, **MATCH}
+            for pair in self.PAIRS for p1_id, p2_id in [pair, pair[::-1]]
+        ]
+        results = self.post_json("predict_batch", {"matches": matches}).json()["results"]
+        for forward, backward in zip(results[0::2], results[1::2]):
+            self.assertAlmostEqual(forward["p1_win"] + backward["p1_win"], 1, delta=1e-4)
+        np.testing.assert_allclose([r["p1_win"] for r in results[0::2]],
+                                   predict_matches(self.rows(), symmetric=True), atol=1e-4)
+
+
+
+class RegistryTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model, cls.rows = fit_forest()
+
+    def setUp(self):
+        import joblib
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.folder = os.path.join(tmp.name, "models")
+        self.source = os.path.join(tmp.name, "model.pkl")
+        self.features = os.path.join(tmp.name, "features.json")
+        joblib.dump(self.model, self.source)
+        with open(self.features, "w", encoding="utf-8") as f:
+            json.dump(list(self.model.feature_names_in_), f)
+
+    def register(self, **kwargs):
+        return register(self.source, self.features, folder=self.folder, **kwargs)
+
+    def test_register_does_not_activate(self):
+        meta = self.register()
+        self.assertEqual((meta["version"], meta["compiled"]), ("v2", True))
+        self.assertEqual([meta["version"] for meta in list_versions(self.folder)], ["v2"])
+        self.assertEqual(current_version(self.folder).name, BUILTIN)
+        self.assertEqual(self.register()["version"], "v3")
+
+    def test_activate_and_roll_back(self):
+        self.register()
+        self.register(name="candidate")
+        self.assertEqual(activate("v2", self.folder), BUILTIN)
+        self.assertEqual(activate("candidate", self.folder), "v2")
+
+        version = current_version(self.folder)
+        self.assertEqual(version.name, "candidate")
+        self.assertEqual(version.columns, list(self.model.feature_names_in_))
+        with quiet_feature_names():
+            expected = self.model.predict_proba(self.rows)
+            np.testing.assert_allclose(version.model.predict_proba(self.rows), expected)
+            np.testing.assert_array_equal(version.estimator.predict_proba(self.rows), expected)
+        del version  # release the memory maps before the folder goes
+
+        self.assertEqual(rollback(self.folder), "v2")
+        self.assertEqual(current_version(self.folder).name, "v2")
+        # rolling back again returns to the version that was just replaced
+        self.assertEqual(rollback(self.folder), "candidate")
+
+    def test_bad_requests_change_nothing(self):
+        with self.assertRaises(RegistryError):
+            rollback(self.folder)
+        self.register()
+        activate("v2", self.folder)
+        pointer = read_pointer(self.folder)
+        for call in [
+            lambda: activate("v9", self.folder),
+            lambda: self.register(name="v2"),
+            lambda: self.register(name=BUILTIN),
+            lambda: self.register(name="../v3"),
+        ]:
+            with self.assertRaises(RegistryError):
+                call()
+        self.assertEqual(read_pointer(self.folder), pointer)
+        self.assertEqual(sorted(os.listdir(self.folder)), ["current.json", "v2"])
+
+    def test_columns_must_match_the_model(self):
+        with open(self.features, "w", encoding="utf-8") as f:
+            json.dump(list(reversed(self.model.feature_names_in_)), f)
+        with self.assertRaises(RegistryError):
+            self.register()
+        self.assertEqual(list_versions(self.folder), [])
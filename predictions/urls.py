@@ -1,5 +1,5 @@
 from django.urls import path, include
-from .views import predict
+from .views import cache_stats, predict, predict_batch, simulate
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -7,6 +7,9 @@ app_name = "predictions"
 
 urlpatterns = [
     path("predict/", predict, name="predict"),
+    path("predict/batch/", predict_batch, name="predict_batch"),
+    path("simulate/", simulate, name="simulate"),
+    path("cache-stats/", cache_stats, name="cache_stats"),
 ]
 
 if settings.DEBUG:
@@ -1,15 +1,29 @@
+import json
+
+import numpy as np
 from django.shortcuts import render
 from django.db.models import OuterRef, Subquery
-from .forms import PredictForm
-from players.models import Player, Ranking
-import pandas as pd
-from .ml_utils import predict_match, model_columns
+from django.views.decorators.csrf import csrf_exempt
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_GET, require_POST
+from .forms import SAME_PLAYER_ERROR, DrawForm, MatchForm, PredictForm
+from players.derived import player_features
+from players.models import HeadToHead, Player, Ranking
+from .ml_utils import get_layout, match_features, predict_match, predict_matches
+from .cache import prediction_cache
+from .pairwise import tables as pairwise_tables
+from .simulation import DrawError, simulate_draw
 from django.http import JsonResponse
 
+MAX_BATCH_MATCHES = 1000
+# 100,000 simulations take about 0.7 s of CPU; the simulate_draw command runs up to simulation.MAX_SIMULATIONS
+MAX_WEB_SIMULATIONS = 10_000
+MAX_STAFF_SIMULATIONS = 100_000
+
 
 def predict(request):
     # Annotate players with their latest rank and points
-    latest_rank = Ranking.objects.filter(player=OuterRef("pk")).order_by("-date")
+    latest_rank = Ranking.objects.published().filter(player=OuterRef("pk")).order_by("-date")
     players = (
         Player.objects.annotate(
             latest_rank_value=Subquery(latest_rank.values("rank")[:1]),
@@ -29,57 +43,22 @@ def predict(request):
         try:
             p1 = form.cleaned_data["player1"]
             p2 = form.cleaned_data["player2"]
-            tourney_level = form.cleaned_data["tourney_level"]
-            best_of = int(form.cleaned_data["best_of"])
-            round_encoded = int(form.cleaned_data["round_encoded"])
-            surface = form.cleaned_data["surface"]
-            draw_size = form.cleaned_data["draw_size"]
-
-            # Build model input
-            input_raw = pd.DataFrame(columns=model_columns)
-            input_raw.loc[0] = 0
-
-            # 🧮 Player info
-            p1_rank = p1.rankings.order_by("-date").first()
-            p2_rank = p2.rankings.order_by("-date").first()
-
-            p1_right_hand = 1 if "Right" in (p1.plays or "") else 0
-            p2_right_hand = 1 if "Right" in (p2.plays or "") else 0
-
-            input_raw.at[0, "draw_size"] = draw_size
-            input_raw.at[0, "Player1_rank"] = p1_rank.rank if p1_rank else 999
-            input_raw.at[0, "Player2_rank"] = p2_rank.rank if p2_rank else 999
-            input_raw.at[0, "Player1_rank_points"] = p1_rank.points if p1_rank else 0
-            input_raw.at[0, "Player2_rank_points"] = p2_rank.points if p2_rank else 0
-            input_raw.at[0, "Player1_ht"] = p1.height_cm or 180
-            input_raw.at[0, "Player2_ht"] = p2.height_cm or 180
-            input_raw.at[0, "Player1_age"] = p1.age or 25
-            input_raw.at[0, "Player2_age"] = p2.age or 25
-            input_raw.at[0, "Player1_hand_R"] = p1_right_hand
-            input_raw.at[0, "Player2_hand_R"] = p2_right_hand
-            input_raw.at[0, "Player1_seed"] = form.cleaned_data["player1_seed"] or 0
-            input_raw.at[0, "Player2_seed"] = form.cleaned_data["player2_seed"] or 0
-            input_raw.at[0, "Player1_entry_Direct"] = 1
-            input_raw.at[0, "Player2_entry_Direct"] = 1
-
-            input_raw.at[0, "best_of"] = best_of
-            input_raw.at[0, "round_encoded"] = round_encoded
-            input_raw.at[0, surface] = 1
-            input_raw.at[0, tourney_level] = 1
-
-            # ⚙️ Engineered features
-            if p1_rank and p2_rank:
-                input_raw.at[0, "rank_diff"] = p1_rank.rank - p2_rank.rank
-                input_raw.at[0, "points_diff"] = p1_rank.points - p2_rank.points
-                input_raw.at[0, "relative_rank_strength"] = (
-                    (p1_rank.rank - p2_rank.rank) / (p1_rank.rank + p2_rank.rank)
-                )
-
-            input_raw.at[0, "height_diff"] = (p1.height_cm or 180) - (p2.height_cm or 180)
-            input_raw.at[0, "h2h_p1_winrate"] = 0.5
-
-            # 🔮 Predict
-            win_prob = predict_match(input_raw)
+
+            # ♻️ Recent identical predictions, then the precomputed top-300 tables
+            win_prob = prediction_cache.get(p1.id, p2.id, form.cleaned_data)
+            if win_prob is None:
+                win_prob = pairwise_tables.lookup(p1.id, p2.id, form.cleaned_data)
+                if win_prob is None:
+                    # 🧮 Both players' materialized features in one query
+                    features = player_features([p1.id, p2.id])
+                    h2h = HeadToHead.objects.for_pair(p1.id, p2.id)
+
+                    # 🔮 Predict
+                    win_prob = predict_match(
+                        match_features(features[p1.id], features[p2.id], form.cleaned_data, h2h=h2h)
+                    )
+                    # table hits aren't cached: the tables have their own staleness checks
+                    prediction_cache.set(p1.id, p2.id, form.cleaned_data, win_prob)
 
             result = {
                 "p1": p1.name,
@@ -98,7 +77,7 @@ def predict(request):
     form = PredictForm()
     players_with_data = []
     for p in players:
-        latest_ranking = p.rankings.order_by("-date").first()
+        latest_ranking = p.rankings.published().order_by("-date").first()
         stats = getattr(p, "stats", None)
         record = p.get_career_record() if hasattr(p, "get_career_record") else None
 
@@ -137,4 +116,116 @@ def predict(request):
         "best_of": form.fields["best_of"].choices,
         "match_fields": match_fields,
     }
-    return render(request, "predictions/predict.html", context)
\ No newline at end of file
+    return render(request, "predictions/predict.html", context)
+
+
+@csrf_exempt
+@require_POST
+def predict_batch(request):
+    """Score a list of matchups in one model call.
+
+    Cached pairs and pairs covered by the precomputed pairwise tables skip
+    the model; large remainders go to the sklearn estimator, small ones to
+    the compiled ensemble (ml_utils.predict_matches). Body: {"matches": [{"player1": id, "player2": id, <PredictForm match fields>}, ...]}.
+    Results come back in input order.
+    """
+    try:
+        matches = json.loads(request.body)["matches"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Expected a JSON body {"matches": [...]}'}, status=400)
+    if not isinstance(matches, list) or not 0 < len(matches) <= MAX_BATCH_MATCHES:
+        return JsonResponse({"error": f"matches must be a list of 1 to {MAX_BATCH_MATCHES} items"}, status=400)
+
+    contexts, errors = [], {}
+    for i, match in enumerate(matches):
+        form = MatchForm(match if isinstance(match, dict) else {})
+        if form.is_valid():
+            contexts.append(form.cleaned_data)
+        else:
+            errors[i] = " | ".join(f"{field}: {', '.join(errs)}" for field, errs in form.errors.items())
+    if errors:
+        return JsonResponse({"errors": errors}, status=400)
+
+    pairs = [(str(match.get("player1")), str(match.get("player2"))) for match in matches]
+    same = {i: SAME_PLAYER_ERROR for i, (p1_id, p2_id) in enumerate(pairs) if p1_id == p2_id}
+    if same:
+        return JsonResponse({"errors": same}, status=400)
+    player_ids = {player_id for pair in pairs for player_id in pair}
+    players = Player.objects.in_bulk(player_ids)
+    unknown = sorted(player_ids - players.keys())
+    if unknown:
+        return JsonResponse({"error": f"Unknown player ids: {', '.join(unknown)}"}, status=400)
+
+    win_probs = np.array([
+        prediction_cache.get(p1_id, p2_id, context) for (p1_id, p2_id), context in zip(pairs, contexts)
+    ], dtype=float)  # None -> nan
+    uncached = np.flatnonzero(np.isnan(win_probs))
+    for i in uncached:
+        win_prob = pairwise_tables.lookup(*pairs[i], contexts[i])
+        if win_prob is not None:
+            win_probs[i] = win_prob
+    missing = np.flatnonzero(np.isnan(win_probs))
+    if len(missing):
+        features = player_features({player_id for i in missing for player_id in pairs[i]})
+        h2h = HeadToHead.objects.for_pairs(pairs[i] for i in missing)
+        rows = get_layout().empty(len(missing))
+        for row, i in zip(rows, missing):
+            p1_id, p2_id = pairs[i]
+            match_features(features[p1_id], features[p2_id], contexts[i], row, h2h=h2h.get(tuple(sorted(pairs[i]))))
+        win_probs[missing] = predict_matches(rows)
+    for i in missing:
+        prediction_cache.set(*pairs[i], contexts[i], win_probs[i])
+
+    results = [
+        {
+            "p1": players[p1_id].name,
+            "p2": players[p2_id].name,
+            "p1_win": round(float(win_prob), 4),
+            "p2_win": round(float(1 - win_prob), 4),
+        }
+        for (p1_id, p2_id), win_prob in zip(pairs, win_probs)
+    ]
+    return JsonResponse({"results": results})
+
+
+@require_POST
+def simulate(request):
+    """Monte Carlo simulation of a draw, for logged-in users.
+
+    Body: {"draw": [{"player": id, "seed": n} or null for a bye, ...],
+    "tourney_level", "surface", "best_of", "simulations" (optional, at
+    most MAX_WEB_SIMULATIONS, or MAX_STAFF_SIMULATIONS for staff)}.
+    It authenticates by session, so unlike predict_batch it keeps CSRF
+    protection. The model has no round-of-16 code, so R16 matches are
+    scored as round of 32; the response repeats this under "caveats".
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Log in to run simulations"}, status=401)
+    max_simulations = MAX_STAFF_SIMULATIONS if request.user.is_staff else MAX_WEB_SIMULATIONS
+
+    try:
+        body = json.loads(request.body)
+        slots = body["draw"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Expected a JSON body {"draw": [...], ...}'}, status=400)
+
+    form = DrawForm(body)
+    if not form.is_valid():
+        errors = [f"{field}: {', '.join(errs)}" for field, errs in form.errors.items()]
+        return JsonResponse({"error": " | ".join(errors)}, status=400)
+
+    simulations = form.cleaned_data["simulations"] or max_simulations
+    if simulations > max_simulations:
+        return JsonResponse({"error": f"simulations must be at most {max_simulations:,}"}, status=400)
+    try:
+        result = simulate_draw(slots, form.cleaned_data, simulations)
+    except DrawError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(result)
+
+
+@staff_member_required
+@require_GET
+def cache_stats(request):
+    """Hit/miss counters of this worker's prediction cache."""
+    return JsonResponse(prediction_cache.stats())